@@ -0,0 +1,309 @@
+"""
+Offline road-name address index for parcel registration.
+
+Built once from the public 도로명주소 DB (juso.go.kr "도로명주소 한글" rnaddrkor_*.txt files,
+or any CSV with 우편번호/도로명주소/건물명/읍면동 columns) into json/address_index.db:
+
+    python address_index.py build rnaddrkor_seoul.txt rnaddrkor_busan.txt ...
+
+Addresses are split into words (tokens). Each distinct token is indexed by its character
+and choseong bigrams, and postings map tokens to addresses, so a query like "역삼 테헤란",
+"ㅌㅎㄹ" or a half-typed "테헤라" is answered from the index in milliseconds.
+"""
+import os
+import sys
+import csv
+import json
+import sqlite3
+import threading
+
+import hangul
+
+os.makedirs("json", exist_ok=True)
+ADDRESS_INDEX_FILE = os.path.join("json", "address_index.db")
+
+SEARCH_LIMIT = 100
+MAX_TOKENS_PER_WORD = 5000
+MAX_CANDIDATES = 20000
+BUILD_BATCH = 50000
+
+# Column layout of the "도로명주소 한글" (rnaddrkor_*.txt) files, '|' separated
+RNADDRKOR_FIELDS = {
+    "sido": 2, "sigungu": 3, "dong": 4, "road": 10, "underground": 11,
+    "main_no": 12, "sub_no": 13, "zonecode": 16, "building_reg": 21, "building": 22
+}
+
+# Header names accepted for CSV sources
+COLUMN_ALIASES = {
+    "zonecode": ["zonecode", "zipNo", "우편번호", "기초구역번호"],
+    "address": ["address", "roadAddr", "도로명주소"],
+    "building": ["building", "bdNm", "건물명", "시군구용건물명"],
+    "dong": ["dong", "emdNm", "읍면동", "법정읍면동명"]
+}
+
+_SCHEMA = """
+CREATE TABLE addresses (id INTEGER PRIMARY KEY, zonecode TEXT, address TEXT, building TEXT, dong TEXT);
+CREATE TABLE tokens (id INTEGER PRIMARY KEY, text TEXT, count INTEGER);
+CREATE TABLE token_grams (gram TEXT, token_id INTEGER, PRIMARY KEY (gram, token_id)) WITHOUT ROWID;
+CREATE TABLE postings (token_id INTEGER, address_id INTEGER, PRIMARY KEY (token_id, address_id)) WITHOUT ROWID;
+"""
+
+
+def _tokenize(record):
+    words = set()
+    for field in ("address", "building", "dong"):
+        for word in (record.get(field) or "").lower().split():
+            words.add(word)
+    return words
+
+
+def _populate(conn, records):
+    conn.executescript(_SCHEMA)
+    token_ids = {}
+    token_counts = []
+    address_rows = []
+    posting_rows = []
+    count = 0
+
+    def flush():
+        conn.executemany("INSERT INTO addresses VALUES (?, ?, ?, ?, ?)", address_rows)
+        conn.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)", posting_rows)
+        address_rows.clear()
+        posting_rows.clear()
+
+    for record in records:
+        count += 1
+        address_rows.append((count, record.get("zonecode", ""), record.get("address", ""),
+                             record.get("building", ""), record.get("dong", "")))
+        for word in _tokenize(record):
+            token_id = token_ids.get(word)
+            if token_id is None:
+                token_id = token_ids[word] = len(token_ids) + 1
+                token_counts.append(0)
+            token_counts[token_id - 1] += 1
+            posting_rows.append((token_id, count))
+        if len(address_rows) >= BUILD_BATCH:
+            flush()
+    flush()
+
+    conn.executemany("INSERT INTO tokens VALUES (?, ?, ?)",
+                     ((tid, word, token_counts[tid - 1]) for word, tid in token_ids.items()))
+    conn.executemany("INSERT OR IGNORE INTO token_grams VALUES (?, ?)",
+                     ((gram, tid) for word, tid in token_ids.items() for gram in hangul.search_grams(word)))
+    conn.commit()
+    return count
+
+
+def build_index(records, path=None):
+    """
+    Writes a new index for the records (dicts with zonecode/address/building/dong)
+    and swaps it in atomically. Returns the number of addresses indexed.
+    """
+    path = path or ADDRESS_INDEX_FILE
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    try:
+        count = _populate(conn, records)
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return count
+
+
+def _detect_encoding(path):
+    # The official dumps are cp949; re-saved copies are usually UTF-8
+    import codecs
+    with open(path, "rb") as f:
+        sample = f.read(1024 * 1024)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "cp949"
+
+
+def _read_lines(path):
+    with open(path, "r", encoding=_detect_encoding(path), errors="replace") as f:
+        yield from f
+
+
+def iter_source_records(path):
+    """
+    Yields address records from a source file: rnaddrkor_*.txt, a CSV with a header row,
+    or a JSON list of records.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    lines = _read_lines(path)
+    first = next(lines, "")
+    if first.count("|") >= max(RNADDRKOR_FIELDS.values()):
+        f = RNADDRKOR_FIELDS
+        for line in _chain(first, lines):
+            cols = line.rstrip("\r\n").split("|")
+            if len(cols) <= max(f.values()):
+                continue
+            number = cols[f["main_no"]] + (f"-{cols[f['sub_no']]}" if cols[f["sub_no"]] not in ("", "0") else "")
+            underground = "지하 " if cols[f["underground"]] == "1" else ""
+            yield {
+                "zonecode": cols[f["zonecode"]],
+                "address": f"{cols[f['sido']]} {cols[f['sigungu']]} {cols[f['road']]} {underground}{number}".replace("  ", " "),
+                "building": cols[f["building"]] or cols[f["building_reg"]],
+                "dong": cols[f["dong"]]
+            }
+        return
+
+    try:
+        dialect = csv.Sniffer().sniff(first, delimiters=",\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(_chain(first, lines), dialect=dialect)
+    header = next(reader, [])
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                columns[key] = header.index(alias)
+                break
+    if "address" not in columns:
+        raise ValueError(f"{path}: no address column (expected one of {COLUMN_ALIASES['address']})")
+    for row in reader:
+        yield {key: row[i].strip() if i < len(row) else "" for key, i in columns.items()}
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+class AddressIndex:
+    def __init__(self, path=None, conn=None):
+        self.path = path or ADDRESS_INDEX_FILE
+        self.lock = threading.Lock()
+        self.conn = conn
+        self.is_sample = False # True for the in-memory index built from fallback records
+        if self.conn is None and os.path.exists(self.path):
+            try:
+                self.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            except sqlite3.Error as e:
+                print(f"[AddressIndex] Error opening {self.path}: {e}")
+
+    @classmethod
+    def from_records(cls, records):
+        # Small in-memory index, used when no offline DB has been built
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        _populate(conn, records)
+        index = cls(conn=conn)
+        index.is_sample = True
+        return index
+
+    @property
+    def available(self):
+        return self.conn is not None
+
+    def count(self):
+        if not self.conn:
+            return 0
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM addresses").fetchone()[0]
+
+    def _word_tokens(self, word):
+        exact_upto = hangul.typed_length(word)
+        keys = list(hangul.search_grams(word, exact_upto))
+        placeholders = ",".join("?" * len(keys))
+        rows = self.conn.execute(
+            f"SELECT t.id, t.text, t.count FROM token_grams g JOIN tokens t ON t.id = g.token_id "
+            f"WHERE g.gram IN ({placeholders}) GROUP BY g.token_id HAVING COUNT(*) = ? LIMIT ?",
+            keys + [len(keys), MAX_TOKENS_PER_WORD]).fetchall()
+        return [(tid, count) for tid, text, count in rows if hangul.matches(word, text)]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """
+        Returns up to limit records matching every word of the query.
+        """
+        words = [w for w in query.lower().split() if w]
+        if not words or not self.conn:
+            return []
+        with self.lock:
+            word_tokens = []
+            for word in words:
+                tokens = self._word_tokens(word)
+                if not tokens:
+                    return []
+                word_tokens.append((sum(c for _, c in tokens), word, [tid for tid, _ in tokens]))
+            # Start from the most selective word; the others are checked on the candidates
+            word_tokens.sort()
+            _, first_word, token_ids = word_tokens[0]
+            placeholders = ",".join("?" * len(token_ids))
+            rows = self.conn.execute(
+                f"SELECT a.zonecode, a.address, a.building, a.dong FROM addresses a WHERE a.id IN "
+                f"(SELECT DISTINCT address_id FROM postings WHERE token_id IN ({placeholders}) LIMIT ?) ORDER BY a.id",
+                token_ids + [MAX_CANDIDATES]).fetchall()
+        others = [w for _, w, _ in word_tokens[1:]]
+        results = []
+        for zonecode, address, building, dong in rows:
+            if others:
+                text_words = f"{address} {building} {dong}".lower().split()
+                if not all(any(hangul.matches(w, t) for t in text_words) for w in others):
+                    continue
+            results.append({"zonecode": zonecode, "address": address, "building": building, "dong": dong})
+            if len(results) >= limit:
+                break
+        return results
+
+
+_default_index = None
+_default_lock = threading.Lock()
+
+
+def get_index(fallback_records=None):
+    """
+    Shared index: the offline DB if it has been built, else an in-memory index of fallback_records.
+    """
+    global _default_index
+    with _default_lock:
+        if _default_index is None:
+            index = AddressIndex()
+            if not index.available and fallback_records:
+                index = AddressIndex.from_records(fallback_records)
+            _default_index = index
+        return _default_index
+
+
+def main():
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="Build the offline road-name address index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build json/address_index.db from address DB files")
+    build.add_argument("sources", nargs="+")
+    build.add_argument("--output", default=ADDRESS_INDEX_FILE)
+    search = sub.add_parser("search", help="query an index")
+    search.add_argument("query")
+    search.add_argument("--index", default=ADDRESS_INDEX_FILE)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        def records():
+            for source in args.sources:
+                print(f"[AddressIndex] Reading {source}")
+                yield from iter_source_records(source)
+        count = build_index(records(), args.output)
+        print(f"[AddressIndex] {count} addresses indexed into {args.output} in {time.perf_counter() - started:.1f}s")
+    else:
+        started = time.perf_counter()
+        results = AddressIndex(args.index).search(args.query)
+        for r in results:
+            print(f"[{r['zonecode']}] {r['address']} {r['building']}")
+        print(f"{len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
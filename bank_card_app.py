@@ -1,8 +1,10 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from smartcard.System import readers
-from smartcard.Exceptions import NoCardException, CardConnectionException
-import time
+import queue
+import card_reader_service
+import card_session
+
+EVENT_POLL_MS = 30 # hands reader events to Tk; no PC/SC calls happen here
 
 class BankCardApp:
     def __init__(self, root):
@@ -12,16 +14,18 @@ class BankCardApp:
         self.root.configure(bg="#1E1E2E")
         
         # Application State
-        self.last_card_state = "DISCONNECTED" # DISCONNECTED, PRESENT, READY
-        self.active_reader = None
-        self.connection = None
+        self.active_reader = None # reader holding the current card
         self.card_atr = ""
         
         self.setup_styles()
         self.create_widgets()
         
-        # Start the monitoring loop
-        self.check_loop()
+        # Reader events arrive on the reader service thread; Tk widgets are only touched here
+        self.events = queue.Queue()
+        self.service = card_reader_service.get_service()
+        if not self.service.subscribe(lambda *event: self.events.put(event)):
+            self.lbl_reader_info.config(text="pyscard is not installed.")
+        self.process_events()
 
     def setup_styles(self):
         style = ttk.Style()
@@ -110,147 +114,67 @@ class BankCardApp:
         self.btn_write.grid(row=0, column=4, padx=15, pady=10)
         self.btn_write.state(['disabled']) # Disable initially until card is ready
 
-    def check_loop(self):
-        try:
-            rs = readers()
-            if not rs:
+    def process_events(self):
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            self.handle_event(*event)
+        self.root.after(EVENT_POLL_MS, self.process_events)
+
+    def handle_event(self, event, reader, data):
+        if event == "readers":
+            if not data:
                 self.lbl_reader_info.config(text="No smart card readers detected.")
                 self.status_indicator.config(text="● Reader Off", fg="#EF4444")
                 self.set_disconnected_state()
             else:
-                reader = rs[0]
-                self.lbl_reader_info.config(text=f"Active Reader: {reader}")
-                self.active_reader = reader
-                
-                # Check if card is present and try reading
-                self.auto_read_card()
-                
-        except Exception as e:
-            self.lbl_reader_info.config(text=f"Status: Error querying readers")
-            self.set_disconnected_state()
-            
-        # Run loop every 800 milliseconds
-        self.root.after(800, self.check_loop)
+                self.lbl_reader_info.config(text=f"Active Reader: {data[0]}")
+                if not self.active_reader:
+                    self.status_indicator.config(text="● Slot Empty", fg="#6B7280")
+        elif event == "inserted":
+            self.active_reader = reader
+            self.card_atr = data
+            self.lbl_reader_info.config(text=f"Active Reader: {reader}")
+            self.lbl_atr_info.config(text=f"ATR: {data}")
+            self.status_indicator.config(text="● Reading Card...", fg="#F59E0B")
+        elif event == "card_read":
+            if data:
+                self.account_display_var.set(data)
+                self.lbl_account_display.config(fg="#10B981")
+                self.status_indicator.config(text="● Card Connected", fg="#10B981")
+                self.btn_write.state(['!disabled']) # Enable writing
+            elif data == "":
+                self.account_display_var.set("[ EMPTY / INVALID CARD ]")
+                self.lbl_account_display.config(fg="#F59E0B")
+                self.status_indicator.config(text="● Card Connected (No Data)", fg="#F59E0B")
+                self.btn_write.state(['!disabled']) # Enable writing anyway
+            else:
+                # Reader exists but card handshake failed (e.g. unresponsive)
+                self.status_indicator.config(text="● Unresponsive Card", fg="#EF4444")
+                self.account_display_var.set("[ UNRESPONSIVE CARD ]")
+                self.lbl_account_display.config(fg="#EF4444")
+                self.btn_write.state(['disabled'])
+        elif event == "removed":
+            if reader == self.active_reader:
+                self.status_indicator.config(text="● Slot Empty", fg="#6B7280")
+                self.set_disconnected_state()
+        elif event == "error":
+            self.status_indicator.config(text="● Error", fg="#EF4444")
+        elif event == "write_done":
+            self.on_write_done(*data)
 
     def set_disconnected_state(self):
-        self.last_card_state = "DISCONNECTED"
-        self.connection = None
+        self.active_reader = None
         self.card_atr = ""
         self.account_display_var.set("[ INSERT CARD ]")
         self.lbl_account_display.config(fg="#9CA3AF")
         self.lbl_atr_info.config(text="ATR: --")
         self.btn_write.state(['disabled'])
 
-    def auto_read_card(self):
-        if not self.active_reader:
-            return
-            
-        # Optimization: If already connected and in READY state,
-        # check if card is still there using a fast read instead of resetting connection.
-        if self.connection is not None and self.last_card_state == "READY":
-            try:
-                # Send a lightweight read command of 1 byte to check card presence.
-                # If the card is removed, this transmit will throw an exception.
-                read_cmd = [0xFF, 0xB0, 0x00, 0x00, 0x01]
-                self.connection.transmit(read_cmd)
-                return  # Card is still present and active, do nothing.
-            except Exception:
-                # Transmit failed: card was removed.
-                self.status_indicator.config(text="● Slot Empty", fg="#6B7280")
-                self.set_disconnected_state()
-                return
-
-        try:
-            conn = self.active_reader.createConnection()
-            
-            # Try to connect with default protocols
-            connected = False
-            for protocol in [1, 2, 3]: # T0, T1, RAW
-                try:
-                    conn.connect(protocol)
-                    connected = True
-                    break
-                except Exception:
-                    continue
-            
-            if not connected:
-                # Force connect to trigger exception if no card is present
-                conn.connect()
-                
-            self.connection = conn
-            
-            # If we reached here, connection succeeded!
-            atr_bytes = conn.getATR()
-            atr_hex = "".join([f"{x:02X} " for x in atr_bytes]).strip()
-            self.card_atr = atr_hex
-            self.lbl_atr_info.config(text=f"ATR: {atr_hex}")
-            
-            if self.last_card_state != "READY":
-                self.status_indicator.config(text="● Reading Card...", fg="#F59E0B")
-                self.root.update_idletasks()
-                
-                # Perform Read Sequence
-                account_num = self.read_account_sequence()
-                if account_num:
-                    self.account_display_var.set(account_num)
-                    self.lbl_account_display.config(fg="#10B981")
-                    self.status_indicator.config(text="● Card Connected", fg="#10B981")
-                    self.btn_write.state(['!disabled']) # Enable writing
-                    self.last_card_state = "READY"
-                else:
-                    self.account_display_var.set("[ EMPTY / INVALID CARD ]")
-                    self.lbl_account_display.config(fg="#F59E0B")
-                    self.status_indicator.config(text="● Card Connected (No Data)", fg="#F59E0B")
-                    self.btn_write.state(['!disabled']) # Enable writing anyway
-                    self.last_card_state = "READY"
-                    
-        except NoCardException:
-            # Card was removed or not inserted
-            self.status_indicator.config(text="● Slot Empty", fg="#6B7280")
-            self.set_disconnected_state()
-            
-        except CardConnectionException:
-            # Reader exists but card handshake failed (e.g. unresponsive)
-            self.status_indicator.config(text="● Unresponsive Card", fg="#EF4444")
-            self.account_display_var.set("[ UNRESPONSIVE CARD ]")
-            self.lbl_account_display.config(fg="#EF4444")
-            self.btn_write.state(['disabled'])
-            self.last_card_state = "DISCONNECTED"
-            
-        except Exception as e:
-            self.status_indicator.config(text="● Error", fg="#EF4444")
-            self.set_disconnected_state()
-
-    def read_account_sequence(self):
-        if not self.connection:
-            return None
-            
-        try:
-            # 1. Initialize SLE4442 card
-            init_cmd = [0xFF, 0xA4, 0x00, 0x00, 0x01, 0x06]
-            self.connection.transmit(init_cmd)
-            
-            # 2. Read 20 bytes from address 0x00
-            read_cmd = [0xFF, 0xB0, 0x00, 0x00, 0x14]
-            data, sw1, sw2 = self.connection.transmit(read_cmd)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                # Convert bytes to string, strip whitespace and non-printables
-                decoded = "".join([chr(x) for x in data if 32 <= x <= 126])
-                decoded_clean = decoded.strip()
-                
-                # Check if it looks like garbage (all FFs, all 00s, or mostly non-printables)
-                if not decoded_clean or all(x == 0xFF for x in data) or all(x == 0x00 for x in data):
-                    return None
-                    
-                return decoded_clean
-                
-        except Exception:
-            pass
-        return None
-
     def write_account_to_card(self):
-        if not self.connection:
+        if not self.active_reader:
             messagebox.showwarning("Warning", "No card connected.")
             return
             
@@ -276,59 +200,42 @@ class BankCardApp:
             messagebox.showerror("Error", "Account number must contain only ASCII characters (numbers, letters, hyphens).")
             return
             
-        if len(account_bytes) > 20:
+        if len(account_bytes) > card_session.ACCOUNT_LENGTH:
             messagebox.showwarning("Warning", "Account number is too long. Max 20 characters.")
             return
             
-        # Pad with spaces to exactly 20 bytes
-        account_bytes += [0x20] * (20 - len(account_bytes))
-        
         self.btn_write.state(['disabled'])
-        self.root.update_idletasks()
-        
-        try:
-            # 1. Initialize Card
-            init_cmd = [0xFF, 0xA4, 0x00, 0x00, 0x01, 0x06]
-            self.connection.transmit(init_cmd)
-            
-            # 2. Verify PIN
-            verify_cmd = [0xFF, 0x20, 0x00, 0x00, 0x03] + pin_bytes
-            data, sw1, sw2 = self.connection.transmit(verify_cmd)
-            
-            # For SLE4442, SW1=90 and SW2=07 indicates success (resets the error counter to 3).
-            # If it returns 90 00, it is also a success.
-            # If it fails, SW2 will be decremented (e.g., 03, 01, 00).
-            if not (sw1 == 0x90 and (sw2 == 0x00 or sw2 == 0x07)):
-                # Map error counter bits to human-readable remaining attempts
-                if sw2 == 0x07:
-                    remaining = 3
-                elif sw2 == 0x03:
-                    remaining = 2
-                elif sw2 == 0x01:
-                    remaining = 1
-                elif sw2 == 0x00:
-                    remaining = 0
-                else:
-                    remaining = "unknown"
-                messagebox.showerror("PIN Error", f"PIN verification failed. (SW: {sw1:02X} {sw2:02X})\nRemaining attempts: {remaining}")
+        reader = self.active_reader
+        # The card I/O runs on the reader service thread; the result comes back as an event
+        self.service.submit(reader, lambda session: self.write_sequence(session, pin_bytes, account_bytes),
+                            lambda result, error: self.events.put(("write_done", reader, (reader, account_str, result, error))))
+
+    def write_sequence(self, session, pin_bytes, account_bytes):
+        # Runs on the reader service thread. Returns (ok, remaining PIN attempts, sw1, sw2) of the PIN check.
+        result = session.verify_pin(pin_bytes)
+        if result[0]:
+            session.write_account(account_bytes)
+        return result
+
+    def on_write_done(self, reader, account_str, result, error):
+        self.btn_write.state(['!disabled'])
+        if isinstance(error, card_session.CardError):
+            messagebox.showerror("Error", f"Failed to write to card. (SW: {error.sw1:02X} {error.sw2:02X})")
+            return
+        if error is not None:
+            messagebox.showerror("Error", f"An error occurred during write operation: {error}")
+            return
+        ok, remaining, sw1, sw2 = result
+        if not ok:
+            if (sw1, sw2) == card_session.PIN_BLOCKED:
+                messagebox.showerror("PIN Error", f"The card is locked: no PIN attempts left. (SW: {sw1:02X} {sw2:02X})")
                 return
-                
-            # 3. Write data to address 0x00
-            write_cmd = [0xFF, 0xD0, 0x00, 0x00, 0x14] + account_bytes
-            data, sw1, sw2 = self.connection.transmit(write_cmd)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                messagebox.showinfo("Success", f"Account number '{account_str}' successfully written to card!")
-                # Force refresh state
-                self.last_card_state = "UPDATE"
-                self.auto_read_card()
-            else:
-                messagebox.showerror("Error", f"Failed to write to card. (SW: {sw1:02X} {sw2:02X})")
-                
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred during write operation: {e}")
-        finally:
-            self.btn_write.state(['!disabled'])
+            remaining = "unknown" if remaining is None else remaining
+            messagebox.showerror("PIN Error", f"PIN verification failed. (SW: {sw1:02X} {sw2:02X})\nRemaining attempts: {remaining}")
+            return
+        messagebox.showinfo("Success", f"Account number '{account_str}' successfully written to card!")
+        # Read the card again to show what was written
+        self.service.refresh(reader)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,249 @@
+"""
+Shared smart card reader service for the POS card dialog and bank_card_app.py.
+
+pyscard's ReaderMonitor/CardMonitor observers report reader and card changes as they
+happen (SCardGetStatusChange), and every card operation runs on one background I/O
+thread, so no UI thread polls readers() or waits on an APDU.
+
+Listeners are called on the I/O thread as listener(event, reader, data) and must hand
+the event over to their own UI thread (a Qt signal, a Tk queue):
+    "readers"   data: list of reader names
+    "inserted"  data: ATR as a hex string
+    "card_read" data: card number, "" for a blank card, None if the read failed
+    "removed"   data: None
+    "error"     data: message
+"""
+import os
+import queue
+import threading
+
+from lazy_imports import lazy_import, is_available
+import card_session
+
+smartcard_system = lazy_import("smartcard.System")
+card_monitoring = lazy_import("smartcard.CardMonitoring")
+reader_monitoring = lazy_import("smartcard.ReaderMonitoring")
+# With DU_CARD_EMULATOR set, an emulated reader replaces pyscard (see card_session.py)
+EMULATED = card_session.emulator_enabled()
+SMARTCARD_AVAILABLE = EMULATED or is_available("smartcard")
+
+
+class _Observer:
+    # pyscard only calls update() on its observers
+    def __init__(self, callback):
+        self.callback = callback
+
+    def update(self, observable, actions):
+        added, removed = actions
+        self.callback(added, removed)
+
+
+class CardReaderService:
+    def __init__(self):
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.tasks = queue.Queue()
+        self.thread = None
+        self.reader_observer = None
+        self.card_observer = None
+        # State for listeners that subscribe later (I/O thread only)
+        self.readers = []
+        self.cards = {} # reader name -> {"card": pyscard Card, "atr": str, "number": str or None}
+        self.sessions = {} # reader name -> CardSession of the inserted card
+
+    # ----- subscription (any thread) -----
+
+    def subscribe(self, listener):
+        """
+        Adds a listener; it first receives the current readers and inserted cards.
+        """
+        if not SMARTCARD_AVAILABLE:
+            return False
+        with self.lock:
+            first = not self.listeners
+            self.listeners.append(listener)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="CardReaderService", daemon=True)
+                self.thread.start()
+        if first:
+            self.tasks.put(("start", listener))
+        else:
+            self.tasks.put(("replay", listener))
+        return True
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+            last = not self.listeners
+        if last and self.thread is not None:
+            self.tasks.put(("stop", None))
+
+    def submit(self, reader, func, callback=None):
+        """
+        Runs func(session) on the I/O thread with the CardSession of the card in reader,
+        then callback(result, error) on the same thread.
+        """
+        self.tasks.put(("call", (reader, func, callback)))
+
+    def refresh(self, reader):
+        # Re-reads the card, e.g. after writing a new account number to it
+        self.tasks.put(("refresh", reader))
+
+    def insert_card(self, card):
+        # Emulated (or any pyscard-like) card put into its reader
+        self.tasks.put(("inserted", card))
+
+    def remove_card(self, card):
+        self.tasks.put(("removed", card))
+
+    # ----- I/O thread -----
+
+    def _notify(self, event, reader=None, data=None, listeners=None):
+        if listeners is None:
+            with self.lock:
+                listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(event, reader, data)
+            except Exception as e:
+                # e.g. a dialog closed between the event and its delivery
+                print(f"[CardReader] Listener error on {event}: {e}")
+
+    def _run(self):
+        handlers = {
+            "start": self._start_monitors,
+            "stop": self._stop_monitors,
+            "replay": self._replay,
+            "readers": self._on_readers,
+            "inserted": self._on_inserted,
+            "removed": self._on_removed,
+            "refresh": self._read_card,
+            "call": self._call,
+        }
+        while True:
+            kind, arg = self.tasks.get()
+            try:
+                handlers[kind](arg)
+            except Exception as e:
+                print(f"[CardReader] Error handling {kind}: {e}")
+                self._notify("error", None, str(e))
+
+    def _list_readers(self):
+        if EMULATED:
+            return [card_session.EMULATED_READER_NAME]
+        try:
+            return [str(r) for r in smartcard_system.readers()]
+        except Exception as e:
+            print(f"[CardReader] Error listing readers: {e}")
+            return []
+
+    def _start_monitors(self, listener):
+        if self.reader_observer is not None:
+            # A "stop" queued just before this start found a new listener and kept the monitors
+            # running; this listener still needs the current state
+            self._replay(listener)
+            return
+        self.readers = self._list_readers()
+        self._notify("readers", None, list(self.readers))
+        # Observers run on pyscard's monitor threads; their events are queued for this thread
+        self.reader_observer = _Observer(lambda added, removed: self.tasks.put(("readers", None)))
+        self.card_observer = _Observer(self._queue_card_changes)
+        if EMULATED:
+            account = os.environ.get(card_session.EMULATOR_ENV, "")
+            if account != "empty":
+                self._on_inserted(card_session.EmulatedCard(account if account != "blank" else ""))
+            return
+        reader_monitoring.ReaderMonitor().addObserver(self.reader_observer)
+        card_monitoring.CardMonitor().addObserver(self.card_observer)
+
+    def _stop_monitors(self, _):
+        with self.lock:
+            if self.listeners or self.reader_observer is None:
+                return
+        if not EMULATED:
+            reader_monitoring.ReaderMonitor().deleteObserver(self.reader_observer)
+            card_monitoring.CardMonitor().deleteObserver(self.card_observer)
+        self.reader_observer = None
+        self.card_observer = None
+        for reader in list(self.sessions):
+            self._close_session(reader)
+        self.cards.clear()
+
+    def _queue_card_changes(self, added, removed):
+        for card in removed:
+            self.tasks.put(("removed", card))
+        for card in added:
+            self.tasks.put(("inserted", card))
+
+    def _replay(self, listener):
+        self._notify("readers", None, list(self.readers), [listener])
+        for reader, state in self.cards.items():
+            self._notify("inserted", reader, state["atr"], [listener])
+            self._notify("card_read", reader, state["number"], [listener])
+
+    def _on_readers(self, _):
+        readers = self._list_readers()
+        if readers != self.readers:
+            self.readers = readers
+            for reader in [r for r in self.cards if r not in readers]:
+                self._close_session(reader)
+                del self.cards[reader]
+            self._notify("readers", None, list(readers))
+
+    def _on_inserted(self, card):
+        reader = str(card.reader)
+        atr = " ".join(f"{x:02X}" for x in card.atr)
+        self._close_session(reader)
+        self.cards[reader] = {"card": card, "atr": atr, "number": None}
+        self.sessions[reader] = card_session.CardSession(card, reader)
+        self._notify("inserted", reader, atr)
+        self._read_card(reader)
+
+    def _on_removed(self, card):
+        reader = str(card.reader)
+        self._close_session(reader)
+        self.cards.pop(reader, None)
+        self._notify("removed", reader)
+
+    def _close_session(self, reader):
+        session = self.sessions.pop(reader, None)
+        if session is not None:
+            session.close()
+
+    def _read_card(self, reader):
+        session = self.sessions.get(reader)
+        if session is None:
+            return
+        number = None
+        try:
+            number = session.read_account()
+        except Exception as e:
+            print(f"[CardReader] Error reading card in {reader}: {e}")
+        self.cards[reader]["number"] = number
+        self._notify("card_read", reader, number)
+
+    def _call(self, arg):
+        reader, func, callback = arg
+        result, error = None, None
+        try:
+            session = self.sessions.get(reader)
+            if session is None:
+                raise RuntimeError("No card in reader")
+            result = func(session)
+        except Exception as e:
+            error = e
+        if callback:
+            callback(result, error)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CardReaderService()
+        return _service
@@ -0,0 +1,211 @@
+"""
+SLE4442 memory card sessions shared by the POS card reader service and bank_card_app.py.
+
+A CardSession connects once per inserted card, remembers which protocol each reader
+accepted (so later connects skip the failed attempts) and selects the card type once.
+
+EmulatedCard stands in for a card in a reader for testing without hardware. With the
+DU_CARD_EMULATOR environment variable set, the card reader service uses an emulated
+reader instead of pyscard:
+    DU_CARD_EMULATOR=123-456-789012 python main.py   card with that account number
+    DU_CARD_EMULATOR=blank python bank_card_app.py   blank card (PIN FF FF FF)
+    DU_CARD_EMULATOR=empty python main.py            reader without a card
+"""
+import os
+import threading
+
+EMULATOR_ENV = "DU_CARD_EMULATOR"
+EMULATED_READER_NAME = "Emulated SLE4442 Reader 0"
+
+# pyscard protocol flags: T0, T1, T0|T1 (tried in this order when nothing is cached)
+PROTOCOLS = [1, 2, 3]
+
+SELECT_SLE4442 = [0xFF, 0xA4, 0x00, 0x00, 0x01, 0x06]
+ACCOUNT_ADDRESS = 0x00
+ACCOUNT_LENGTH = 20
+MEMORY_SIZE = 256
+
+# Remaining PIN attempts by the SW2 error counter bits of a VERIFY answer
+PIN_ATTEMPTS = {0x07: 3, 0x03: 2, 0x01: 1, 0x00: 0}
+PIN_BLOCKED = (0x69, 0x83) # error counter used up, card locked
+
+_protocol_cache = {} # reader name -> protocol the reader accepted last time
+_protocol_lock = threading.Lock()
+
+
+class CardError(Exception):
+    def __init__(self, message, sw1=None, sw2=None):
+        super().__init__(message)
+        self.sw1 = sw1
+        self.sw2 = sw2
+
+
+def emulator_enabled():
+    return bool(os.environ.get(EMULATOR_ENV))
+
+
+def decode_account(data):
+    """
+    Account number stored on the card, or "" for blank (all 00/FF) or unreadable memory.
+    """
+    if not data or all(x == 0xFF for x in data) or all(x == 0x00 for x in data):
+        return ""
+    return "".join(chr(x) for x in data if 32 <= x <= 126).strip()
+
+
+class CardSession:
+    def __init__(self, card, reader_name=None):
+        self.card = card
+        self.reader_name = reader_name or str(card.reader)
+        self.connection = None
+        self.selected = False
+
+    def connect(self):
+        if self.connection is not None:
+            return self.connection
+        connection = self.card.createConnection()
+        with _protocol_lock:
+            cached = _protocol_cache.get(self.reader_name)
+        for protocol in ([cached] if cached else []) + [p for p in PROTOCOLS if p != cached]:
+            try:
+                connection.connect(protocol)
+                with _protocol_lock:
+                    _protocol_cache[self.reader_name] = protocol
+                break
+            except Exception:
+                continue
+        else:
+            # Let the reader pick; raises NoCardException if the card is gone
+            connection.connect()
+        self.connection = connection
+        self.selected = False
+        return connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.disconnect()
+            except Exception:
+                pass
+        self.connection = None
+        self.selected = False
+
+    def transmit(self, apdu):
+        try:
+            return self.connect().transmit(apdu)
+        except Exception:
+            # Connection lost (card pulled or reset): the next command reconnects
+            self.close()
+            raise
+
+    def select(self):
+        if not self.selected:
+            self.transmit(SELECT_SLE4442)
+            self.selected = True
+
+    def read(self, address, length):
+        self.select()
+        data, sw1, sw2 = self.transmit([0xFF, 0xB0, 0x00, address, length])
+        if (sw1, sw2) != (0x90, 0x00):
+            raise CardError(f"Read failed (SW: {sw1:02X} {sw2:02X})", sw1, sw2)
+        return list(data)
+
+    def read_account(self):
+        return decode_account(self.read(ACCOUNT_ADDRESS, ACCOUNT_LENGTH))
+
+    def verify_pin(self, pin_bytes):
+        """
+        Presents the 3-byte PIN. Returns (ok, remaining attempts or None, sw1, sw2).
+        """
+        self.select()
+        data, sw1, sw2 = self.transmit([0xFF, 0x20, 0x00, 0x00, 0x03] + list(pin_bytes))
+        # For SLE4442, 90 07 (error counter reset to 3) or 90 00 is a success
+        ok = sw1 == 0x90 and sw2 in (0x00, 0x07)
+        if (sw1, sw2) == PIN_BLOCKED:
+            return False, 0, sw1, sw2
+        return ok, PIN_ATTEMPTS.get(sw2), sw1, sw2
+
+    def write(self, address, data):
+        self.select()
+        data = list(data)
+        res, sw1, sw2 = self.transmit([0xFF, 0xD0, 0x00, address, len(data)] + data)
+        if (sw1, sw2) != (0x90, 0x00):
+            raise CardError(f"Write failed (SW: {sw1:02X} {sw2:02X})", sw1, sw2)
+
+    def write_account(self, account_bytes):
+        # Padded with spaces to the full field
+        self.write(ACCOUNT_ADDRESS, list(account_bytes) + [0x20] * (ACCOUNT_LENGTH - len(account_bytes)))
+
+
+class EmulatedCard:
+    """
+    In-memory SLE4442 card with the same interface as a pyscard Card (reader, atr,
+    createConnection), answering the select/read/verify/write commands used here.
+    """
+    atr = [0xA2, 0x13, 0x10, 0x91]
+
+    def __init__(self, account="", pin=(0xFF, 0xFF, 0xFF), reader=EMULATED_READER_NAME):
+        self.reader = reader
+        self.memory = [0xFF] * MEMORY_SIZE
+        self.pin = list(pin)
+        self.error_counter = 0x07
+        self.unlocked = False
+        self.removed = False
+        self.commands = [] # every APDU received, for tests
+        if account:
+            data = list(account.encode("ascii"))[:ACCOUNT_LENGTH]
+            self.memory[ACCOUNT_ADDRESS:ACCOUNT_ADDRESS + ACCOUNT_LENGTH] = data + [0x20] * (ACCOUNT_LENGTH - len(data))
+
+    def createConnection(self):
+        return EmulatedConnection(self)
+
+
+class EmulatedConnection:
+    def __init__(self, card):
+        self.card = card
+        self.protocol = None
+
+    def connect(self, protocol=None):
+        if self.card.removed:
+            raise Exception("Card is not present")
+        self.protocol = protocol or 3
+
+    def disconnect(self):
+        self.protocol = None
+
+    def getATR(self):
+        return list(self.card.atr)
+
+    def getProtocol(self):
+        return self.protocol
+
+    def transmit(self, apdu):
+        card = self.card
+        if card.removed or self.protocol is None:
+            raise Exception("Card is not present")
+        card.commands.append(list(apdu))
+        ins, address, length = apdu[1], apdu[3], apdu[4] if len(apdu) > 4 else 0
+        if ins == 0xA4:
+            return [], 0x90, 0x00
+        if ins == 0xB0:
+            if address + length > MEMORY_SIZE:
+                return [], 0x6B, 0x00
+            return card.memory[address:address + length], 0x90, 0x00
+        if ins == 0x20:
+            if card.error_counter == 0:
+                return [], 0x69, 0x83 # locked card
+            if list(apdu[5:8]) == card.pin:
+                card.error_counter = 0x07
+                card.unlocked = True
+            else:
+                card.error_counter >>= 1
+                card.unlocked = False
+                if card.error_counter == 0:
+                    return [], 0x69, 0x83 # last attempt used up
+            return [], 0x90, card.error_counter
+        if ins == 0xD0:
+            if not card.unlocked:
+                return [], 0x62, 0x00
+            card.memory[address:address + length] = list(apdu[5:5 + length])
+            return [], 0x90, 0x00
+        return [], 0x6D, 0x00
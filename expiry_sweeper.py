@@ -0,0 +1,225 @@
+"""
+Moves dead keeping coupons and mobile vouchers out of the hot files.
+
+keeping.json and vouchers.json are loaded at startup and rewritten on every change, so
+entries that can no longer be used are moved to monthly archive files under json/archive/
+(keeping_YYYY-MM.json, vouchers_YYYY-MM.json, by the month of the sweep):
+    - keeping coupons past their expiry date
+    - used keeping coupons and used vouchers, USED_GRACE_DAYS after they were used
+The archive is written on a background thread before the entries are dropped from the
+hot files, so a sweep interrupted in between only archives the same entries again.
+json/archive/index.json lists the archived barcodes, so a scan of an archived coupon is
+told apart from an unknown one without opening the monthly files.
+
+main.py starts a sweep once a day while the POS sits idle on the welcome page (which
+also covers the night when the POS is left running); the settings page shows the stats
+and can start a sweep by hand.
+"""
+import os
+import glob
+import json
+from datetime import datetime, timedelta
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from keeping_coupon_manager import KEEPING_FILE
+from product_manager import VOUCHER_FILE
+
+ARCHIVE_DIR = os.path.join("json", "archive")
+STATS_FILE = os.path.join("json", "sweeper_stats.json")
+INDEX_FILE = os.path.join(ARCHIVE_DIR, "index.json")
+ARCHIVE_KINDS = ("keeping", "vouchers")
+USED_GRACE_DAYS = 7 # used entries stay in the hot files this long (e.g. for "already used" checks)
+
+
+def archive_path(kind, month):
+    return os.path.join(ARCHIVE_DIR, f"{kind}_{month}.json")
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"[Sweeper] Error loading {path}: {e}")
+        return default
+
+
+def save_json(path, data):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, path)
+
+
+def write_archive(kind, entries, month):
+    """
+    Merges entries (barcode -> info) into the archive file of kind for month.
+    """
+    if not entries:
+        return
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = archive_path(kind, month)
+    archived = load_json(path, {})
+    archived.update(entries)
+    save_json(path, archived)
+
+
+def load_index():
+    """
+    Archived barcodes per kind. Rebuilt from the monthly files if the index is missing.
+    """
+    index = load_json(INDEX_FILE, None)
+    if index is not None:
+        return {kind: set(index.get(kind, [])) for kind in ARCHIVE_KINDS}
+    index = {kind: set() for kind in ARCHIVE_KINDS}
+    for kind in ARCHIVE_KINDS:
+        for path in glob.glob(os.path.join(ARCHIVE_DIR, f"{kind}_*.json")):
+            index[kind].update(load_json(path, {}))
+    if any(index.values()):
+        try:
+            save_index(index)
+        except Exception as e:
+            print(f"[Sweeper] Error saving {INDEX_FILE}: {e}")
+    return index
+
+
+def save_index(index):
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    save_json(INDEX_FILE, {kind: sorted(barcodes) for kind, barcodes in index.items()})
+
+
+def collect(keeping_manager, vouchers, now=None):
+    """
+    Picks the entries to archive. Returns (keeping, vouchers) as barcode -> copy of the entry.
+    """
+    now = now or datetime.now()
+    cutoff = (now - timedelta(days=USED_GRACE_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    keeping = {}
+    for barcode in keeping_manager.expired(now.strftime("%Y-%m-%d")) + keeping_manager.used_before(cutoff):
+        coupon = keeping_manager.get(barcode)
+        if coupon is not None:
+            keeping[barcode] = dict(coupon)
+    dead_vouchers = {}
+    for barcode, voucher in vouchers.items():
+        # Vouchers used before used_date was recorded are archived right away
+        if voucher.get("status") == "used" and voucher.get("used_date", "") < cutoff:
+            dead_vouchers[barcode] = dict(voucher)
+    return keeping, dead_vouchers
+
+
+def dir_size(path):
+    total = 0
+    for name in os.listdir(path) if os.path.isdir(path) else []:
+        total += os.path.getsize(os.path.join(path, name))
+    return total
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class ArchiveWorker(QThread):
+    finished_signal = pyqtSignal(bool, str)
+
+    def __init__(self, keeping, vouchers, month, index):
+        super().__init__()
+        self.keeping = keeping
+        self.vouchers = vouchers
+        self.month = month
+        self.index = index # archived barcodes including this sweep's
+
+    def run(self):
+        try:
+            write_archive("keeping", self.keeping, self.month)
+            write_archive("vouchers", self.vouchers, self.month)
+            save_index(self.index)
+            self.finished_signal.emit(True, "")
+        except Exception as e:
+            self.finished_signal.emit(False, str(e))
+
+
+class ExpirySweeper(QObject):
+    sweep_finished = pyqtSignal(dict) # stats, see get_stats()
+
+    def __init__(self, product_manager, keeping_manager, parent=None):
+        super().__init__(parent)
+        self.product_manager = product_manager
+        self.keeping_manager = keeping_manager
+        self.stats = load_json(STATS_FILE, {})
+        self.archived = load_index()
+        self.worker = None
+        self.pending = None
+
+    @property
+    def running(self):
+        return self.worker is not None
+
+    def is_due(self, now=None):
+        now = now or datetime.now()
+        return not self.stats.get("last_run", "").startswith(now.strftime("%Y-%m-%d"))
+
+    def start(self):
+        if self.running:
+            return False
+        keeping, vouchers = collect(self.keeping_manager, self.product_manager.get_all_vouchers())
+        self.pending = (keeping, vouchers)
+        index = {"keeping": self.archived["keeping"] | set(keeping), "vouchers": self.archived["vouchers"] | set(vouchers)}
+        self.worker = ArchiveWorker(keeping, vouchers, datetime.now().strftime("%Y-%m"), index)
+        self.worker.finished_signal.connect(self.on_archived)
+        self.worker.start()
+        return True
+
+    def is_archived(self, kind, barcode):
+        return barcode in self.archived[kind]
+
+    def on_archived(self, success, error):
+        keeping, vouchers = self.pending
+        # run() returns right after emitting; the thread must be done before it is released
+        self.worker.wait()
+        self.worker = None
+        self.pending = None
+        if not success:
+            print(f"[Sweeper] Error writing archive: {error}")
+            self.finish(0, 0, error)
+            return
+        self.archived["keeping"].update(keeping)
+        self.archived["vouchers"].update(vouchers)
+        # Entries changed since they were collected (e.g. a voucher edited on the settings page) stay
+        removed = self.keeping_manager.remove([b for b, c in keeping.items() if self.keeping_manager.get(b) == c])
+        if removed:
+            self.keeping_manager.save()
+        current = self.product_manager.get_all_vouchers()
+        removed_vouchers = self.product_manager.remove_vouchers([b for b, v in vouchers.items() if current.get(b) == v])
+        self.finish(len(removed), removed_vouchers, "")
+
+    def finish(self, keeping_count, voucher_count, error):
+        self.stats = {
+            "last_run": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "keeping_archived": keeping_count,
+            "vouchers_archived": voucher_count,
+            "total_keeping_archived": self.stats.get("total_keeping_archived", 0) + keeping_count,
+            "total_vouchers_archived": self.stats.get("total_vouchers_archived", 0) + voucher_count,
+            "error": error
+        }
+        try:
+            save_json(STATS_FILE, self.stats)
+        except Exception as e:
+            print(f"[Sweeper] Error saving {STATS_FILE}: {e}")
+        self.sweep_finished.emit(self.get_stats())
+
+    def get_stats(self):
+        """
+        Last sweep result plus the current size of the hot files and the archive.
+        """
+        stats = dict(self.stats)
+        stats.update({
+            "keeping_count": len(self.keeping_manager.coupons),
+            "voucher_count": len(self.product_manager.get_all_vouchers()),
+            "keeping_bytes": file_size(KEEPING_FILE),
+            "voucher_bytes": file_size(VOUCHER_FILE),
+            "archive_bytes": dir_size(ARCHIVE_DIR)
+        })
+        return stats
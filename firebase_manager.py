@@ -1,13 +1,20 @@
 import os
 import sys
 import json
-import random
-import datetime
+import time
+import threading
 
 # Mock database filename
 os.makedirs("json", exist_ok=True)
 MOCK_DB_FILE = os.path.join("json", "firebase_mock_db.json")
 
+# Seconds a resolved account (doc ref, user ref, user name) is reused without querying Firestore
+ACCOUNT_CACHE_TTL = 600
+
+# Firestore round trips one payment/refund is expected to need: account lookup query and
+# user get (skipped when cached), then begin, one batched read and the commit of the transaction
+SETTLEMENT_ROUND_TRIP_BUDGET = 5
+
 # Initial seed data for Mock Mode matching screenshots
 DEFAULT_MOCK_DATA = {
     "users": {
@@ -31,11 +38,32 @@ DEFAULT_MOCK_DATA = {
 }
 
 class FirebaseManager:
-    def __init__(self):
+    def __init__(self, db=None, firestore_module=None):
         self.is_mock = True
         self.db = None
         self.firestore_module = None
         self.mock_data = {}
+        self.account_cache = {} # accountNumber spelling -> resolved account lookup
+        self.account_cache_lock = threading.Lock()
+        self.last_settlement_stats = {}
+        
+        # Injected backend (e.g. mock_firestore.MockFirestoreClient for load tests)
+        if db is not None:
+            self.db = db
+            self.firestore_module = firestore_module
+            self.is_mock = False
+            print("[Firebase] Using injected Firestore backend.")
+            return
+            
+        # In-process stand-in seeded from the mock DB, enabled by DU_MOCK_FIRESTORE
+        if os.environ.get("DU_MOCK_FIRESTORE"):
+            import mock_firestore
+            self.init_mock_db()
+            self.db = mock_firestore.client_from_env(self.mock_data)
+            self.firestore_module = mock_firestore
+            self.is_mock = False
+            print("[Firebase] Using in-process mock Firestore backend (DU_MOCK_FIRESTORE).")
+            return
         
         # Determine credentials path
         if hasattr(sys, '_MEIPASS'):
@@ -86,13 +114,22 @@ class FirebaseManager:
         except Exception as e:
             print(f"[Firebase Mock] Error saving mock DB: {e}")
 
-    def process_payment(self, account_number, pin_input, amount, store_name="DU순천점", bypass_pin=False):
+    def warm_up(self):
         """
-        Process the payment:
-        1. Find account and parent user.
-        2. Verify PIN.
-        3. Withdraw funds and create transaction history & notifications.
-        Returns: (success_bool, message_str, remaining_balance)
+        Opens the Firestore channel (TLS handshake, auth token) with one small query so the
+        first payment does not pay for it. Failures are ignored; the payment path retries anyway.
+        """
+        if self.is_mock or self.db is None:
+            return
+        try:
+            list(self.db.collection_group('accounts').limit(1).stream())
+        except Exception as e:
+            print(f"[Firebase] Warm-up query failed: {e}")
+
+    @staticmethod
+    def account_candidates(account_number):
+        """
+        Returns the accountNumber spellings to look up for a scanned/typed account number.
         """
         # Normalize account number candidates to handle different formatting
         candidates = [account_number]
@@ -114,108 +151,123 @@ class FirebaseManager:
         for c in candidates:
             if c not in unique_candidates:
                 unique_candidates.append(c)
+        return unique_candidates
+
+    def process_payment(self, account_number, pin_input, amount, store_name="DU순천점", bypass_pin=False, idempotency_key=None):
+        """
+        Process the payment:
+        1. Find account and parent user.
+        2. Verify PIN.
+        3. Withdraw funds and create transaction history & notifications.
+        If idempotency_key is given it is used as the transaction document id, so a retried
+        request with the same key is applied at most once.
+        Returns: (success_bool, message_str, remaining_balance)
+        """
+        unique_candidates = self.account_candidates(account_number)
 
         if self.is_mock:
             return False, "결제 서버와 연결되어 있지 않습니다. (credentials 파일 확인 필요)", 0.0
         else:
-            return self._process_real_payment(unique_candidates, pin_input, amount, store_name, bypass_pin)
+            return self._process_real_payment(unique_candidates, pin_input, amount, store_name, bypass_pin, idempotency_key)
 
-    def _process_mock_payment(self, candidates, pin_input, amount, store_name, bypass_pin=False):
-        # 1. Find user & account
-        found_uid = None
-        found_user = None
-        for uid, user_info in self.mock_data.get("users", {}).items():
-            acc_info = user_info.get("accounts", {}).get("main", {})
-            if acc_info.get("accountNumber") in candidates:
-                found_uid = uid
-                found_user = user_info
-                break
-                
-        if not found_user:
-            return False, "등록된 계좌를 찾을 수 없습니다.", 0.0
-            
-        # 2. Verify PIN
-        if not bypass_pin and found_user.get("pin") != pin_input:
-            return False, "비밀번호(PIN)가 일치하지 않습니다.", 0.0
-            
-        # 3. Check Balance
-        main_account = found_user["accounts"]["main"]
-        current_balance = float(main_account.get("balance", 0))
-        if current_balance < amount:
-            return False, f"잔액이 부족합니다.\n현재 잔액: {int(current_balance):,}원\n결제 금액: {int(amount):,}원", current_balance
-            
-        # 4. Withdraw (Transaction Simulation)
-        new_balance = current_balance - amount
-        main_account["balance"] = new_balance
-        
-        # 5. Add Transaction Log
-        tx_id = f"mock_tx_{random.randint(100000, 999999)}"
-        timestamp_str = datetime.datetime.now().strftime("%Y년 %m월 %d일 %p %I시 %M분 %S초").replace("AM", "오전").replace("PM", "오후") + " UTC+9"
+    def _lookup_account(self, candidates, stats=None):
+        """
+        Resolves the account for the candidate numbers.
+        Returns (account_doc_ref, user_doc_ref, user_data) or None if no account matches.
+        Repeat customers are served from the TTL cache, in which case user_data only holds 'name'.
+        """
+        now = time.time()
+        with self.account_cache_lock:
+            for c in candidates:
+                cached = self.account_cache.get(c)
+                if cached and cached["expires_at"] > now:
+                    return cached["account_ref"], cached["user_ref"], {"name": cached["user_name"]}
+
+        # Search accounts subcollection group using "in" operator
+        accounts_ref = self.db.collection_group('accounts')
+        query = accounts_ref.where('accountNumber', 'in', candidates).limit(1)
+        docs = list(query.stream())
+        if stats is not None:
+            stats["round_trips"] += 1
         
-        if "transactions" not in found_user:
-            found_user["transactions"] = {}
+        if not docs:
+            return None
             
-        found_user["transactions"][tx_id] = {
-            "amount": amount,
-            "balance_after": new_balance,
-            "description": store_name,
-            "is_deposit": False,
-            "memo_to_me": "",
-            "memo_to_recipient": "",
-            "recipientName": store_name,
-            "senderName": found_user.get("name", "고객"),
-            "timestamp": timestamp_str,
-            "type": "PAYMENT"
-        }
+        account_doc_ref = docs[0].reference
+        user_doc_ref = account_doc_ref.parent.parent # users/{uid}
         
-        # 6. Add Notification
-        notif_id = f"mock_notif_{random.randint(100000, 999999)}"
-        if "notifications" not in found_user:
-            found_user["notifications"] = {}
-            
-        found_user["notifications"][notif_id] = {
-            "message": f"{store_name}에서 {int(amount):,}원이 결제되었습니다.",
-            "read": False,
-            "timestamp": timestamp_str
-        }
+        user_snap = user_doc_ref.get()
+        user_data = user_snap.to_dict()
+        if stats is not None:
+            stats["round_trips"] += 1
         
-        # Save Mock Database changes
-        self.save_mock_db()
-        return True, "결제가 정상적으로 완료되었습니다.", new_balance
+        if user_data:
+            entry = {
+                "account_ref": account_doc_ref,
+                "user_ref": user_doc_ref,
+                "user_name": user_data.get('name', '고객'),
+                "expires_at": now + ACCOUNT_CACHE_TTL
+            }
+            with self.account_cache_lock:
+                for c in candidates + [docs[0].to_dict().get('accountNumber')]:
+                    if c:
+                        self.account_cache[c] = entry
+        return account_doc_ref, user_doc_ref, user_data
 
-    def _process_real_payment(self, candidates, pin_input, amount, store_name, bypass_pin=False):
+    def invalidate_account(self, candidates):
+        with self.account_cache_lock:
+            for c in candidates:
+                entry = self.account_cache.pop(c, None)
+                if entry:
+                    # Drop the other spellings that point at the same account
+                    for key in [k for k, v in self.account_cache.items() if v is entry]:
+                        del self.account_cache[key]
+
+    def _read_for_update(self, tx, acc_ref, tx_ref, check_existing, stats):
+        """
+        Reads the account and, for idempotent requests, the transaction document in one
+        batched call inside the Firestore transaction. Returns (acc_data, prev_tx_data).
+        """
+        stats["round_trips"] += 2 # begin + read
+        if not check_existing:
+            return acc_ref.get(transaction=tx).to_dict(), None
+        snaps = {snap.reference.path: snap for snap in tx.get_all([acc_ref, tx_ref])}
+        acc_snap = snaps.get(acc_ref.path)
+        prev_snap = snaps.get(tx_ref.path)
+        acc_data = acc_snap.to_dict() if acc_snap is not None and acc_snap.exists else None
+        prev_data = prev_snap.to_dict() if prev_snap is not None and prev_snap.exists else None
+        return acc_data, prev_data
+
+    def _record_settlement_stats(self, kind, stats, started_at):
+        stats["kind"] = kind
+        stats["elapsed_ms"] = round((time.perf_counter() - started_at) * 1000, 1)
+        self.last_settlement_stats = stats
+        if stats["round_trips"] > SETTLEMENT_ROUND_TRIP_BUDGET:
+            print(f"[Firebase] {kind} used {stats['round_trips']} round trips (budget {SETTLEMENT_ROUND_TRIP_BUDGET}), {stats['elapsed_ms']} ms")
+
+    def _process_real_payment(self, candidates, pin_input, amount, store_name, bypass_pin=False, idempotency_key=None):
+        started_at = time.perf_counter()
+        stats = {"round_trips": 0, "transaction_attempts": 0}
         try:
-            # 1. Search accounts subcollection group using "in" operator
-            accounts_ref = self.db.collection_group('accounts')
-            query = accounts_ref.where('accountNumber', 'in', candidates).limit(1)
-            docs = list(query.stream())
-            
-            if not docs:
+            # 1. Find account and parent user (cached for repeat customers)
+            lookup = self._lookup_account(candidates, stats)
+            if lookup is None:
+                self.invalidate_account(candidates)
                 return False, "등록된 계좌를 찾을 수 없습니다.", 0.0
                 
-            account_doc_ref = docs[0].reference
-            user_doc_ref = account_doc_ref.parent.parent # users/{uid}
-            
-            user_snap = user_doc_ref.get()
-            user_data = user_snap.to_dict()
+            account_doc_ref, user_doc_ref, user_data = lookup
             
             if not user_data:
+                self.invalidate_account(candidates)
                 return False, "사용자 정보를 조회할 수 없습니다.", 0.0
                 
-            # 1.5 Update paymentState to 'processing'
-            try:
-                account_doc_ref.update({
-                    'paymentState': {
-                        'status': 'processing',
-                        'amount': amount,
-                        'storeName': store_name
-                    }
-                })
-            except Exception as e_state:
-                print(f"[Firebase] Error setting processing paymentState: {e_state}")
-                
-            # 2. Verify PIN
+            # 2. Verify PIN (a cached lookup does not carry the PIN, so fetch the user then)
+            if not bypass_pin and 'pin' not in user_data:
+                user_data = user_doc_ref.get().to_dict() or {}
+                stats["round_trips"] += 1
             if not bypass_pin and user_data.get('pin') != pin_input:
+                # Every failed lookup or check re-reads the account next time, not only errors
+                self.invalidate_account(candidates)
                 # Update paymentState to 'failed' before returning
                 try:
                     account_doc_ref.update({
@@ -230,27 +282,41 @@ class FirebaseManager:
                     pass
                 return False, "비밀번호(PIN)가 일치하지 않습니다.", 0.0
                 
-            # 3. Use Firestore Transaction for Atomic updates
+            # 3. Use Firestore Transaction for Atomic updates.
+            # The paymentState is written by the same commit as the balance, so a successful
+            # payment costs a single write RPC (no separate 'processing'/'success' updates).
             transaction = self.db.transaction()
             
             @self.firestore_module.transactional
             def update_in_transaction(tx, acc_ref, usr_ref, usr_name):
-                acc_snap = acc_ref.get(transaction=tx)
-                acc_data = acc_snap.to_dict()
+                stats["transaction_attempts"] += 1
+                tx_ref = usr_ref.collection('transactions').document(idempotency_key) if idempotency_key else usr_ref.collection('transactions').document()
+                acc_data, prev_data = self._read_for_update(tx, acc_ref, tx_ref, bool(idempotency_key), stats)
                 if not acc_data:
                     raise Exception("계좌 데이터를 읽을 수 없습니다.")
                     
+                # A retry of an already applied request returns the recorded result
+                if prev_data is not None:
+                    return float(prev_data.get('balance_after', 0.0))
+                    
                 cur_bal = float(acc_data.get('balance', 0.0))
                 if cur_bal < amount:
                     raise Exception(f"잔액이 부족합니다.\n현재 잔액: {int(cur_bal):,}원\n결제 금액: {int(amount):,}원")
                     
                 new_bal = cur_bal - amount
                 
-                # Update Account Balance
-                tx.update(acc_ref, {'balance': new_bal})
+                # Update Account Balance together with the final paymentState
+                tx.update(acc_ref, {
+                    'balance': new_bal,
+                    'paymentState': {
+                        'status': 'success',
+                        'amount': amount,
+                        'storeName': store_name,
+                        'balanceAfter': new_bal
+                    }
+                })
                 
                 # Add Transaction Document
-                tx_ref = usr_ref.collection('transactions').document()
                 tx.set(tx_ref, {
                     'amount': amount,
                     'balance_after': new_bal,
@@ -265,35 +331,25 @@ class FirebaseManager:
                 })
                 
                 # Add Notification Document
-                notif_ref = usr_ref.collection('notifications').document()
+                notif_ref = usr_ref.collection('notifications').document(idempotency_key) if idempotency_key else usr_ref.collection('notifications').document()
                 tx.set(notif_ref, {
                     'message': f"{store_name}에서 {int(amount):,}원이 결제되었습니다.",
                     'read': False,
                     'timestamp': self.firestore_module.SERVER_TIMESTAMP
                 })
                 
+                stats["round_trips"] += 1 # commit
                 return new_bal
 
             user_name = user_data.get('name', '고객')
             new_balance = update_in_transaction(transaction, account_doc_ref, user_doc_ref, user_name)
-            
-            # Update paymentState to 'success'
-            try:
-                account_doc_ref.update({
-                    'paymentState': {
-                        'status': 'success',
-                        'amount': amount,
-                        'storeName': store_name,
-                        'balanceAfter': new_balance
-                    }
-                })
-            except Exception as e_state:
-                print(f"[Firebase] Error setting success paymentState: {e_state}")
+            self._record_settlement_stats("payment", stats, started_at)
                 
             return True, "결제가 정상적으로 완료되었습니다.", new_balance
             
         except Exception as e:
             error_msg = str(e)
+            self.invalidate_account(candidates)
             
             # Update paymentState to 'failed'
             try:
@@ -314,124 +370,67 @@ class FirebaseManager:
                 return False, f"데이터베이스 색인(Index) 설정이 필요합니다. 아래 에러 로그를 확인하고 색인을 생성해 주세요.\n\n{error_msg}", 0.0
             return False, f"결제 진행 중 오류가 발생했습니다:\n{error_msg}", 0.0
 
-    def process_refund(self, account_number, amount, store_name="DU순천점"):
+    def process_refund(self, account_number, amount, store_name="DU순천점", idempotency_key=None):
         """
         Process the refund:
         1. Find account and parent user.
         2. Deposit funds (new_balance = current_balance + amount).
         3. Write transaction log matching the requested format.
+        idempotency_key works as in process_payment.
         """
-        candidates = [account_number]
-        stripped = "".join(c for c in account_number if c.isdigit())
-        if len(stripped) == 13:
-            candidates.append(f"{stripped[:3]}-{stripped[3:7]}-{stripped[7:11]}-{stripped[11:]}")
-        elif len(stripped) == 11:
-            candidates.append(f"{stripped[:3]}-{stripped[3:7]}-{stripped[7:]}-11")
-        if len(account_number) == 13 and account_number.count('-') == 2:
-            candidates.append(account_number + "-11")
-            
-        unique_candidates = []
-        for c in candidates:
-            if c not in unique_candidates:
-                unique_candidates.append(c)
+        unique_candidates = self.account_candidates(account_number)
                 
         if self.is_mock:
             return False, "결제 서버와 연결되어 있지 않습니다. (credentials 파일 확인 필요)", 0.0
         else:
-            return self._process_real_refund(unique_candidates, amount, store_name)
+            return self._process_real_refund(unique_candidates, amount, store_name, idempotency_key)
 
-    def _process_mock_refund(self, candidates, amount, store_name):
-        # 1. Find user & account
-        found_uid = None
-        found_user = None
-        for uid, user_info in self.mock_data.get("users", {}).items():
-            acc_info = user_info.get("accounts", {}).get("main", {})
-            if acc_info.get("accountNumber") in candidates:
-                found_uid = uid
-                found_user = user_info
-                break
-                
-        if not found_user:
-            return False, "등록된 계좌를 찾을 수 없습니다.", 0.0
-            
-        # 2. Deposit
-        main_account = found_user["accounts"]["main"]
-        current_balance = float(main_account.get("balance", 0))
-        new_balance = current_balance + amount
-        main_account["balance"] = new_balance
-        
-        # 3. Add Transaction Log
-        tx_id = f"mock_tx_{random.randint(100000, 999999)}"
-        timestamp_str = datetime.datetime.now().strftime("%Y년 %m월 %d일 %p %I시 %M분 %S초").replace("AM", "오전").replace("PM", "오후") + " UTC+9"
-        
-        if "transactions" not in found_user:
-            found_user["transactions"] = {}
-            
-        usr_name = found_user.get("name", "고객")
-        found_user["transactions"][tx_id] = {
-            "amount": amount,
-            "balance_after": new_balance,
-            "description": "환불",
-            "is_deposit": True,
-            "memo_from_sender": "",
-            "memo_to_me": "",
-            "recipientName": usr_name,
-            "senderName": store_name,
-            "timestamp": timestamp_str,
-            "type": "입금"
-        }
-        
-        # 4. Add Notification
-        notif_id = f"mock_notif_{random.randint(100000, 999999)}"
-        if "notifications" not in found_user:
-            found_user["notifications"] = {}
-            
-        found_user["notifications"][notif_id] = {
-            "message": f"{store_name}에서 {int(amount):,}원이 환불되었습니다.",
-            "read": False,
-            "timestamp": timestamp_str
-        }
-        
-        self.save_mock_db()
-        return True, "환불 처리가 정상적으로 완료되었습니다.", new_balance
-
-    def _process_real_refund(self, candidates, amount, store_name):
+    def _process_real_refund(self, candidates, amount, store_name, idempotency_key=None):
+        started_at = time.perf_counter()
+        stats = {"round_trips": 0, "transaction_attempts": 0}
         try:
-            # 1. Search accounts subcollection group using "in" operator
-            accounts_ref = self.db.collection_group('accounts')
-            query = accounts_ref.where('accountNumber', 'in', candidates).limit(1)
-            docs = list(query.stream())
-            
-            if not docs:
+            # 1. Find account and parent user (cached for repeat customers)
+            lookup = self._lookup_account(candidates, stats)
+            if lookup is None:
+                self.invalidate_account(candidates)
                 return False, "등록된 계좌를 찾을 수 없습니다.", 0.0
                 
-            account_doc_ref = docs[0].reference
-            user_doc_ref = account_doc_ref.parent.parent # users/{uid}
-            
-            user_snap = user_doc_ref.get()
-            user_data = user_snap.to_dict()
+            account_doc_ref, user_doc_ref, user_data = lookup
             
             if not user_data:
+                self.invalidate_account(candidates)
                 return False, "사용자 정보를 조회할 수 없습니다.", 0.0
                 
-            # 2. Use Firestore Transaction for Atomic updates
+            # 2. Use Firestore Transaction for Atomic updates (paymentState included in the same commit)
             transaction = self.db.transaction()
             
             @self.firestore_module.transactional
             def update_in_transaction(tx, acc_ref, usr_ref, usr_name):
-                acc_snap = acc_ref.get(transaction=tx)
-                acc_data = acc_snap.to_dict()
+                stats["transaction_attempts"] += 1
+                tx_ref = usr_ref.collection('transactions').document(idempotency_key) if idempotency_key else usr_ref.collection('transactions').document()
+                acc_data, prev_data = self._read_for_update(tx, acc_ref, tx_ref, bool(idempotency_key), stats)
                 if not acc_data:
                     raise Exception("계좌 데이터를 읽을 수 없습니다.")
                     
+                # A retry of an already applied request returns the recorded result
+                if prev_data is not None:
+                    return float(prev_data.get('balance_after', 0.0))
+                    
                 cur_bal = float(acc_data.get('balance', 0.0))
                 new_bal = cur_bal + amount
                 
-                # Update Account Balance
-                tx.update(acc_ref, {'balance': new_bal})
+                # Update Account Balance together with the final paymentState
+                tx.update(acc_ref, {
+                    'balance': new_bal,
+                    'paymentState': {
+                        'status': 'success',
+                        'amount': amount,
+                        'storeName': f"환불-{store_name}",
+                        'balanceAfter': new_bal
+                    }
+                })
                 
                 # Add Transaction Document matching requested format
-                tx_ref = usr_ref.collection('transactions').document()
                 tx.set(tx_ref, {
                     'amount': amount,
                     'balance_after': new_bal,
@@ -446,32 +445,22 @@ class FirebaseManager:
                 })
                 
                 # Add Notification Document
-                notif_ref = usr_ref.collection('notifications').document()
+                notif_ref = usr_ref.collection('notifications').document(idempotency_key) if idempotency_key else usr_ref.collection('notifications').document()
                 tx.set(notif_ref, {
                     'message': f"{store_name}에서 {int(amount):,}원이 환불되었습니다.",
                     'read': False,
                     'timestamp': self.firestore_module.SERVER_TIMESTAMP
                 })
                 
+                stats["round_trips"] += 1 # commit
                 return new_bal
                 
             user_name = user_data.get('name', '고객')
             new_balance = update_in_transaction(transaction, account_doc_ref, user_doc_ref, user_name)
-            
-            # Update paymentState to 'success' (for consistency)
-            try:
-                account_doc_ref.update({
-                    'paymentState': {
-                        'status': 'success',
-                        'amount': amount,
-                        'storeName': f"환불-{store_name}",
-                        'balanceAfter': new_balance
-                    }
-                })
-            except Exception:
-                pass
+            self._record_settlement_stats("refund", stats, started_at)
                 
             return True, "환불 처리가 정상적으로 완료되었습니다.", new_balance
             
         except Exception as e:
+            self.invalidate_account(candidates)
             return False, f"환불 처리 중 오류가 발생했습니다: {e}", 0.0
@@ -0,0 +1,129 @@
+"""
+Hangul helpers for search: choseong (initial consonant) strings and jamo decomposition,
+so "ㅇㅅㄷ", "역삼" and a half-typed "역삼ㄷ" all match "역삼동".
+"""
+import functools
+
+CHOSEONG = ["ㄱ", "ㄲ", "ㄴ", "ㄷ", "ㄸ", "ㄹ", "ㅁ", "ㅂ", "ㅃ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅉ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+JUNGSEONG = ["ㅏ", "ㅐ", "ㅑ", "ㅒ", "ㅓ", "ㅔ", "ㅕ", "ㅖ", "ㅗ", "ㅘ", "ㅙ", "ㅚ", "ㅛ", "ㅜ", "ㅝ", "ㅞ", "ㅟ", "ㅠ", "ㅡ", "ㅢ", "ㅣ"]
+JONGSEONG = ["", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ", "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
+
+# Compound jamo split into the keystrokes that type them (an IME shows "고" before "과")
+COMPOUND_JAMO = {
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ"
+}
+
+CHOSEONG_SET = set(CHOSEONG)
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+
+
+def is_syllable(char):
+    return HANGUL_BASE <= ord(char) <= HANGUL_LAST
+
+
+def get_choseong(text):
+    result = []
+    for char in text:
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            result.append(CHOSEONG[(code - HANGUL_BASE) // 588])
+        else:
+            result.append(char)
+    return "".join(result)
+
+
+def decompose(text):
+    """
+    Returns text with every syllable (and compound jamo) spelled out as single jamo.
+    """
+    result = []
+    for char in text:
+        code = ord(char)
+        if HANGUL_BASE <= code <= HANGUL_LAST:
+            offset = code - HANGUL_BASE
+            result.append(CHOSEONG[offset // 588])
+            result.append(COMPOUND_JAMO.get(JUNGSEONG[(offset % 588) // 28], JUNGSEONG[(offset % 588) // 28]))
+            jong = JONGSEONG[offset % 28]
+            if jong:
+                result.append(COMPOUND_JAMO.get(jong, jong))
+        else:
+            result.append(COMPOUND_JAMO.get(char, char))
+    return "".join(result)
+
+
+def is_choseong_only(text):
+    stripped = text.replace(" ", "")
+    return bool(stripped) and all(c in CHOSEONG_SET for c in stripped)
+
+
+def normalize(text):
+    return "".join(text.lower().split())
+
+
+def _char_matches(q, t, is_last):
+    if q == t:
+        return True
+    if q in CHOSEONG_SET:
+        return get_choseong(t) == q
+    # The last character may be a syllable still being typed ("역사" while typing "역삼")
+    return is_last and decompose(t).startswith(decompose(q))
+
+
+def matches(query, text):
+    """
+    True if query occurs in text, where each query character may also be the choseong
+    of the text character ("ㅇㅅㄷ", "역ㅅ동") and the last one may be half typed ("역삼ㄷ", "역사").
+    """
+    query = normalize(query)
+    text = normalize(text)
+    if not query or query in text:
+        return True
+    last = len(query) - 1
+    for start in range(len(text) - last):
+        if all(_char_matches(q, text[start + i], i == last) for i, q in enumerate(query)):
+            return True
+    return False
+
+
+def typed_length(query):
+    # Fully typed characters are exact; the last one may be a syllable still being typed
+    return len(query) if is_choseong_only(query) else len(query) - 1
+
+
+def search_grams(text, exact_upto=None, syllables=False):
+    """
+    Index keys of a token: character bigrams plus '#'-prefixed choseong unigrams and
+    bigrams. For a query, exact_upto limits the character grams to the fully typed part.
+    With syllables, complete syllables are also keys on their own (see completions).
+    """
+    keys = set()
+    cho = get_choseong(text)
+    chars = text if exact_upto is None else text[:exact_upto]
+    if syllables:
+        keys.update(c for c in chars if is_syllable(c))
+    if exact_upto is None:
+        keys.update("#" + c for c in cho) # choseong unigrams answer one-character queries
+    elif len(text) == 1:
+        return {"#" + cho}
+    for i in range(len(text) - 1):
+        keys.add("#" + cho[i:i + 2])
+    for i in range(len(chars) - 1):
+        if not (chars[i] in CHOSEONG_SET or chars[i + 1] in CHOSEONG_SET):
+            keys.add(chars[i:i + 2])
+    return keys
+
+
+@functools.lru_cache(maxsize=1024)
+def completions(char):
+    """
+    The syllables a half-typed syllable can still become ("가" -> "가", "각", "간", ..., "갛"),
+    i.e. the syllable keys a one-character query has to look up.
+    """
+    if not is_syllable(char):
+        return ()
+    typed = decompose(char)
+    start = HANGUL_BASE + (ord(char) - HANGUL_BASE) // 588 * 588
+    return tuple(chr(code) for code in range(start, start + 588) if decompose(chr(code)).startswith(typed))
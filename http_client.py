@@ -0,0 +1,159 @@
+"""
+Shared HTTP client for the external APIs (Juso address search, Naver local search).
+
+One pooled keep-alive session is reused by every caller, so only the first request to a
+host pays for DNS and the TLS handshake. Uses httpx with HTTP/2 when httpx and h2 are
+installed, requests otherwise. GET requests are retried with exponential backoff on
+connection errors, timeouts and 429/5xx answers, with timeouts and retry counts set per
+endpoint. get_metrics() reports request counts, retries, errors and latency per endpoint.
+"""
+import time
+import threading
+from urllib.parse import urlsplit
+
+from lazy_imports import lazy_import, is_available
+
+requests = lazy_import("requests")
+httpx = lazy_import("httpx")
+
+USE_HTTP2 = is_available("httpx") and is_available("h2")
+
+# name -> url, (connect, read) timeout in seconds, retries after the first attempt
+ENDPOINTS = {
+    "juso": {
+        "url": "https://business.juso.go.kr/addrlink/addrLinkApi.do",
+        "timeout": (3.05, 7),
+        "retries": 2
+    },
+    "naver_local": {
+        "url": "https://openapi.naver.com/v1/search/local.json",
+        "timeout": (3.05, 5),
+        "retries": 1
+    }
+}
+DEFAULT_TIMEOUT = (3.05, 10)
+DEFAULT_RETRIES = 1
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.3 # seconds; doubled on each retry
+BACKOFF_MAX = 3.0
+POOL_SIZE = 4
+
+_client = None
+_client_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+def _create_client():
+    if USE_HTTP2:
+        print("[HTTP] Using httpx with HTTP/2")
+        limits = httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE)
+        return httpx.Client(http2=True, limits=limits)
+    session = requests.Session()
+    # Retries are done in get() so they are counted and can be cancelled
+    adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = _create_client()
+        return _client
+
+
+def _transport_errors():
+    if USE_HTTP2:
+        return (httpx.TransportError,)
+    return (requests.ConnectionError, requests.Timeout)
+
+
+def _record(endpoint, elapsed, retries=0, error=False, status=None):
+    with _metrics_lock:
+        m = _metrics.setdefault(endpoint, {"requests": 0, "errors": 0, "retries": 0,
+                                           "total_ms": 0.0, "max_ms": 0.0, "last_status": None})
+        m["requests"] += 1
+        m["retries"] += retries
+        m["errors"] += 1 if error else 0
+        m["total_ms"] += elapsed * 1000
+        m["max_ms"] = max(m["max_ms"], elapsed * 1000)
+        if status is not None:
+            m["last_status"] = status
+
+
+def get_metrics():
+    """
+    Returns a copy of the per-endpoint metrics with the average latency added.
+    """
+    with _metrics_lock:
+        result = {}
+        for endpoint, m in _metrics.items():
+            m = dict(m)
+            m["avg_ms"] = round(m["total_ms"] / m["requests"], 1) if m["requests"] else 0.0
+            m["total_ms"] = round(m["total_ms"], 1)
+            m["max_ms"] = round(m["max_ms"], 1)
+            result[endpoint] = m
+        return result
+
+
+def _timeout_arg(timeout):
+    if USE_HTTP2:
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        return httpx.Timeout(read, connect=connect)
+    return timeout
+
+
+def get(endpoint, params=None, headers=None, is_cancelled=None):
+    """
+    GET on a named endpoint (see ENDPOINTS) through the shared session. Returns the
+    response of the last attempt; raises the transport error if every attempt failed,
+    or RequestCancelled if is_cancelled() turns true between attempts.
+    """
+    config = ENDPOINTS[endpoint]
+    timeout = _timeout_arg(config.get("timeout", DEFAULT_TIMEOUT))
+    retries = config.get("retries", DEFAULT_RETRIES)
+    client = get_client()
+    errors = _transport_errors()
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = client.get(config["url"], params=params, headers=headers, timeout=timeout)
+            if response.status_code not in RETRY_STATUS or attempt >= retries:
+                _record(endpoint, time.perf_counter() - started, attempt,
+                        error=response.status_code >= 400, status=response.status_code)
+                return response
+            print(f"[HTTP] {endpoint}: status {response.status_code}, retrying")
+        except errors as e:
+            if attempt >= retries:
+                _record(endpoint, time.perf_counter() - started, attempt, error=True)
+                raise
+            print(f"[HTTP] {endpoint}: {type(e).__name__}, retrying")
+        attempt += 1
+        time.sleep(min(BACKOFF_BASE * (2 ** (attempt - 1)), BACKOFF_MAX))
+        if is_cancelled and is_cancelled():
+            _record(endpoint, time.perf_counter() - started, attempt)
+            raise RequestCancelled(endpoint)
+
+
+def _prewarm(endpoint):
+    parts = urlsplit(ENDPOINTS[endpoint]["url"])
+    try:
+        get_client().head(f"{parts.scheme}://{parts.netloc}/", timeout=_timeout_arg(DEFAULT_TIMEOUT))
+    except Exception as e:
+        print(f"[HTTP] Prewarm {endpoint} failed: {e}")
+
+
+def prewarm(endpoint):
+    """
+    Opens a pooled connection to the endpoint's host in the background (DNS + TLS),
+    e.g. when the address search dialog opens, so the first search does not wait for it.
+    """
+    threading.Thread(target=_prewarm, args=(endpoint,), name="HttpPrewarm", daemon=True).start()
@@ -0,0 +1,204 @@
+import os
+import json
+import heapq
+import random
+import threading
+from datetime import datetime, timedelta
+
+os.makedirs("json", exist_ok=True)
+KEEPING_FILE = os.path.join("json", "keeping.json")
+# Changes since keeping.json was last written, one JSON object per line
+KEEPING_JOURNAL_FILE = os.path.join("json", "keeping_journal.jsonl")
+JOURNAL_COMPACT_LINES = 500 # keeping.json is rewritten once the journal is this long
+
+KEEPING_DAYS = 30
+STATUS_AVAILABLE = "사용가능"
+STATUS_USED = "사용완료"
+
+
+class KeepingCouponManager:
+    """
+    Keeping coupon ledger (98... barcodes) kept in memory, indexed by coupon barcode and
+    phone number, with coupons ordered by expiry date for purging. Issuing or using a
+    coupon appends one line to a journal instead of rewriting keeping.json.
+    """
+
+    def __init__(self, file_path=None, journal_path=None):
+        self.file_path = file_path or KEEPING_FILE
+        self.journal_path = journal_path or KEEPING_JOURNAL_FILE
+        self.lock = threading.RLock()
+        self.coupons = {} # barcode -> coupon info (same layout as keeping.json)
+        self.by_phone = {} # phone -> set of barcodes
+        self.expiry_heap = [] # (expiry_date, barcode); stale entries are skipped when popped
+        self.journal_lines = 0
+        self.load()
+
+    def load(self):
+        with self.lock:
+            self.coupons = {}
+            if os.path.exists(self.file_path):
+                try:
+                    with open(self.file_path, "r", encoding="utf-8") as f:
+                        self.coupons = json.load(f)
+                except Exception as e:
+                    print(f"[Keeping] Error loading {self.file_path}: {e}")
+            self.journal_lines = 0
+            if os.path.exists(self.journal_path):
+                try:
+                    with open(self.journal_path, "r", encoding="utf-8") as f:
+                        for line in f:
+                            try:
+                                entry = json.loads(line)
+                            except ValueError:
+                                continue # torn last line after a crash
+                            if entry.get("coupon") is None:
+                                self.coupons.pop(entry["barcode"], None)
+                            else:
+                                self.coupons[entry["barcode"]] = entry["coupon"]
+                            self.journal_lines += 1
+                except Exception as e:
+                    print(f"[Keeping] Error reading {self.journal_path}: {e}")
+            self.rebuild_indexes()
+
+    def rebuild_indexes(self):
+        self.by_phone = {}
+        for barcode, coupon in self.coupons.items():
+            self.by_phone.setdefault(coupon.get("phone", ""), set()).add(barcode)
+        self.expiry_heap = [(c.get("expiry_date", ""), b) for b, c in self.coupons.items()]
+        heapq.heapify(self.expiry_heap)
+
+    def _index(self, barcode, coupon):
+        self.by_phone.setdefault(coupon.get("phone", ""), set()).add(barcode)
+        heapq.heappush(self.expiry_heap, (coupon.get("expiry_date", ""), barcode))
+
+    def _unindex(self, barcode, coupon):
+        barcodes = self.by_phone.get(coupon.get("phone", ""))
+        if barcodes is not None:
+            barcodes.discard(barcode)
+            if not barcodes:
+                del self.by_phone[coupon.get("phone", "")]
+
+    def _journal(self, changes):
+        # changes: [(barcode, coupon or None for a removal)]
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                for barcode, coupon in changes:
+                    f.write(json.dumps({"barcode": barcode, "coupon": coupon}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_lines += len(changes)
+        except Exception as e:
+            print(f"[Keeping] Error writing journal: {e}")
+            self.save()
+            return
+        if self.journal_lines >= JOURNAL_COMPACT_LINES:
+            self.save()
+
+    def save(self):
+        """
+        Writes the full ledger to keeping.json and empties the journal.
+        """
+        with self.lock:
+            tmp_path = self.file_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.coupons, f, ensure_ascii=False, indent=4)
+                os.replace(tmp_path, self.file_path)
+                if os.path.exists(self.journal_path):
+                    os.remove(self.journal_path)
+                self.journal_lines = 0
+            except Exception as e:
+                print(f"[Keeping] Error saving {self.file_path}: {e}")
+
+    def get(self, barcode):
+        with self.lock:
+            return self.coupons.get(barcode)
+
+    def find_by_phone(self, phone, available_only=False):
+        with self.lock:
+            coupons = [(b, self.coupons[b]) for b in self.by_phone.get(phone, ())]
+        if available_only:
+            coupons = [(b, c) for b, c in coupons if c.get("status") == STATUS_AVAILABLE]
+        return sorted(coupons, key=lambda bc: bc[1].get("expiry_date", ""))
+
+    def _new_barcode(self):
+        while True:
+            barcode = "98" + "".join(str(random.randint(0, 9)) for _ in range(11))
+            if barcode not in self.coupons:
+                return barcode
+
+    def issue(self, phone, product_barcode, product_name, quantity=1, days=KEEPING_DAYS):
+        """
+        Issues quantity coupons for one product. Returns [(barcode, coupon)].
+        """
+        now = datetime.now()
+        issued = []
+        with self.lock:
+            for _ in range(quantity):
+                barcode = self._new_barcode()
+                coupon = {
+                    "phone": phone,
+                    "product_barcode": product_barcode,
+                    "product_name": product_name,
+                    "issue_date": now.strftime("%Y-%m-%d %H:%M:%S"),
+                    "expiry_date": (now + timedelta(days=days)).strftime("%Y-%m-%d"),
+                    "status": STATUS_AVAILABLE
+                }
+                self.coupons[barcode] = coupon
+                self._index(barcode, coupon)
+                issued.append((barcode, coupon))
+            self._journal(issued)
+        return issued
+
+    def mark_used(self, barcode):
+        with self.lock:
+            coupon = self.coupons.get(barcode)
+            if coupon is None:
+                return False
+            coupon["status"] = STATUS_USED
+            coupon["used_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._journal([(barcode, coupon)])
+            return True
+
+    def remove(self, barcodes):
+        """
+        Drops coupons from the ledger (e.g. after archiving them). Returns the removed coupons.
+        """
+        removed = {}
+        with self.lock:
+            for barcode in barcodes:
+                coupon = self.coupons.pop(barcode, None)
+                if coupon is not None:
+                    self._unindex(barcode, coupon)
+                    removed[barcode] = coupon
+            if removed:
+                self._journal([(barcode, None) for barcode in removed])
+        return removed
+
+    def used_before(self, cutoff):
+        """
+        Barcodes of coupons used before cutoff ("YYYY-MM-DD HH:MM:SS").
+        """
+        with self.lock:
+            return [b for b, c in self.coupons.items()
+                    if c.get("status") == STATUS_USED and c.get("used_date", "") < cutoff]
+
+    def expired(self, today=None):
+        """
+        Barcodes of the coupons whose expiry date is before today ("YYYY-MM-DD"), oldest
+        first. They stay on the expiry heap until remove() drops them from the ledger, so
+        coupons the caller fails to archive are found again; stale heap entries are dropped.
+        """
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        result = []
+        current = []
+        with self.lock:
+            while self.expiry_heap and self.expiry_heap[0][0] < today:
+                expiry_date, barcode = heapq.heappop(self.expiry_heap)
+                coupon = self.coupons.get(barcode)
+                if coupon is not None and coupon.get("expiry_date", "") == expiry_date:
+                    result.append(barcode)
+                    current.append((expiry_date, barcode))
+            for item in current:
+                heapq.heappush(self.expiry_heap, item)
+        return result
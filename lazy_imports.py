@@ -0,0 +1,91 @@
+import sys
+import time
+import threading
+import importlib
+import importlib.util
+
+# Optional/heavy dependencies imported on an idle background thread once the window is shown,
+# so neither startup nor the first card read, receipt barcode or address search pays for them
+PRELOAD_MODULES = [
+    "smartcard.System",
+    "smartcard.CardMonitoring",
+    "smartcard.ReaderMonitoring",
+    "requests",
+    "barcode",
+    "barcode.writer",
+    "PIL.Image",
+]
+# Pause between preloaded modules so the UI thread keeps getting the GIL
+PRELOAD_PAUSE = 0.05  # seconds
+
+_preload_thread = None
+_preload_lock = threading.Lock()
+preload_times = {}  # module name -> seconds, or None if it could not be imported
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            # importlib holds the per-module import lock, so a concurrent preload is simply awaited
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module '{self.__dict__['_name']}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def is_available(name):
+    """
+    True if the module can be imported, checked without importing it.
+    """
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def _preload(names):
+    for name in names:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            preload_times[name] = time.perf_counter() - started
+        except Exception:
+            preload_times[name] = None
+        time.sleep(PRELOAD_PAUSE)
+    loaded = {k: round(v * 1000) for k, v in preload_times.items() if v is not None}
+    print(f"[Preload] Imported in background (ms): {loaded}")
+
+
+def start_preload(names=None):
+    global _preload_thread
+    with _preload_lock:
+        if _preload_thread is None:
+            _preload_thread = threading.Thread(target=_preload, args=(list(names or PRELOAD_MODULES),),
+                                               name="ImportPreloader", daemon=True)
+            _preload_thread.start()
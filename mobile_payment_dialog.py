@@ -8,7 +8,6 @@ from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QThread
 from PyQt6.QtGui import QColor, QFont
 import styles
 from ui_components import CustomMessageDialog
-from firebase_manager import FirebaseManager
 
 
 class MobilePaymentWorker(QThread):
@@ -36,14 +35,15 @@ class MobilePaymentWorker(QThread):
 
 
 class MobilePaymentDialog(QDialog):
-    def __init__(self, total_amount, firebase_mgr=None, parent=None):
+    def __init__(self, total_amount, firebase_mgr, parent=None):
         super().__init__(parent)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setFixedSize(styles.s(540), styles.s(370))
         
         self.total_amount = total_amount
-        self.firebase_mgr = firebase_mgr if firebase_mgr else FirebaseManager()
+        # Shared app-wide payment service; the caller makes sure it is ready (MainWindow.require_payment_outbox)
+        self.firebase_mgr = firebase_mgr
         self.is_processing = False
         
         # Main dialog layout (adds 10px margin around container for shadow)
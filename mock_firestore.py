@@ -0,0 +1,314 @@
+"""
+In-process stand-in for the part of the Firestore API used by FirebaseManager.
+
+It keeps documents in memory, runs transactions with optimistic concurrency (a commit
+is aborted and retried when a document it read was changed meanwhile) and can inject
+latency and failures into every call, so the payment and refund paths can be
+benchmarked and soak-tested without a live project. The module itself is passed as
+FirebaseManager's firestore_module (it provides transactional and SERVER_TIMESTAMP).
+"""
+import os
+import copy
+import time
+import uuid
+import random
+import datetime
+import threading
+
+# Sentinel replaced by the commit time when written, like firestore.SERVER_TIMESTAMP
+SERVER_TIMESTAMP = object()
+
+# Attempts made by @transactional before giving up on contention (same as the real client)
+MAX_ATTEMPTS = 5
+
+
+class MockFirestoreError(Exception):
+    pass
+
+
+class Aborted(MockFirestoreError):
+    pass
+
+
+class NotFound(MockFirestoreError):
+    pass
+
+
+class MockFirestoreClient:
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, lost_reply_rate=0.0, seed=None):
+        """
+        latency/jitter: seconds added to every call (latency + uniform(0, jitter)).
+        failure_rate: probability that a call fails with UNAVAILABLE before doing anything.
+        lost_reply_rate: probability that a commit is applied but its reply is lost,
+                         i.e. the caller sees an error for a write that happened.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.lost_reply_rate = lost_reply_rate
+        self.random = random.Random(seed)
+        self.lock = threading.RLock()
+        self.docs = {}  # path -> (data, version)
+        self.stats_lock = threading.Lock()
+        self.rpc_counts = {}
+        self.aborted_commits = 0
+        self.injected_failures = 0
+
+    @classmethod
+    def from_mock_data(cls, mock_data, **kwargs):
+        # Seeds users/{uid} with accounts/transactions/notifications subcollections
+        # from the firebase_mock_db.json layout
+        client = cls(**kwargs)
+        for uid, user in mock_data.get("users", {}).items():
+            fields = {k: v for k, v in user.items() if k not in ("accounts", "transactions", "notifications")}
+            client.docs[f"users/{uid}"] = (copy.deepcopy(fields), 1)
+            for sub in ("accounts", "transactions", "notifications"):
+                for doc_id, data in user.get(sub, {}).items():
+                    client.docs[f"users/{uid}/{sub}/{doc_id}"] = (copy.deepcopy(data), 1)
+        return client
+
+    def _rpc(self, name):
+        with self.stats_lock:
+            self.rpc_counts[name] = self.rpc_counts.get(name, 0) + 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.failure_rate and self.random.random() < self.failure_rate
+            if fail:
+                self.injected_failures += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise MockFirestoreError(f"503 UNAVAILABLE: injected failure in {name}")
+
+    def _lose_reply(self):
+        with self.stats_lock:
+            lost = self.lost_reply_rate and self.random.random() < self.lost_reply_rate
+            if lost:
+                self.injected_failures += 1
+        return lost
+
+    def _resolve(self, data):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        resolved = {}
+        for k, v in data.items():
+            if v is SERVER_TIMESTAMP:
+                v = now
+            elif isinstance(v, dict):
+                v = self._resolve(v)
+            resolved[k] = copy.deepcopy(v)
+        return resolved
+
+    def _apply(self, op, path, data):
+        # Called with self.lock held
+        current, version = self.docs.get(path, (None, 0))
+        if op == "update":
+            if current is None:
+                raise NotFound(f"404 No document to update: {path}")
+            merged = dict(current)
+            merged.update(self._resolve(data))
+            self.docs[path] = (merged, version + 1)
+        else:
+            self.docs[path] = (self._resolve(data), version + 1)
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def collection_group(self, name):
+        return Query(self, name)
+
+    def transaction(self):
+        return Transaction(self)
+
+    def balance_of(self, path):
+        with self.lock:
+            data, _ = self.docs.get(path, (None, 0))
+            return None if data is None else data.get("balance")
+
+    def list_documents(self, collection_path):
+        prefix = collection_path.rstrip("/") + "/"
+        with self.lock:
+            return {p[len(prefix):]: copy.deepcopy(d) for p, (d, _) in self.docs.items()
+                    if p.startswith(prefix) and "/" not in p[len(prefix):]}
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self.client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name):
+        return CollectionReference(self.client, f"{self.path}/{name}")
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            return transaction._read([self])[0]
+        self.client._rpc("get")
+        with self.client.lock:
+            data, _ = self.client.docs.get(self.path, (None, 0))
+            return DocumentSnapshot(self, copy.deepcopy(data))
+
+    def update(self, data):
+        self.client._rpc("update")
+        with self.client.lock:
+            self.client._apply("update", self.path, data)
+
+    def set(self, data):
+        self.client._rpc("set")
+        with self.client.lock:
+            self.client._apply("set", self.path, data)
+
+
+class CollectionReference:
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        if "/" not in self.path:
+            return None
+        return DocumentReference(self.client, self.path.rsplit("/", 1)[0])
+
+    def document(self, doc_id=None):
+        return DocumentReference(self.client, f"{self.path}/{doc_id or uuid.uuid4().hex[:20]}")
+
+
+class Query:
+    def __init__(self, client, group, filters=None, max_results=None):
+        self.client = client
+        self.group = group
+        self.filters = filters or []
+        self.max_results = max_results
+
+    def where(self, field, op, value):
+        if op not in ("==", "in"):
+            raise MockFirestoreError(f"Unsupported operator in mock query: {op}")
+        return Query(self.client, self.group, self.filters + [(field, op, value)], self.max_results)
+
+    def limit(self, count):
+        return Query(self.client, self.group, self.filters, count)
+
+    def _matches(self, data):
+        for field, op, value in self.filters:
+            if op == "==" and data.get(field) != value:
+                return False
+            if op == "in" and data.get(field) not in value:
+                return False
+        return True
+
+    def stream(self):
+        self.client._rpc("query")
+        results = []
+        with self.client.lock:
+            for path, (data, _) in self.client.docs.items():
+                parts = path.split("/")
+                if len(parts) < 2 or parts[-2] != self.group or not self._matches(data):
+                    continue
+                results.append(DocumentSnapshot(DocumentReference(self.client, path), copy.deepcopy(data)))
+                if self.max_results is not None and len(results) >= self.max_results:
+                    break
+        return iter(results)
+
+
+class Transaction:
+    def __init__(self, client):
+        self.client = client
+        self._reset()
+
+    def _reset(self):
+        self.read_versions = {}
+        self.writes = []
+        self.begun = False
+
+    def _begin(self):
+        if not self.begun:
+            self.client._rpc("begin")
+            self.begun = True
+
+    def _read(self, refs):
+        self._begin()
+        self.client._rpc("read")
+        snaps = []
+        with self.client.lock:
+            for ref in refs:
+                data, version = self.client.docs.get(ref.path, (None, 0))
+                self.read_versions.setdefault(ref.path, version)
+                snaps.append(DocumentSnapshot(ref, copy.deepcopy(data)))
+        return snaps
+
+    def get_all(self, references):
+        return iter(self._read(list(references)))
+
+    def update(self, reference, data):
+        self.writes.append(("update", reference.path, data))
+
+    def set(self, reference, data):
+        self.writes.append(("set", reference.path, data))
+
+    def _commit(self):
+        self._begin()
+        self.client._rpc("commit")
+        with self.client.lock:
+            for path, version in self.read_versions.items():
+                if self.client.docs.get(path, (None, 0))[1] != version:
+                    with self.client.stats_lock:
+                        self.client.aborted_commits += 1
+                    raise Aborted("409 ABORTED: document changed by a concurrent transaction")
+            # Validate before applying so a failed update leaves nothing half-written
+            for op, path, _ in self.writes:
+                if op == "update" and path not in self.client.docs:
+                    raise NotFound(f"404 No document to update: {path}")
+            for op, path, data in self.writes:
+                self.client._apply(op, path, data)
+        if self.client._lose_reply():
+            raise MockFirestoreError("503 UNAVAILABLE: connection reset after commit (injected)")
+
+
+def transactional(func):
+    def wrapper(transaction, *args, **kwargs):
+        for attempt in range(MAX_ATTEMPTS):
+            transaction._reset()
+            result = func(transaction, *args, **kwargs)
+            try:
+                transaction._commit()
+                return result
+            except Aborted:
+                if attempt == MAX_ATTEMPTS - 1:
+                    raise
+        return None
+    return wrapper
+
+
+def client_from_env(mock_data):
+    """
+    Builds a client seeded with mock_data when DU_MOCK_FIRESTORE is set, else returns None.
+    DU_MOCK_FIRESTORE_LATENCY_MS, DU_MOCK_FIRESTORE_JITTER_MS and DU_MOCK_FIRESTORE_FAILURE_RATE
+    configure the injected latency and failures.
+    """
+    if not os.environ.get("DU_MOCK_FIRESTORE"):
+        return None
+    return MockFirestoreClient.from_mock_data(
+        mock_data,
+        latency=float(os.environ.get("DU_MOCK_FIRESTORE_LATENCY_MS", "0")) / 1000.0,
+        jitter=float(os.environ.get("DU_MOCK_FIRESTORE_JITTER_MS", "0")) / 1000.0,
+        failure_rate=float(os.environ.get("DU_MOCK_FIRESTORE_FAILURE_RATE", "0"))
+    )
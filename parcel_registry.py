@@ -0,0 +1,142 @@
+"""
+Durable parcel store for the parcel service page (json/parcels.db, SQLite).
+
+Parcels are keyed by waybill number, so pickup lookups are a primary-key read, and are
+indexed by sender, receiver, status and date for the tracking list.
+
+With DU_PARCEL_DEMO set, the parcel page uses a throwaway in-memory registry seeded with
+demo parcels instead of json/parcels.db:
+    DU_PARCEL_DEMO=1 python main.py
+"""
+import os
+import time
+import sqlite3
+import datetime
+import threading
+
+os.makedirs("json", exist_ok=True)
+PARCEL_DB_FILE = os.path.join("json", "parcels.db")
+DEMO_ENV = "DU_PARCEL_DEMO"
+DEMO_DB = ":memory:"
+
+FIELDS = ["waybill", "sender", "receiver", "s_addr", "r_addr", "item", "status",
+          "fare", "item_value", "weight", "date"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parcels (
+    waybill TEXT PRIMARY KEY,
+    sender TEXT NOT NULL DEFAULT '',
+    receiver TEXT NOT NULL DEFAULT '',
+    s_addr TEXT NOT NULL DEFAULT '',
+    r_addr TEXT NOT NULL DEFAULT '',
+    item TEXT NOT NULL DEFAULT '',
+    status TEXT NOT NULL DEFAULT '',
+    fare INTEGER NOT NULL DEFAULT 0,
+    item_value INTEGER NOT NULL DEFAULT 0,
+    weight INTEGER NOT NULL DEFAULT 0,
+    date TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_parcels_sender ON parcels (sender);
+CREATE INDEX IF NOT EXISTS idx_parcels_receiver ON parcels (receiver);
+CREATE INDEX IF NOT EXISTS idx_parcels_status ON parcels (status);
+CREATE INDEX IF NOT EXISTS idx_parcels_date ON parcels (date, created_at);
+"""
+
+
+def demo_enabled():
+    return bool(os.environ.get(DEMO_ENV))
+
+
+class ParcelRegistry:
+    def __init__(self, path=None, seed=None):
+        self.path = path or PARCEL_DB_FILE
+        self.lock = threading.Lock()
+        is_new = self.path == DEMO_DB or not os.path.exists(self.path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        if is_new and seed:
+            for parcel in seed:
+                self.add(parcel)
+
+    @staticmethod
+    def _to_dict(row):
+        return {key: row[key] for key in FIELDS} if row else None
+
+    def add(self, parcel):
+        """
+        Stores a new parcel. Returns False if the waybill number is already taken.
+        """
+        now = time.time()
+        values = [parcel.get(key, "") if key not in ("fare", "item_value", "weight") else parcel.get(key, 0)
+                  for key in FIELDS]
+        if not values[FIELDS.index("date")]:
+            values[FIELDS.index("date")] = datetime.date.today().strftime("%Y-%m-%d")
+        with self.lock:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        f"INSERT INTO parcels ({', '.join(FIELDS)}, created_at, updated_at) "
+                        f"VALUES ({', '.join('?' * len(FIELDS))}, ?, ?)", values + [now, now])
+                return True
+            except sqlite3.IntegrityError:
+                return False
+
+    def exists(self, waybill):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM parcels WHERE waybill = ?", (waybill,)).fetchone() is not None
+
+    def get(self, waybill):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM parcels WHERE waybill = ?", (waybill,)).fetchone()
+        return self._to_dict(row)
+
+    def update_status(self, waybill, status):
+        with self.lock:
+            with self.conn:
+                cur = self.conn.execute("UPDATE parcels SET status = ?, updated_at = ? WHERE waybill = ?",
+                                        (status, time.time(), waybill))
+        return cur.rowcount > 0
+
+    def list(self, since_date=None, status=None):
+        """
+        Parcels in registration order, optionally from since_date ("YYYY-MM-DD") on and/or with a status.
+        """
+        query = "SELECT * FROM parcels"
+        conditions, params = [], []
+        if since_date:
+            conditions.append("date >= ?")
+            params.append(since_date)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY date, created_at"
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def remove_unchanged(self, parcels):
+        """
+        Deletes the given parcels where every stored field still matches (e.g. demo rows
+        written by an earlier version). Returns the number of rows deleted.
+        """
+        deleted = 0
+        with self.lock:
+            with self.conn:
+                for parcel in parcels:
+                    keys = [key for key in FIELDS if key in parcel]
+                    cur = self.conn.execute(
+                        "DELETE FROM parcels WHERE " + " AND ".join(f"{key} = ?" for key in keys),
+                        [parcel[key] for key in keys])
+                    deleted += cur.rowcount
+        return deleted
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -2,14 +2,19 @@ import os
 import sys
 import random
 import json
-import requests
+import datetime
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QFrame, QLineEdit, QGridLayout, 
                              QStackedWidget, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView,
                              QDialog)
-from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QObject
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QObject, QThread
 from PyQt6.QtGui import QColor, QPixmap, QImage
 import styles
+import address_index
+import parcel_registry
+from parcel_registry import ParcelRegistry
+import http_client
+from response_cache import ResponseCache
 from ui_components import CustomMessageDialog
 
 class BadgeLabel(QWidget):
@@ -72,6 +77,151 @@ ADDRESS_DATABASE = [
     {"zonecode": "22008", "address": "인천광역시 연수구 벤첸로 12", "building": "송도IT타워", "dong": "송도동"}
 ]
 
+JUSO_PAGE_SIZE = 20
+JUSO_MAX_PAGES = 3 # pages streamed into the table per search
+SEARCH_DEBOUNCE_MS = 350 # pause in typing before a search starts
+SEARCH_MIN_LENGTH = 2 # shorter queries are only searched on Enter/검색
+
+ADDRESS_API_CONFIG_FILE = os.path.join("json", "address_api_config.json")
+JUSO_CACHE_FILE = os.path.join("json", "juso_cache.json")
+JUSO_CACHE_TTL = 7 * 24 * 3600 # addresses rarely change
+JUSO_CACHE_EMPTY_TTL = 24 * 3600
+JUSO_CACHE_MAX_ENTRIES = 300
+
+# Demo parcels for the in-memory registry used with DU_PARCEL_DEMO
+SAMPLE_PARCELS = [
+    {"waybill": "98127389211", "sender": "홍길동", "receiver": "김철수", "item": "의류", "status": "배송 중"},
+    {"waybill": "98127389212", "sender": "이영희", "receiver": "박민수", "item": "잡화", "status": "점포 대기"},
+    {"waybill": "98127389213", "sender": "최수민", "receiver": "정지호", "item": "도서", "status": "배송 완료"}
+]
+TRACK_LIST_DAYS = 90 # the tracking list shows parcels registered in this many days
+
+_api_config_cache = (None, {}) # (file mtime, config)
+_juso_cache = None
+
+
+def load_address_api_config():
+    """
+    Returns address_api_config.json, re-read only when the file changed.
+    """
+    global _api_config_cache
+    try:
+        mtime = os.path.getmtime(ADDRESS_API_CONFIG_FILE)
+    except OSError:
+        return {}
+    if mtime != _api_config_cache[0]:
+        try:
+            with open(ADDRESS_API_CONFIG_FILE, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except Exception:
+            config = {}
+        _api_config_cache = (mtime, config)
+    return _api_config_cache[1]
+
+
+def save_address_api_config(updates):
+    global _api_config_cache
+    config = dict(load_address_api_config())
+    config.update(updates)
+    os.makedirs(os.path.dirname(ADDRESS_API_CONFIG_FILE), exist_ok=True)
+    with open(ADDRESS_API_CONFIG_FILE, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+    _api_config_cache = (os.path.getmtime(ADDRESS_API_CONFIG_FILE), config)
+
+
+def get_juso_cache():
+    global _juso_cache
+    if _juso_cache is None:
+        _juso_cache = ResponseCache(JUSO_CACHE_FILE, JUSO_CACHE_TTL, JUSO_CACHE_MAX_ENTRIES, JUSO_CACHE_EMPTY_TTL)
+    return _juso_cache
+
+
+class AddressSearchWorker(QThread):
+    """
+    Fetches Juso API result pages off the UI thread. Each page is emitted as soon as it
+    arrives; finished_signal reports how the search ended ("ok", "empty", "api_error",
+    "http_error", "network_error"). cancel() stops it before the next request.
+    """
+    page_ready = pyqtSignal(int, list)
+    finished_signal = pyqtSignal(int, str, str)
+    running = set() # keeps workers alive past their dialog until the request returns
+
+    def __init__(self, request_id, query, juso_key):
+        super().__init__()
+        self.request_id = request_id
+        self.query = query
+        self.juso_key = juso_key
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def start(self):
+        AddressSearchWorker.running.add(self)
+        self.finished.connect(lambda: AddressSearchWorker.running.discard(self))
+        super().start()
+
+    def run(self):
+        total = 0
+        collected = []
+        try:
+            for page in range(1, JUSO_MAX_PAGES + 1):
+                if self.cancelled:
+                    return
+                params = {
+                    "confmKey": self.juso_key,
+                    "currentPage": page,
+                    "countPerPage": JUSO_PAGE_SIZE,
+                    "keyword": self.query,
+                    "resultType": "json"
+                }
+                print(f"[Juso API Request] keyword: {self.query}, page: {page}")
+                response = http_client.get("juso", params=params, is_cancelled=lambda: self.cancelled)
+                if self.cancelled:
+                    return
+                print(f"[Juso API Response] status: {response.status_code}")
+                if response.status_code != 200:
+                    self.finished_signal.emit(self.request_id, "http_error" if total == 0 else "ok", "")
+                    return
+
+                juso_results = response.json().get("results", {})
+                common = juso_results.get("common", {})
+                err_code = common.get("errorCode", "0")
+                err_msg = common.get("errorMessage", "")
+                if err_code != "0":
+                    print(f"[Juso API Response] errorCode: {err_code}, errorMessage: {err_msg}")
+                    self.finished_signal.emit(self.request_id, "api_error" if total == 0 else "ok", err_msg)
+                    return
+
+                juso_list = juso_results.get("juso") or []
+                results = [{
+                    "zonecode": j.get("zipNo", ""),
+                    "address": j.get("roadAddr", ""),
+                    "building": j.get("bdNm", ""),
+                    "dong": j.get("emdNm", "")
+                } for j in juso_list]
+                if results:
+                    total += len(results)
+                    collected.extend(results)
+                    self.page_ready.emit(self.request_id, results)
+
+                try:
+                    total_count = int(common.get("totalCount", 0))
+                except (TypeError, ValueError):
+                    total_count = 0
+                if len(juso_list) < JUSO_PAGE_SIZE or total >= total_count:
+                    break
+            # Only complete answers are cached (not ones cut short by an error)
+            get_juso_cache().put(ResponseCache.normalize_key(self.query), collected)
+            self.finished_signal.emit(self.request_id, "ok" if total else "empty", "")
+        except http_client.RequestCancelled:
+            pass
+        except Exception as e:
+            print(f"[Juso API Error] {e}")
+            if not self.cancelled:
+                self.finished_signal.emit(self.request_id, "network_error" if total == 0 else "ok", str(e))
+
+
 class AddressSearchDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -79,6 +229,13 @@ class AddressSearchDialog(QDialog):
         self.resize(550, 520)
         self.selected_address = ""
         self.selected_zonecode = ""
+        self.search_request_id = 0
+        self.search_workers = [] # workers started by this dialog, for cancellation
+        self.result_count = 0
+        # Offline road-name address DB if built (address_index.py build ...), else the sample list
+        self.address_index = address_index.get_index(ADDRESS_DATABASE)
+        if load_address_api_config().get("juso_api_key"):
+            http_client.prewarm("juso") # connect while the user is still typing
         self.init_ui()
 
     def init_ui(self):
@@ -110,6 +267,13 @@ class AddressSearchDialog(QDialog):
             }
         """)
         self.txt_query.returnPressed.connect(self.perform_search)
+        self.txt_query.textChanged.connect(self.schedule_search)
+        
+        # Typing restarts this timer; the search runs once the clerk pauses
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.perform_search)
         
         btn_search = QPushButton("검색")
         btn_search.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -341,25 +505,13 @@ class AddressSearchDialog(QDialog):
         self.api_settings_frame.setVisible(not self.api_settings_frame.isVisible())
 
     def load_api_key(self):
-        config_path = "json/address_api_config.json"
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    self.txt_api_key.setText(config.get("juso_api_key", ""))
-            except:
-                pass
+        self.txt_api_key.setText(load_address_api_config().get("juso_api_key", ""))
 
     def save_api_key(self):
         juso_key = self.txt_api_key.text().strip()
-        config_path = "json/address_api_config.json"
         try:
-            os.makedirs(os.path.dirname(config_path), exist_ok=True)
-            config_data = {
-                "juso_api_key": juso_key
-            }
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump(config_data, f, ensure_ascii=False, indent=4)
+            # Other keys in the file (e.g. Naver local search) are kept
+            save_address_api_config({"juso_api_key": juso_key})
             CustomMessageDialog("성공", "API 설정 정보가 저장되었습니다.", "info", self).exec()
             self.api_settings_frame.setVisible(False)
         except Exception as e:
@@ -375,123 +527,110 @@ class AddressSearchDialog(QDialog):
         webbrowser.open("https://business.juso.go.kr/addrlink/openApi/apiReqst.do")
         CustomMessageDialog("API 승인키 발급 및 도움말", msg, "info", self).exec()
 
+    def schedule_search(self, text):
+        if len(text.strip()) >= SEARCH_MIN_LENGTH:
+            self.debounce_timer.start()
+        else:
+            self.debounce_timer.stop()
+
+    def cancel_searches(self):
+        # Superseded searches stop before their next request; their late signals are ignored
+        self.search_request_id += 1
+        for worker in self.search_workers:
+            worker.cancel()
+
+    def set_info(self, text, color):
+        self.lbl_info.setText(text)
+        self.lbl_info.setStyleSheet(f"color: {color}; font-size: 9pt; font-weight: bold;")
+
     def perform_search(self):
+        self.debounce_timer.stop()
+        self.cancel_searches()
         query = self.txt_query.text().strip()
         if not query:
             self.display_results(ADDRESS_DATABASE)
             return
 
-        juso_key = ""
-        config_path = "json/address_api_config.json"
-        if os.path.exists(config_path):
-            try:
-                with open(config_path, "r", encoding="utf-8") as f:
-                    config = json.load(f)
-                    juso_key = config.get("juso_api_key", "")
-            except:
-                pass
+        juso_key = load_address_api_config().get("juso_api_key", "")
+
+        # The offline DB answers in milliseconds; the Juso API is only asked when it has no match
+        if not self.address_index.is_sample:
+            results = self.address_index.search(query)
+            if results or not juso_key:
+                self.set_info(f"📁 오프라인 주소 DB 검색 완료 ({len(results)}건)" if results else "❌ 검색 결과가 없습니다.",
+                              "#10B981" if results else "#EF4444")
+                self.display_results(results)
+                return
 
         if not juso_key:
-            self.lbl_info.setText("⚠️ API 키가 없어 로컬 테스트 데이터에서 검색합니다.")
-            self.lbl_info.setStyleSheet("color: #E28743; font-size: 9pt; font-weight: bold;")
+            self.set_info("⚠️ API 키가 없어 로컬 테스트 데이터에서 검색합니다.", "#E28743")
             self.local_search(query)
             return
 
-        try:
-            self.lbl_info.setText("🔍 API 실시간 검색 중...")
-            self.lbl_info.setStyleSheet("color: #7B68EE; font-size: 9pt; font-weight: bold;")
-            from PyQt6.QtWidgets import QApplication
-            QApplication.processEvents()
-            
-            url = "https://business.juso.go.kr/addrlink/addrLinkApi.do"
-            params = {
-                "confmKey": juso_key,
-                "currentPage": 1,
-                "countPerPage": 20,
-                "keyword": query,
-                "resultType": "json"
-            }
-            print(f"[Juso API Request] url: {url}, keyword: {query}")
-            response = requests.get(url, params=params, timeout=10)
-            print(f"[Juso API Response] status: {response.status_code}")
-            if response.status_code == 200:
-                data = response.json()
-                juso_results = data.get("results", {})
-                err_code = juso_results.get("common", {}).get("errorCode", "0")
-                err_msg = juso_results.get("common", {}).get("errorMessage", "")
-                print(f"[Juso API Response] errorCode: {err_code}, errorMessage: {err_msg}")
-                
-                if err_code == "0":
-                    juso_list = juso_results.get("juso", [])
-                    print(f"[Juso API Response] result count: {len(juso_list)}")
-                    if juso_list:
-                        print(f"[Juso API Response] First result: {juso_list[0]}")
-                    
-                    if not juso_list:
-                        self.lbl_info.setText("❌ 검색 결과가 없습니다.")
-                        self.lbl_info.setStyleSheet("color: #EF4444; font-size: 9pt; font-weight: bold;")
-                        self.table.setRowCount(0)
-                        return
-                        
-                    results = []
-                    for j in juso_list:
-                        results.append({
-                            "zonecode": j.get("zipNo", ""),
-                            "address": j.get("roadAddr", ""),
-                            "building": j.get("bdNm", ""),
-                            "dong": j.get("emdNm", "")
-                        })
-                    self.lbl_info.setText(f"✅ 실시간 검색 완료 ({len(results)}건)")
-                    self.lbl_info.setStyleSheet("color: #10B981; font-size: 9pt; font-weight: bold;")
-                    self.display_results(results)
-                else:
-                    self.lbl_info.setText(f"❌ API 오류: {err_msg} (로컬 검색으로 전환)")
-                    self.lbl_info.setStyleSheet("color: #EF4444; font-size: 9pt; font-weight: bold;")
-                    self.local_search(query)
+        cached = get_juso_cache().get(ResponseCache.normalize_key(query))
+        if cached is not None:
+            self.display_results(cached)
+            if cached:
+                self.set_info(f"✅ 검색 완료 ({len(cached)}건, 최근 검색 결과)", "#10B981")
             else:
-                self.lbl_info.setText("❌ HTTP 오류 (로컬 검색으로 전환)")
-                self.lbl_info.setStyleSheet("color: #EF4444; font-size: 9pt; font-weight: bold;")
-                self.local_search(query)
-        except Exception as e:
-            print(f"[Juso API Error] {e}")
-            self.lbl_info.setText("❌ 네트워크 오류 (로컬 검색으로 전환)")
-            self.lbl_info.setStyleSheet("color: #EF4444; font-size: 9pt; font-weight: bold;")
+                self.set_info("❌ 검색 결과가 없습니다.", "#EF4444")
+            return
+
+        self.set_info("🔍 API 실시간 검색 중...", "#7B68EE")
+        self.table.setRowCount(0)
+        self.result_count = 0
+        worker = AddressSearchWorker(self.search_request_id, query, juso_key)
+        worker.page_ready.connect(self.on_search_page)
+        worker.finished_signal.connect(self.on_search_finished)
+        self.search_workers = [w for w in self.search_workers if w.isRunning()] + [worker]
+        worker.start()
+
+    def on_search_page(self, request_id, results):
+        if request_id != self.search_request_id:
+            return
+        self.append_results(results)
+        self.result_count += len(results)
+        self.set_info(f"🔍 검색 중... ({self.result_count}건 수신)", "#7B68EE")
+
+    def on_search_finished(self, request_id, status, message):
+        if request_id != self.search_request_id:
+            return
+        query = self.txt_query.text().strip()
+        if status == "ok":
+            self.set_info(f"✅ 실시간 검색 완료 ({self.result_count}건)", "#10B981")
+        elif status == "empty":
+            self.set_info("❌ 검색 결과가 없습니다.", "#EF4444")
+            self.table.setRowCount(0)
+        elif status == "api_error":
+            self.set_info(f"❌ API 오류: {message} (로컬 검색으로 전환)", "#EF4444")
+            self.local_search(query)
+        elif status == "http_error":
+            self.set_info("❌ HTTP 오류 (로컬 검색으로 전환)", "#EF4444")
+            self.local_search(query)
+        else:
+            self.set_info("❌ 네트워크 오류 (로컬 검색으로 전환)", "#EF4444")
             self.local_search(query)
 
+    def done(self, result):
+        self.debounce_timer.stop()
+        self.cancel_searches()
+        super().done(result)
+
     def local_search(self, query):
-        query = query.lower()
-        results = []
-        for item in ADDRESS_DATABASE:
-            if (query in item["dong"].lower() or 
-                query in item["address"].lower() or 
-                query in item["building"].lower()):
-                results.append(item)
-                
-        if not results and len(query) >= 2:
-            results = [
-                {"zonecode": "08172", "address": f"서울특별시 마포구 {query} 12길 3", "building": f"{query} 프라자", "dong": query},
-                {"zonecode": "08173", "address": f"서울특별시 서초구 {query}대로 55", "building": f"{query} 타워", "dong": query},
-                {"zonecode": "48192", "address": f"부산광역시 해운대구 {query}로 189", "building": f"{query} 빌라", "dong": query},
-            ]
-            
-        self.display_results(results)
+        self.display_results(self.address_index.search(query))
         
     def display_results(self, items):
-        print(f"[Table Debug] display_results called with {len(items)} items")
-        self.table.setRowCount(len(items))
-        print(f"[Table Debug] Table row count set to {self.table.rowCount()}")
-        for r, item in enumerate(items):
+        self.table.setRowCount(0)
+        self.append_results(items)
+
+    def append_results(self, items):
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(items))
+        for r, item in enumerate(items, start):
             self.table.setItem(r, 0, QTableWidgetItem(item["zonecode"]))
             self.table.setItem(r, 1, QTableWidgetItem(item["address"]))
             self.table.setItem(r, 2, QTableWidgetItem(item["building"]))
-            
-            item_0 = self.table.item(r, 0)
-            item_1 = self.table.item(r, 1)
-            item_2 = self.table.item(r, 2)
-            print(f"[Table Debug] Row {r} values: zonecode='{item_0.text() if item_0 else 'None'}', address='{item_1.text() if item_1 else 'None'}', building='{item_2.text() if item_2 else 'None'}'")
-            
-            if item_0:
-                item_0.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
+            self.table.item(r, 0).setTextAlignment(Qt.AlignmentFlag.AlignCenter)
             
     def confirm_selection(self):
         row = self.table.currentRow()
@@ -716,11 +855,15 @@ class ParcelServicePage(QWidget):
     
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.parcels = [
-            {"waybill": "98127389211", "sender": "홍길동", "receiver": "김철수", "item": "의류", "status": "배송 중"},
-            {"waybill": "98127389212", "sender": "이영희", "receiver": "박민수", "item": "잡화", "status": "점포 대기"},
-            {"waybill": "98127389213", "sender": "최수민", "receiver": "정지호", "item": "도서", "status": "배송 완료"}
-        ]
+        if parcel_registry.demo_enabled():
+            self.registry = ParcelRegistry(parcel_registry.DEMO_DB, seed=SAMPLE_PARCELS)
+        else:
+            self.registry = ParcelRegistry()
+            # Earlier versions stored the demo parcels in json/parcels.db; drop them if untouched
+            self.registry.remove_unchanged(SAMPLE_PARCELS)
+        self.table_loaded = False
+        self.table_rows = {} # waybill -> table row
+        self.row_keys = [] # lowercase "waybill sender receiver" per row, for filtering
         self.address_bridge = AddressBridge()
         self.address_bridge.address_selected.connect(self.on_address_selected)
         self.init_ui()
@@ -1224,11 +1367,12 @@ class ParcelServicePage(QWidget):
         else:
             fare = 6000
             
-        import datetime
         date_str = datetime.date.today().strftime("%Y-%m-%d")
         
         # Generate 12-digit Waybill number starting with 3641
         waybill = "3641" + "".join(str(random.randint(0, 9)) for _ in range(8))
+        while self.registry.exists(waybill):
+            waybill = "3641" + "".join(str(random.randint(0, 9)) for _ in range(8))
         
         s_addr = self.txt_s_addr.text().strip()
         if self.txt_s_detail.text().strip():
@@ -1251,7 +1395,11 @@ class ParcelServicePage(QWidget):
             "weight": weight,
             "date": date_str
         }
-        self.parcels.append(new_parcel)
+        if not self.registry.add(new_parcel):
+            CustomMessageDialog("오류", "택배 접수 정보를 저장하지 못했습니다. 다시 시도해 주세요.", 'warning', self).exec()
+            return
+        if self.table_loaded:
+            self.append_parcel_row(new_parcel)
         
         self.btn_confirm_reg.setText("⏳ 운송장 발행 중...")
         QTimer.singleShot(1500, lambda: self.complete_registration(new_parcel))
@@ -1346,41 +1494,49 @@ class ParcelServicePage(QWidget):
         layout.addWidget(self.table)
         
     def load_parcel_table(self):
-        self.table.setRowCount(len(self.parcels))
-        for i, parcel in enumerate(self.parcels):
-            self.table.setItem(i, 0, QTableWidgetItem(str(i + 1)))
-            self.table.setItem(i, 1, QTableWidgetItem(parcel["waybill"]))
-            self.table.setItem(i, 2, QTableWidgetItem(parcel["sender"]))
-            self.table.setItem(i, 3, QTableWidgetItem(parcel["receiver"]))
-            
-            status_item = QTableWidgetItem(parcel["status"])
-            if parcel["status"] == "배송 완료":
-                status_item.setForeground(QColor("#10B981"))
-            elif parcel["status"] == "점포 대기":
-                status_item.setForeground(QColor("#7B68EE"))
-            else:
-                status_item.setForeground(QColor("#FF8A65"))
-            self.table.setItem(i, 4, status_item)
-            
-            for col in range(5):
-                self.table.item(i, col).setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
-                
+        # Built once; registrations and pickups then update single rows
+        if self.table_loaded:
+            return
+        since = (datetime.date.today() - datetime.timedelta(days=TRACK_LIST_DAYS)).strftime("%Y-%m-%d")
+        parcels = self.registry.list(since_date=since)
+        self.table.setUpdatesEnabled(False)
+        self.table.setRowCount(0)
+        self.table_rows = {}
+        self.row_keys = []
+        for parcel in parcels:
+            self.append_parcel_row(parcel)
+        self.table.setUpdatesEnabled(True)
+        self.table_loaded = True
+
+    def append_parcel_row(self, parcel):
+        i = self.table.rowCount()
+        self.table.insertRow(i)
+        self.table_rows[parcel["waybill"]] = i
+        self.row_keys.append(f"{parcel['waybill']} {parcel['sender']} {parcel['receiver']}".lower())
+        self.table.setItem(i, 0, QTableWidgetItem(str(i + 1)))
+        self.table.setItem(i, 1, QTableWidgetItem(parcel["waybill"]))
+        self.table.setItem(i, 2, QTableWidgetItem(parcel["sender"]))
+        self.table.setItem(i, 3, QTableWidgetItem(parcel["receiver"]))
+        self.set_status_cell(i, parcel["status"])
+        for col in range(4):
+            self.table.item(i, col).setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
+
+    def set_status_cell(self, row, status):
+        status_item = QTableWidgetItem(status)
+        if status == "배송 완료":
+            status_item.setForeground(QColor("#10B981"))
+        elif status == "점포 대기":
+            status_item.setForeground(QColor("#7B68EE"))
+        else:
+            status_item.setForeground(QColor("#FF8A65"))
+        status_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
+        self.table.setItem(row, 4, status_item)
+
     def filter_parcel_table(self, text):
         search_text = text.strip().lower()
-        for r in range(self.table.rowCount()):
-            waybill_item = self.table.item(r, 1)
-            sender_item = self.table.item(r, 2)
-            receiver_item = self.table.item(r, 3)
-            
-            waybill = waybill_item.text().lower() if waybill_item else ""
-            sender = sender_item.text().lower() if sender_item else ""
-            receiver = receiver_item.text().lower() if receiver_item else ""
-            
-            if search_text in waybill or search_text in sender or search_text in receiver:
-                self.table.setRowHidden(r, False)
-            else:
-                self.table.setRowHidden(r, True)
-                
+        for r, key in enumerate(self.row_keys):
+            self.table.setRowHidden(r, search_text not in key)
+
     def init_pickup_screen(self):
         self.pickup_widget = QWidget()
         layout = QVBoxLayout(self.pickup_widget)
@@ -1447,12 +1603,8 @@ class ParcelServicePage(QWidget):
         
     def check_pickup_waybill(self, text):
         code = text.strip()
-        found_parcel = None
-        for p in self.parcels:
-            if p["waybill"] == code:
-                found_parcel = p
-                break
-                
+        found_parcel = self.registry.get(code) if code else None
+
         if found_parcel:
             if found_parcel["status"] == "배송 완료":
                 self.lbl_pickup_status.setText(f"❌ 이미 픽업이 완료된 택배입니다. (운송장: {code})")
@@ -1476,11 +1628,9 @@ class ParcelServicePage(QWidget):
             
     def process_pickup(self):
         code = self.txt_pickup_code.text().strip()
-        for p in self.parcels:
-            if p["waybill"] == code:
-                p["status"] = "배송 완료"
-                break
-                
+        if self.registry.update_status(code, "배송 완료") and code in self.table_rows:
+            self.set_status_cell(self.table_rows[code], "배송 완료")
+
         self.btn_confirm_pickup.setText("⏳ 출고 승인 처리 중...")
         QTimer.singleShot(1500, lambda: self.complete_pickup(code))
         
@@ -0,0 +1,161 @@
+"""
+Load/soak test for the DU머니 payment and refund paths against the in-process
+mock Firestore (mock_firestore.py), with configurable latency and failure injection.
+
+    python payment_load_test.py --workers 8 --ops 2000 --latency-ms 40 --failure-rate 0.02
+    python payment_load_test.py --outbox --lost-reply-rate 0.05
+
+Reports throughput, latency percentiles and Firestore call counts, then checks that every
+account's balance matches its transaction ledger and what the callers were told.
+"""
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+
+import mock_firestore
+from firebase_manager import FirebaseManager
+from payment_outbox import PaymentOutbox
+
+
+def build_mock_data(accounts, initial_balance):
+    users = {}
+    for i in range(accounts):
+        users[f"loadtest_user_{i:04d}"] = {
+            "name": f"부하테스트{i}",
+            "pin": "000000",
+            "accounts": {"main": {"accountNumber": f"010-9000-{i:04d}-11", "balance": float(initial_balance)}}
+        }
+    return {"users": users}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100.0))]
+
+
+def run(args):
+    mock_data = build_mock_data(args.accounts, args.initial_balance)
+    client = mock_firestore.MockFirestoreClient.from_mock_data(
+        mock_data,
+        latency=args.latency_ms / 1000.0,
+        jitter=args.jitter_ms / 1000.0,
+        failure_rate=args.failure_rate,
+        lost_reply_rate=args.lost_reply_rate,
+        seed=args.seed
+    )
+    firebase_mgr = FirebaseManager(db=client, firestore_module=mock_firestore)
+
+    outbox = None
+    outbox_dir = None
+    service = firebase_mgr
+    if args.outbox:
+        outbox_dir = tempfile.mkdtemp(prefix="du_outbox_")
+        outbox = PaymentOutbox(firebase_mgr, file_path=os.path.join(outbox_dir, "payment_outbox.json"))
+        outbox.start()
+        service = outbox
+
+    uids = sorted(mock_data["users"].keys())
+    numbers = {uid: mock_data["users"][uid]["accounts"]["main"]["accountNumber"] for uid in uids}
+    reported = {uid: 0.0 for uid in uids}  # net amount callers were told was moved
+    latencies = []
+    results = {"payment_ok": 0, "payment_fail": 0, "refund_ok": 0, "refund_fail": 0}
+    lock = threading.Lock()
+    rng = random.Random(args.seed)
+    ops_per_worker = [args.ops // args.workers + (1 if i < args.ops % args.workers else 0) for i in range(args.workers)]
+
+    def worker(count, seed):
+        local_rng = random.Random(seed)
+        for _ in range(count):
+            uid = local_rng.choice(uids)
+            amount = float(local_rng.randint(1, 50) * 100)
+            is_refund = local_rng.random() < args.refund_ratio
+            started = time.perf_counter()
+            if is_refund:
+                success, _, _ = service.process_refund(numbers[uid], amount, "부하테스트점")
+            else:
+                success, _, _ = service.process_payment(numbers[uid], "", amount, "부하테스트점", bypass_pin=True)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                kind = "refund" if is_refund else "payment"
+                results[f"{kind}_{'ok' if success else 'fail'}"] += 1
+                if success:
+                    reported[uid] += amount if is_refund else -amount
+
+    threads = [threading.Thread(target=worker, args=(n, rng.random())) for n in ops_per_worker]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    checkout_elapsed = time.perf_counter() - started
+
+    if outbox:
+        # Settlement continues in the background; wait until the queue is drained
+        deadline = time.time() + args.drain_timeout
+        while outbox.get_entries("pending") and time.time() < deadline:
+            time.sleep(0.05)
+        outbox.stop()
+    total_elapsed = time.perf_counter() - started
+
+    total_ops = sum(results.values())
+    print("=" * 60)
+    print(f"mode: {'outbox' if outbox else 'direct'} | workers: {args.workers} | accounts: {args.accounts}")
+    print(f"latency: {args.latency_ms}ms (+{args.jitter_ms}ms jitter) | failure rate: {args.failure_rate} | lost replies: {args.lost_reply_rate}")
+    print(f"operations: {total_ops} in {checkout_elapsed:.2f}s checkout ({total_ops / max(checkout_elapsed, 1e-9):.1f} ops/s), {total_elapsed:.2f}s incl. settlement")
+    print(f"checkout latency ms: p50 {percentile(latencies, 50) * 1000:.1f} | p95 {percentile(latencies, 95) * 1000:.1f} | p99 {percentile(latencies, 99) * 1000:.1f} | max {max(latencies or [0]) * 1000:.1f}")
+    print(f"results: {results}")
+    print(f"firestore calls: {dict(sorted(client.rpc_counts.items()))} | aborted commits: {client.aborted_commits} | injected failures: {client.injected_failures}")
+    if outbox:
+        failed = outbox.get_entries("failed")
+        print(f"outbox: pending {len(outbox.get_entries('pending'))} | failed {len(failed)}")
+
+    # Consistency checks
+    ledger_errors = 0
+    reported_errors = 0
+    for uid in uids:
+        balance = client.balance_of(f"users/{uid}/accounts/main")
+        ledger = 0.0
+        for tx in client.list_documents(f"users/{uid}/transactions").values():
+            ledger += tx["amount"] if tx.get("is_deposit") else -tx["amount"]
+        if abs(args.initial_balance + ledger - balance) > 0.001:
+            ledger_errors += 1
+            print(f"  [ledger mismatch] {uid}: balance {balance} vs initial + ledger {args.initial_balance + ledger}")
+        if abs(args.initial_balance + reported[uid] - balance) > 0.001:
+            reported_errors += 1
+            if args.verbose:
+                print(f"  [reported mismatch] {uid}: balance {balance} vs reported {args.initial_balance + reported[uid]}")
+    print(f"balance vs ledger mismatches: {ledger_errors} | balance vs reported-to-caller mismatches: {reported_errors}")
+
+    if outbox_dir:
+        shutil.rmtree(outbox_dir, ignore_errors=True)
+    return 0 if ledger_errors == 0 and reported_errors == 0 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DU머니 payment/refund load test against the mock Firestore backend")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent checkout threads")
+    parser.add_argument("--ops", type=int, default=1000, help="total payments + refunds")
+    parser.add_argument("--accounts", type=int, default=20, help="number of customer accounts")
+    parser.add_argument("--initial-balance", type=float, default=1000000.0)
+    parser.add_argument("--refund-ratio", type=float, default=0.1, help="share of operations that are refunds")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="latency added to every Firestore call")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="random extra latency per call")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability a call fails before doing anything")
+    parser.add_argument("--lost-reply-rate", type=float, default=0.0, help="probability a commit succeeds but the reply is lost")
+    parser.add_argument("--outbox", action="store_true", help="go through PaymentOutbox instead of calling FirebaseManager directly")
+    parser.add_argument("--drain-timeout", type=float, default=120.0, help="seconds to wait for the outbox to settle")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
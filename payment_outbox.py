@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+
+from firebase_manager import FirebaseManager
+
+os.makedirs("json", exist_ok=True)
+OUTBOX_FILE = os.path.join("json", "payment_outbox.json")
+
+# Retry policy for entries that could not be settled because of network/server errors
+RETRY_BASE_DELAY = 2.0     # seconds
+RETRY_MAX_DELAY = 300.0    # seconds
+# How long a caller waits for an immediate (balance unknown) settlement before giving up
+IMMEDIATE_TIMEOUT = 30.0   # seconds
+# Settled/failed entries kept in the file for reconciliation
+KEEP_FINISHED = 200
+
+# Messages from FirebaseManager that will not change by retrying
+PERMANENT_ERRORS = ["등록된 계좌를 찾을 수 없습니다", "잔액이 부족", "비밀번호(PIN)", "사용자 정보를 조회할 수 없습니다",
+                    "결제 서버와 연결되어 있지 않습니다"]
+
+
+class PaymentOutbox:
+    """
+    Durable local outbox for DU머니 payments and refunds.
+
+    Requests are written to json/payment_outbox.json and settled against Firestore by a
+    background thread, in order per account, with retries and an idempotency key per entry.
+    Payments are approved right away when the account's last settled balance minus the
+    still-pending debits covers the amount; otherwise the caller waits for the settlement
+    as before. Refunds always wait for their settlement so the caller learns the outcome.
+    Exposes process_payment/process_refund with the FirebaseManager signature.
+
+    Entries whose outcome the counter never saw (approved payments rejected later, or
+    results lost to a timeout or a restart) are flagged needs_review until an operator
+    has seen them (get_review_entries/mark_reviewed).
+    """
+
+    def __init__(self, firebase_mgr, file_path=None):
+        self.firebase_mgr = firebase_mgr
+        self.file_path = file_path or OUTBOX_FILE
+        self.entries = []
+        self.balances = {}  # account key -> last balance confirmed by the server
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.in_flight = None
+        self.thread = None
+        self.running = False
+        self.load()
+
+    @staticmethod
+    def has_pending_entries(file_path=None):
+        try:
+            with open(file_path or OUTBOX_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return any(e.get("status") == "pending" for e in data.get("entries", []))
+        except Exception:
+            return False
+
+    @staticmethod
+    def account_key(account_number):
+        # Every spelling of the same account maps to the digits of its canonical form
+        canonical = FirebaseManager.account_candidates(account_number)[-1]
+        return "".join(c for c in canonical if c.isdigit())
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.entries = data.get("entries", [])
+            self.balances = data.get("balances", {})
+            # Immediate entries belong to a caller of a previous run that is no longer waiting;
+            # they may or may not have reached the server, so they are left for manual review
+            for entry in self.entries:
+                if entry.get("status") == "pending" and entry.get("mode") == "immediate":
+                    entry["status"] = "review"
+                    entry["needs_review"] = True
+                    entry["last_error"] = "프로그램 종료로 처리 결과를 확인하지 못했습니다."
+                    print(f"[Outbox] {entry['kind']} {entry['id']} was interrupted and needs manual review.")
+        except Exception as e:
+            print(f"[Outbox] Error loading outbox: {e}")
+
+    def save(self):
+        # Called with self.lock held
+        finished = [e for e in self.entries if e["status"] != "pending" and not e.get("needs_review")]
+        if len(finished) > KEEP_FINISHED:
+            drop = set(e["id"] for e in finished[:len(finished) - KEEP_FINISHED])
+            self.entries = [e for e in self.entries if e["id"] not in drop]
+        tmp_path = self.file_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self.entries, "balances": self.balances}, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            print(f"[Outbox] Error saving outbox: {e}")
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="PaymentOutbox", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.wakeup.notify_all()
+
+    def _pending_debits(self, key):
+        return sum(e["amount"] for e in self.entries
+                   if e["status"] == "pending" and e["kind"] == "payment" and e["account_key"] == key)
+
+    def _enqueue(self, kind, account_number, amount, store_name, mode, entry_id=None):
+        entry = {
+            "id": entry_id or uuid.uuid4().hex,
+            "kind": kind,
+            "mode": mode,
+            "account_number": account_number,
+            "account_key": self.account_key(account_number),
+            "amount": float(amount),
+            "store_name": store_name,
+            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt": 0.0,
+            "last_error": "",
+            "balance_after": None
+        }
+        self.entries.append(entry)
+        self.save()
+        self.wakeup.notify_all()
+        return entry
+
+    def _wait_for(self, entry):
+        # Called with self.lock held; returns once the entry left the pending state
+        deadline = time.time() + IMMEDIATE_TIMEOUT
+        while entry["status"] == "pending":
+            remaining = deadline - time.time()
+            if remaining <= 0 and self.in_flight is not entry:
+                if entry["attempts"] == 0:
+                    entry["status"] = "cancelled"
+                else:
+                    # An earlier attempt may have reached the server; leave it for reconciliation
+                    entry["status"] = "review"
+                    entry["needs_review"] = True
+                    print(f"[Outbox] {entry['kind']} {entry['id']} timed out with an unknown result and needs manual review.")
+                entry["last_error"] = "결제 서버 응답이 지연되어 요청이 취소되었습니다."
+                self.save()
+                break
+            self.wakeup.wait(max(remaining, 0.5))
+
+    def process_payment(self, account_number, pin_input, amount, store_name="DU순천점", bypass_pin=False):
+        if not bypass_pin or self.firebase_mgr.is_mock:
+            # PIN checks need the user document, so they cannot be deferred; without a
+            # server connection FirebaseManager fails the request right away
+            return self.firebase_mgr.process_payment(account_number, pin_input, amount, store_name, bypass_pin)
+
+        key = self.account_key(account_number)
+        with self.lock:
+            known_balance = self.balances.get(key)
+            if known_balance is not None:
+                available = known_balance - self._pending_debits(key)
+                if available < amount:
+                    return False, f"잔액이 부족합니다.\n현재 잔액: {int(available):,}원\n결제 금액: {int(amount):,}원", available
+                self._enqueue("payment", account_number, amount, store_name, "deferred")
+                return True, "결제가 정상적으로 완료되었습니다.", available - amount
+
+            entry = self._enqueue("payment", account_number, amount, store_name, "immediate")
+            self._wait_for(entry)
+            if entry["status"] == "settled":
+                return True, "결제가 정상적으로 완료되었습니다.", entry["balance_after"]
+            return False, entry["last_error"], 0.0
+
+    def process_refund(self, account_number, amount, store_name="DU순천점", idempotency_key=None):
+        # The caller waits for the deposit to settle, like a payment without a known balance.
+        # A repeated idempotency_key (e.g. a refund replayed after a crash) is queued only once
+        # and returns the outcome of the first request.
+        if self.firebase_mgr.is_mock:
+            return self.firebase_mgr.process_refund(account_number, amount, store_name, idempotency_key)
+        with self.lock:
+            entry = self._find(idempotency_key) if idempotency_key else None
+            if entry is None:
+                entry = self._enqueue("refund", account_number, amount, store_name, "immediate", idempotency_key)
+            self._wait_for(entry)
+            if entry["status"] == "settled":
+                return True, "환불 처리가 정상적으로 완료되었습니다.", entry["balance_after"]
+            return False, entry["last_error"], 0.0
+
+    def _find(self, entry_id):
+        # Called with self.lock held
+        for entry in self.entries:
+            if entry["id"] == entry_id:
+                return entry
+        return None
+
+    def get_entry(self, entry_id):
+        with self.lock:
+            entry = self._find(entry_id)
+            return dict(entry) if entry is not None else None
+
+    def get_entries(self, status=None):
+        with self.lock:
+            return [dict(e) for e in self.entries if status is None or e["status"] == status]
+
+    def get_review_entries(self):
+        """
+        Entries flagged needs_review that no operator has seen yet, oldest first.
+        """
+        with self.lock:
+            return [dict(e) for e in self.entries if e.get("needs_review")]
+
+    def mark_reviewed(self, entry_ids):
+        with self.lock:
+            for entry in self.entries:
+                if entry["id"] in entry_ids:
+                    entry["needs_review"] = False
+            self.save()
+
+    def _next_entry(self):
+        # Called with self.lock held: the oldest pending entry of each account is its only candidate
+        now = time.time()
+        seen = set()
+        wait = None
+        for entry in self.entries:
+            if entry["status"] != "pending" or entry["account_key"] in seen:
+                continue
+            seen.add(entry["account_key"])
+            if entry["next_attempt"] <= now:
+                return entry, None
+            delay = entry["next_attempt"] - now
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    def _run(self):
+        while True:
+            with self.lock:
+                entry, wait = self._next_entry()
+                while self.running and entry is None:
+                    self.wakeup.wait(wait)
+                    entry, wait = self._next_entry()
+                if not self.running:
+                    return
+                self.in_flight = entry
+
+            try:
+                if entry["kind"] == "payment":
+                    success, message, balance = self.firebase_mgr.process_payment(
+                        entry["account_number"], "", entry["amount"], entry["store_name"],
+                        bypass_pin=True, idempotency_key=entry["id"])
+                else:
+                    success, message, balance = self.firebase_mgr.process_refund(
+                        entry["account_number"], entry["amount"], entry["store_name"],
+                        idempotency_key=entry["id"])
+            except Exception as e:
+                success, message, balance = False, str(e), 0.0
+
+            with self.lock:
+                self.in_flight = None
+                entry["attempts"] += 1
+                if entry["status"] != "pending":
+                    pass
+                elif success:
+                    entry["status"] = "settled"
+                    entry["balance_after"] = balance
+                    entry["settled_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    self.balances[entry["account_key"]] = balance
+                elif any(p in message for p in PERMANENT_ERRORS):
+                    entry["status"] = "failed"
+                    entry["last_error"] = message
+                    if entry["mode"] == "deferred":
+                        # The sale was already completed at the counter; the operator must settle it by hand
+                        entry["needs_review"] = True
+                        print(f"[Outbox] {entry['kind']} {entry['id']} could not be settled and needs manual review: {message}")
+                        # The cached balance was wrong; force the next payment of this account online
+                        self.balances.pop(entry["account_key"], None)
+                else:
+                    # Transient error: the write may or may not have happened, so retry with the
+                    # same idempotency key (immediate entries too, until their caller gives up)
+                    delay = min(RETRY_BASE_DELAY * (2 ** (entry["attempts"] - 1)), RETRY_MAX_DELAY)
+                    entry["next_attempt"] = time.time() + delay
+                    entry["last_error"] = message
+                    print(f"[Outbox] Settlement of {entry['id']} failed (attempt {entry['attempts']}), retrying in {delay:.0f}s: {message}")
+                self.save()
+                self.wakeup.notify_all()
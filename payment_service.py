@@ -0,0 +1,82 @@
+import threading
+import time
+
+# Application-wide DU머니 payment service (FirebaseManager + PaymentOutbox).
+# Built once on a background thread at launch so the first payment does not pay for
+# importing firebase_admin/google.cloud, loading credentials and opening the channel.
+
+_service = None
+_firebase_mgr = None
+_init_error = None
+_init_thread = None
+_init_lock = threading.Lock()
+_ready = threading.Event()
+init_seconds = None
+
+
+def _initialize():
+    global _service, _firebase_mgr, _init_error, init_seconds
+    started = time.perf_counter()
+    try:
+        from firebase_manager import FirebaseManager
+        from payment_outbox import PaymentOutbox
+        firebase_mgr = FirebaseManager()
+        firebase_mgr.warm_up()
+        outbox = PaymentOutbox(firebase_mgr)
+        outbox.start()
+        _firebase_mgr = firebase_mgr
+        _service = outbox
+        init_seconds = time.perf_counter() - started
+        print(f"[PaymentService] Ready in {init_seconds:.2f}s.")
+    except Exception as e:
+        _init_error = e
+        init_seconds = time.perf_counter() - started
+        print(f"[PaymentService] Initialization failed after {init_seconds:.2f}s: {e}")
+    finally:
+        _ready.set()
+
+
+def start_background_init():
+    global _init_thread
+    with _init_lock:
+        if _init_thread is None:
+            _init_thread = threading.Thread(target=_initialize, name="PaymentServiceInit", daemon=True)
+            _init_thread.start()
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def wait_until_ready(timeout=None):
+    start_background_init()
+    return _ready.wait(timeout)
+
+
+def get_payment_service(timeout=None):
+    """
+    Returns the shared PaymentOutbox, waiting for the background initialization if it is
+    still running. Returns None if initialization failed or did not finish within timeout.
+    """
+    if not wait_until_ready(timeout):
+        return None
+    return _service
+
+
+def get_firebase_manager(timeout=None):
+    if not wait_until_ready(timeout):
+        return None
+    return _firebase_mgr
+
+
+def get_init_error():
+    return _init_error
+
+
+def unavailable_message():
+    """
+    Why get_payment_service() returned None, for the cashier.
+    """
+    if not is_ready():
+        return "결제 서비스 준비 중입니다.\n잠시 후 다시 시도해 주세요."
+    return f"결제 서비스를 시작하지 못했습니다.\n({_init_error})"
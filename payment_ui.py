@@ -1,35 +1,31 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QFrame, QWidget, QLineEdit, QGridLayout,
                              QGraphicsDropShadowEffect, QButtonGroup)
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QObject, pyqtSignal
 from PyQt6.QtGui import QColor
-from ui_components import CustomMessageDialog
+from ui_components import CustomMessageDialog, PaymentWorker
 
 import styles
 
-try:
-    from smartcard.System import readers
-    from smartcard.Exceptions import NoCardException, CardConnectionException
-    SMARTCARD_AVAILABLE = True
-except ImportError:
-    SMARTCARD_AVAILABLE = False
+import card_reader_service
+
+
+class CardEventBridge(QObject):
+    # Carries card reader events from the reader service thread to the dialog
+    card_event = pyqtSignal(str, object, object) # event, reader, data
 
 class CreditCardPaymentDialog(QDialog):
-    def __init__(self, total_amount, firebase_mgr=None, parent=None):
+    def __init__(self, total_amount, firebase_mgr, parent=None):
         super().__init__(parent)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setFixedSize(styles.s(680), styles.s(520))
         
         self.total_amount = total_amount
+        # Shared app-wide payment service; the caller makes sure it is ready (MainWindow.require_payment_outbox)
         self.firebase_mgr = firebase_mgr
-        if self.firebase_mgr is None:
-            try:
-                from firebase_manager import FirebaseManager
-                self.firebase_mgr = FirebaseManager()
-            except Exception:
-                self.firebase_mgr = None
         self.is_auto_processing = False
+        self.payment_worker = None
         
         # Main Container
         self.container = QFrame(self)
@@ -68,15 +64,12 @@ class CreditCardPaymentDialog(QDialog):
         self.txt_card_num.textChanged.connect(self.on_card_num_changed)
         self.txt_card_num.returnPressed.connect(self.process_payment)
         
-        # Smart Card Reader States
-        self.last_card_state = "DISCONNECTED"
-        self.active_reader = None
-        self.connection = None
-        
-        self.card_timer = QTimer(self)
-        self.card_timer.timeout.connect(self.check_card_loop)
-        if SMARTCARD_AVAILABLE:
-            self.card_timer.start(800)
+        # Smart card reader events (insert/remove/card number) pushed by the reader service
+        self.card_bridge = CardEventBridge(self)
+        self.card_bridge.card_event.connect(self.on_card_event)
+        self.card_listener = self.card_bridge.card_event.emit
+        self.card_present = False
+        if card_reader_service.get_service().subscribe(self.card_listener):
             self.lbl_card_status.setText("● 리더기 감지 중...")
             self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #F59E0B; font-family: 'Malgun Gothic';")
         else:
@@ -473,14 +466,14 @@ class CreditCardPaymentDialog(QDialog):
             except Exception:
                 pass
 
-        success, message, balance = self.firebase_mgr.process_payment(
-            account_number=card_num,
-            pin_input="",
-            amount=amount,
-            store_name=store_name,
-            bypass_pin=True
-        )
+        # The outbox may wait for the server (up to its IMMEDIATE_TIMEOUT); keep the UI responsive
+        self.pending_amount = amount
+        self.payment_worker = PaymentWorker(self.firebase_mgr, card_num, amount, store_name)
+        self.payment_worker.finished_signal.connect(self.on_firebase_payment_finished)
+        self.payment_worker.start()
 
+    def on_firebase_payment_finished(self, success, message, balance):
+        amount = self.pending_amount
         if success:
             self.final_balance_after = balance
             self.show_approval_overlay(
@@ -509,130 +502,54 @@ class CreditCardPaymentDialog(QDialog):
         return int(self.txt_pay_amt.text().replace(",", ""))
 
     def accept(self):
-        self.card_timer.stop()
+        self.stop_card_events()
         super().accept()
 
     def reject(self):
-        self.card_timer.stop()
+        if self.payment_worker is not None and self.payment_worker.isRunning():
+            return # the approval result is still to come
+        self.stop_card_events()
         super().reject()
 
     def closeEvent(self, event):
-        self.card_timer.stop()
+        self.stop_card_events()
         super().closeEvent(event)
 
-    def check_card_loop(self):
-        if not SMARTCARD_AVAILABLE:
-            return
-        try:
-            rs = readers()
-            if not rs:
-                self.lbl_card_status.setText("● 카드 리더기 연결 안 됨")
-                self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-                self.set_disconnected_state()
-            else:
-                self.active_reader = rs[0]
-                self.auto_read_card()
-        except Exception:
-            self.lbl_card_status.setText("● 리더기 확인 중 오류")
-            self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-            self.set_disconnected_state()
-
-    def set_disconnected_state(self):
-        self.last_card_state = "DISCONNECTED"
-        self.connection = None
-
-    def auto_read_card(self):
-        if not self.active_reader:
-            return
-            
-        if self.connection is not None and self.last_card_state == "READY":
-            try:
-                # Fast presence check
-                read_cmd = [0xFF, 0xB0, 0x00, 0x00, 0x01]
-                self.connection.transmit(read_cmd)
+    def stop_card_events(self):
+        card_reader_service.get_service().unsubscribe(self.card_listener)
+
+    def set_card_status(self, text, color):
+        self.lbl_card_status.setText(text)
+        self.lbl_card_status.setStyleSheet(f"font-size: 10pt; font-weight: bold; color: {color}; font-family: 'Malgun Gothic';")
+
+    def on_card_event(self, event, reader, data):
+        if event == "readers":
+            if not data:
+                self.set_card_status("● 카드 리더기 연결 안 됨", "#EF4444")
+                self.card_present = False
+            elif not self.card_present:
+                self.set_card_status("● 카드를 삽입해주세요", "#3B82F6")
+        elif event == "inserted":
+            self.card_present = True
+            self.set_card_status("● 카드 읽는 중...", "#F59E0B")
+        elif event == "card_read":
+            if data is None:
+                self.set_card_status("● 인식 실패 (다시 시도)", "#EF4444")
                 return
-            except Exception:
-                self.lbl_card_status.setText("● 카드를 삽입해주세요")
-                self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #3B82F6; font-family: 'Malgun Gothic';")
-                self.set_disconnected_state()
-                return
-
-        try:
-            conn = self.active_reader.createConnection()
-            connected = False
-            for protocol in [1, 2, 3]:
-                try:
-                    conn.connect(protocol)
-                    connected = True
-                    break
-                except Exception:
-                    continue
-            
-            if not connected:
-                conn.connect()
-                
-            self.connection = conn
-            
-            if self.last_card_state != "READY":
-                self.lbl_card_status.setText("● 카드 읽는 중...")
-                self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #F59E0B; font-family: 'Malgun Gothic';")
-                from PyQt6.QtWidgets import QApplication
-                QApplication.processEvents()
-                
-                card_number = self.read_card_number_sequence()
-                if card_number:
-                    digits_only = "".join([c for c in card_number if c.isdigit()])
-                    if len(digits_only) > 16:
-                        digits_only = digits_only[:16]
-                    
-                    if digits_only:
-                        self.is_card_reading = True
-                        self.txt_card_num.setText(digits_only)
-                        self.is_card_reading = False
-                        self.txt_card_name.setText("IC 카드")
-                        self.lbl_card_status.setText("● 카드 인식 성공")
-                        self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #10B981; font-family: 'Malgun Gothic';")
-                        self.last_card_state = "READY"
-                    else:
-                        self.lbl_card_status.setText("● 인식 실패 (데이터 없음)")
-                        self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-                        self.last_card_state = "READY"
-                else:
-                    self.lbl_card_status.setText("● 인식 실패 (다시 시도)")
-                    self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-                    self.last_card_state = "READY"
-                    
-        except NoCardException:
-            self.lbl_card_status.setText("● 카드를 삽입해주세요")
-            self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #3B82F6; font-family: 'Malgun Gothic';")
-            self.set_disconnected_state()
-        except CardConnectionException:
-            self.lbl_card_status.setText("● 카드 인식 오류")
-            self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-            self.last_card_state = "DISCONNECTED"
-        except Exception:
-            self.lbl_card_status.setText("● 카드 감지 중 오류")
-            self.lbl_card_status.setStyleSheet("font-size: 10pt; font-weight: bold; color: #EF4444; font-family: 'Malgun Gothic';")
-            self.set_disconnected_state()
-
-    def read_card_number_sequence(self):
-        if not self.connection:
-            return None
-        try:
-            # 1. Initialize SLE4442 card
-            init_cmd = [0xFF, 0xA4, 0x00, 0x00, 0x01, 0x06]
-            self.connection.transmit(init_cmd)
-            
-            # 2. Read 20 bytes from address 0x00
-            read_cmd = [0xFF, 0xB0, 0x00, 0x00, 0x14]
-            data, sw1, sw2 = self.connection.transmit(read_cmd)
-            
-            if sw1 == 0x90 and sw2 == 0x00:
-                decoded = "".join([chr(x) for x in data if 32 <= x <= 126])
-                return decoded.strip()
-        except Exception:
-            pass
-        return None
+            digits_only = "".join([c for c in data if c.isdigit()])[:16]
+            if digits_only:
+                self.is_card_reading = True
+                self.txt_card_num.setText(digits_only)
+                self.is_card_reading = False
+                self.txt_card_name.setText("IC 카드")
+                self.set_card_status("● 카드 인식 성공", "#10B981")
+            else:
+                self.set_card_status("● 인식 실패 (데이터 없음)", "#EF4444")
+        elif event == "removed":
+            self.card_present = False
+            self.set_card_status("● 카드를 삽입해주세요", "#3B82F6")
+        elif event == "error":
+            self.set_card_status("● 카드 인식 오류", "#EF4444")
 
     def show_approval_overlay(self, status_type, title, main_msg, sub_msg, status_msg):
         # Remove old overlay if exists
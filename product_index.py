@@ -0,0 +1,170 @@
+"""
+In-memory product name index for the name search dialogs.
+
+ProductManager keeps one entry per product with the search forms of its name (lowercase
+without spaces, choseong string, jamo decomposition) and posts the name's search grams
+(hangul.search_grams: character bigrams, syllable unigrams and choseong unigrams/bigrams)
+to it. A query intersects the postings of its grams and checks only those candidates, so
+"ㅅㅇㄲ", "새우" and "새우ㄲ" are answered without touching the rest of the catalog. A
+one-syllable query such as "새" reads the postings of the syllables it can still become
+("새", "색", "샌", ...) instead of every name with the choseong ㅅ.
+
+rank() orders results for the search dialogs: exact and prefix matches of the barcode
+or name first, then substring and choseong matches, then names within a small jamo
+edit distance of the query (typos such as "새우깽"); within each of these tiers the
+products sold most recently come first. Only the best limit results are returned.
+"""
+import heapq
+
+import hangul
+
+RANK_LIMIT = 200
+# Score tiers, best first; within a tier recently sold products come first
+SCORE_EXACT_BARCODE = 110
+SCORE_EXACT_NAME = 100
+SCORE_BARCODE_PREFIX = 90
+SCORE_NAME_PREFIX = 80
+SCORE_NAME_SUBSTRING = 60
+SCORE_CHOSEONG = 50
+SCORE_BARCODE_SUBSTRING = 40
+SCORE_FUZZY = 30 # minus FUZZY_PENALTY per edit
+FUZZY_PENALTY = 10
+FUZZY_MIN_JAMO = 4 # shorter queries are not typo-corrected
+FUZZY_CANDIDATES = 100 # names sharing the most grams with the query that are checked
+FUZZY_MAX_POSTING = 5000 # grams this common do not help pick candidates
+
+
+def substring_distance(pattern, text):
+    """
+    Edit distance between pattern and the substring of text it is closest to.
+    """
+    prev = [0] * (len(text) + 1)
+    for i, pc in enumerate(pattern, 1):
+        cur = [i]
+        for j, tc in enumerate(text, 1):
+            cur.append(min(prev[j - 1] + (pc != tc), prev[j] + 1, cur[j - 1] + 1))
+        prev = cur
+    return min(prev)
+
+
+class ProductSearchIndex:
+    def __init__(self, products=None, sales=None):
+        self.entries = {} # barcode -> {"name", "choseong", "jamo"}
+        self.postings = {} # gram -> set of barcodes
+        self.sales = sales if sales is not None else {} # barcode -> quantity sold recently
+        for barcode, data in (products or {}).items():
+            self.add(barcode, data.get("name", ""))
+
+    def add(self, barcode, name):
+        self.remove(barcode)
+        name = hangul.normalize(name)
+        self.entries[barcode] = {"name": name, "choseong": hangul.get_choseong(name), "jamo": hangul.decompose(name)}
+        for gram in hangul.search_grams(name, syllables=True):
+            self.postings.setdefault(gram, set()).add(barcode)
+
+    def remove(self, barcode):
+        entry = self.entries.pop(barcode, None)
+        if entry is None:
+            return
+        for gram in hangul.search_grams(entry["name"], syllables=True):
+            barcodes = self.postings.get(gram)
+            if barcodes is not None:
+                barcodes.discard(barcode)
+                if not barcodes:
+                    del self.postings[gram]
+
+    def search(self, query):
+        """
+        Barcodes of the products whose name matches query (see hangul.matches).
+        """
+        query = hangul.normalize(query)
+        if not query:
+            return set(self.entries)
+        if len(query) == 1 and hangul.is_syllable(query):
+            postings = [self.postings.get(key, ()) for key in hangul.completions(query)]
+            return set().union(*postings)
+        keys = hangul.search_grams(query, hangul.typed_length(query), syllables=True)
+        if keys:
+            postings = sorted((self.postings.get(key, ()) for key in keys), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = self.entries
+        entries = self.entries
+        if hangul.is_choseong_only(query):
+            return {b for b in candidates if query in entries[b]["choseong"]}
+        return {b for b in candidates if query in entries[b]["name"] or hangul.matches(query, entries[b]["name"])}
+
+    def fuzzy_matches(self, query, exclude):
+        """
+        {barcode: edits} for names within a few jamo edits of query, not in exclude.
+        """
+        jamo = hangul.decompose(query)
+        if len(jamo) < FUZZY_MIN_JAMO:
+            return {}
+        max_edits = 1 if len(jamo) < 8 else 2
+        hits = {}
+        for key in hangul.search_grams(query, len(query)):
+            barcodes = self.postings.get(key, ())
+            if len(barcodes) > FUZZY_MAX_POSTING:
+                continue
+            for barcode in barcodes:
+                hits[barcode] = hits.get(barcode, 0) + 1
+        candidates = heapq.nlargest(FUZZY_CANDIDATES, (b for b in hits if b not in exclude), key=hits.get)
+        result = {}
+        for barcode in candidates:
+            edits = substring_distance(jamo, self.entries[barcode]["jamo"])
+            if edits <= max_edits:
+                result[barcode] = edits
+        return result
+
+    def rank(self, query, limit=RANK_LIMIT):
+        """
+        Barcodes matching query by barcode, name, choseong or a close spelling, best first.
+        """
+        query = hangul.normalize(query)
+        if not query:
+            return []
+        scores = {}
+        if any(c.isdigit() for c in query):
+            for barcode in self.entries:
+                if barcode == query:
+                    scores[barcode] = SCORE_EXACT_BARCODE
+                elif barcode.startswith(query):
+                    scores[barcode] = SCORE_BARCODE_PREFIX
+                elif query in barcode:
+                    scores[barcode] = SCORE_BARCODE_SUBSTRING
+        for barcode in self.search(query):
+            name = self.entries[barcode]["name"]
+            if name == query:
+                score = SCORE_EXACT_NAME
+            elif name.startswith(query):
+                score = SCORE_NAME_PREFIX
+            elif query in name:
+                score = SCORE_NAME_SUBSTRING
+            else:
+                score = SCORE_CHOSEONG
+            scores[barcode] = max(score, scores.get(barcode, 0))
+        if len(scores) < limit:
+            for barcode, edits in self.fuzzy_matches(query, scores).items():
+                scores[barcode] = SCORE_FUZZY - FUZZY_PENALTY * edits
+        tiers = {}
+        for barcode, score in scores.items():
+            tiers.setdefault(score, []).append(barcode)
+        # Tiers are filled best first; only the last one that fits is partially sorted
+        result = []
+        for score in sorted(tiers, reverse=True):
+            result.extend(self.best_of_tier(tiers[score], limit - len(result)))
+            if len(result) >= limit:
+                break
+        return result
+
+    def best_of_tier(self, barcodes, count):
+        # Recently sold products first, then shorter names
+        entries = self.entries
+        sales = self.sales
+        sold = [b for b in barcodes if sales.get(b)]
+        best = heapq.nlargest(count, sold, key=lambda b: (sales[b], -len(entries[b]["name"])))
+        if len(best) < count:
+            unsold = (b for b in barcodes if not sales.get(b))
+            best += heapq.nsmallest(count - len(best), unsold, key=lambda b: len(entries[b]["name"]))
+        return best
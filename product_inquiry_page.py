@@ -7,6 +7,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPixmap, QColor
 import styles
+from product_search import TableSearch
 
 class ProductInquiryPage(QWidget):
     backRequested = pyqtSignal()
@@ -110,7 +111,6 @@ class ProductInquiryPage(QWidget):
         self.txt_search = QLineEdit()
         self.txt_search.setPlaceholderText("바코드 번호를 스캔하거나 입력")
         self.txt_search.setStyleSheet(EDITABLE_STYLE)
-        self.txt_search.textChanged.connect(self.on_search_changed)
         
         btn_search_name = QPushButton("상품명으로 조회")
         btn_search_name.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -228,6 +228,8 @@ class ProductInquiryPage(QWidget):
         self.table.setColumnCount(2)
         self.table.setHorizontalHeaderLabels(["바코드", "상품명"])
         self.table.setFixedHeight(200)
+        self.table_search = TableSearch(self.table, self.txt_search)
+        self.table_search.filtered.connect(self.on_search_filtered)
         
         TABLE_QSS = f"""
             QTableWidget {{
@@ -404,7 +406,7 @@ class ProductInquiryPage(QWidget):
         self.txt_search.blockSignals(True)
         self.txt_search.clear()
         self.txt_search.blockSignals(False)
-        self.on_search_changed("")
+        self.table_search.apply()
         self.txt_search.setFocus()
         
     def load_data(self):
@@ -421,25 +423,9 @@ class ProductInquiryPage(QWidget):
             
         if self.table.rowCount() > 0:
             self.table.selectRow(0)
+        self.table_search.set_rows((barcode, data["name"]) for barcode, data in self.products.items())
             
-    def on_search_changed(self, text):
-        search_text = text.strip().lower()
-        first_visible_row = -1
-        
-        for row in range(self.table.rowCount()):
-            barcode_item = self.table.item(row, 0)
-            name_item = self.table.item(row, 1)
-            
-            barcode = barcode_item.text().lower() if barcode_item else ""
-            name = name_item.text().lower() if name_item else ""
-            
-            if search_text in barcode or search_text in name:
-                self.table.setRowHidden(row, False)
-                if first_visible_row == -1:
-                    first_visible_row = row
-            else:
-                self.table.setRowHidden(row, True)
-                
+    def on_search_filtered(self, first_visible_row):
         # Block table signal to avoid recursions
         self.table.blockSignals(True)
         if first_visible_row != -1:
@@ -1,5 +1,11 @@
 import json
 import os
+import itertools
+import threading
+from datetime import datetime
+
+import startup_profiler
+from product_index import ProductSearchIndex, RANK_LIMIT
 
 # Default data optimized for installation with requested products
 DEFAULT_PRODUCTS = {
@@ -41,17 +47,27 @@ DEFAULT_VOUCHERS = {
 class ProductManager:
     def __init__(self):
         self.products = {}
+        self._search_index = None # built by start_search_index_build or the first name search
+        self._index_lock = threading.Lock()
+        self._index_thread = None
+        self._index_generation = 0 # bumped on reload, so a build of the old catalog is dropped
+        self._index_dirty = set() # barcodes changed while the background build runs
+        self.sales = {} # barcode -> quantity sold recently, boosts search ranking
         self.load_products()
         self.vouchers = {}
         self.load_vouchers()
 
     def load_products(self):
+        with self._index_lock:
+            self._search_index = None
+            self._index_generation += 1
+            self._index_dirty.clear()
         if not os.path.exists(DATA_FILE):
             self.products = DEFAULT_PRODUCTS.copy()
             self.save_products()
         else:
             try:
-                with open(DATA_FILE, 'r', encoding='utf-8') as f:
+                with open(DATA_FILE, 'r', encoding='utf-8') as f, startup_profiler.span(DATA_FILE, "json"):
                     self.products = json.load(f)
             except (json.JSONDecodeError, IOError):
                 self.products = DEFAULT_PRODUCTS.copy()
@@ -70,8 +86,92 @@ class ProductManager:
     def get_all_products(self):
         return self.products
 
+    @property
+    def search_index(self):
+        if self._search_index is None:
+            thread = self._index_thread
+            if thread is not None:
+                # Searched before the background build finished: wait for it
+                thread.join()
+            if self._search_index is None:
+                with startup_profiler.span("ProductSearchIndex", "index"):
+                    self._search_index = ProductSearchIndex(self.products, self.sales)
+        return self._search_index
+
+    def start_search_index_build(self):
+        """
+        Builds the name search index on a background thread so the first search does not
+        wait for it. Products changed meanwhile are re-indexed when the build finishes.
+        """
+        with self._index_lock:
+            if self._search_index is not None or self._index_thread is not None:
+                return
+            products = dict(self.products)
+            self._index_thread = threading.Thread(
+                target=self._build_search_index, args=(products, self._index_generation),
+                name="ProductSearchIndex", daemon=True)
+            self._index_thread.start()
+
+    def _build_search_index(self, products, generation):
+        try:
+            with startup_profiler.span("ProductSearchIndex", "index"):
+                index = ProductSearchIndex(products, self.sales)
+        except Exception as e:
+            print(f"Error building product search index: {e}")
+            index = None
+        with self._index_lock:
+            self._index_thread = None
+            if index is None or generation != self._index_generation or self._search_index is not None:
+                return
+            for barcode in self._index_dirty:
+                if barcode in self.products:
+                    index.add(barcode, self.products[barcode]["name"])
+                else:
+                    index.remove(barcode)
+            self._index_dirty.clear()
+            self._search_index = index
+
+    def rank_products(self, query, limit=RANK_LIMIT):
+        """
+        Best matches for query (barcode, name, choseong or a misspelled name), best first.
+        An empty query lists the first limit products in catalog order.
+        """
+        if not query.strip():
+            return list(itertools.islice(self.products, limit))
+        return self.search_index.rank(query, limit)
+
+    def set_sales_counts(self, counts):
+        """
+        counts: quantity sold per barcode or product name (TransactionManager.get_item_sales).
+        """
+        barcode_of = {data["name"]: barcode for barcode, data in self.products.items()}
+        # Added to the counts in place: the search index holds the same dict, and sales
+        # recorded since startup are already in it
+        for key, qty in counts.items():
+            barcode = key if key in self.products else barcode_of.get(key)
+            if barcode:
+                self.sales[barcode] = self.sales.get(barcode, 0) + qty
+
+    def record_sale(self, barcode, qty):
+        self.sales[barcode] = self.sales.get(barcode, 0) + qty
+
+    def _index_product(self, barcode):
+        with self._index_lock:
+            if self._search_index is not None:
+                self._search_index.add(barcode, self.products[barcode]["name"])
+            elif self._index_thread is not None:
+                self._index_dirty.add(barcode)
+
+    def _unindex_product(self, barcode):
+        with self._index_lock:
+            if self._search_index is not None:
+                self._search_index.remove(barcode)
+            elif self._index_thread is not None:
+                self._index_dirty.add(barcode)
+
     def add_product(self, barcode, name, price, category="", stock=0, promo_type=0, is_quick=False):
         self.products[barcode] = {"name": name, "price": price, "category": category, "stock": stock, "promo_type": promo_type, "is_quick": is_quick}
+        self._index_product(barcode)
         self.save_products()
 
     def update_product(self, barcode, name, price, category="", stock=None, promo_type=None, is_quick=None):
@@ -85,6 +185,7 @@ class ProductManager:
                 self.products[barcode]["promo_type"] = promo_type
             if is_quick is not None:
                 self.products[barcode]["is_quick"] = is_quick
+            self._index_product(barcode)
             self.save_products()
             
     def update_product_key(self, old_barcode, new_barcode, name, price, category="", stock=0, promo_type=0, is_quick=False):
@@ -103,12 +204,15 @@ class ProductManager:
                 new_products[key] = value
         
         self.products = new_products
+        self._unindex_product(old_barcode)
+        self._index_product(new_barcode)
         self.save_products()
         return True
 
     def delete_product(self, barcode):
         if barcode in self.products:
             del self.products[barcode]
+            self._unindex_product(barcode)
             self.save_products()
 
     def reduce_stock(self, barcode, qty):
@@ -133,7 +237,7 @@ class ProductManager:
             self.save_vouchers()
         else:
             try:
-                with open(VOUCHER_FILE, 'r', encoding='utf-8') as f:
+                with open(VOUCHER_FILE, 'r', encoding='utf-8') as f, startup_profiler.span(VOUCHER_FILE, "json"):
                     self.vouchers = json.load(f)
             except (json.JSONDecodeError, IOError):
                 self.vouchers = DEFAULT_VOUCHERS.copy()
@@ -177,6 +281,7 @@ class ProductManager:
     def mark_voucher_used(self, barcode):
         if barcode in self.vouchers:
             self.vouchers[barcode]["status"] = "used"
+            self.vouchers[barcode]["used_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             self.save_vouchers()
             return True
         return False
@@ -185,3 +290,15 @@ class ProductManager:
         if barcode in self.vouchers:
             del self.vouchers[barcode]
             self.save_vouchers()
+
+    def remove_vouchers(self, barcodes):
+        """
+        Deletes several vouchers with one save. Returns how many were removed.
+        """
+        removed = 0
+        for barcode in barcodes:
+            if self.vouchers.pop(barcode, None) is not None:
+                removed += 1
+        if removed:
+            self.save_vouchers()
+        return removed
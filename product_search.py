@@ -0,0 +1,159 @@
+"""
+Live search over the product tables.
+
+The barcode and name of every row are lowercased once when the table is loaded, so a
+keystroke is one substring test per key instead of reading and lowercasing each cell.
+A query that extends the previous one only re-checks the previous matches, only rows
+whose visibility changes are touched, and on large catalogs the search waits until
+typing pauses.
+
+RankedSearch instead asks ProductManager.rank_products for the best matches (choseong,
+typos, recent sales) and hands them to the page to show as a short table.
+"""
+from PyQt6.QtCore import QObject, QThread, QTimer, pyqtSignal
+
+from product_index import RANK_LIMIT
+
+SEARCH_DEBOUNCE_MS = 150
+DEBOUNCE_MIN_ROWS = 2000 # smaller tables are filtered on every keystroke
+
+
+def search_key(barcode, name):
+    # The newline keeps a query from matching across the two fields
+    return f"{barcode}\n{name}".lower()
+
+
+class ProductFilter:
+    def __init__(self, keys=()):
+        self.set_keys(keys)
+
+    def set_keys(self, keys):
+        self.keys = list(keys)
+        self.last_query = ""
+        self.last_rows = range(len(self.keys))
+
+    def filter(self, query):
+        """
+        Indexes (ascending) of the keys containing query.
+        """
+        query = query.strip().lower()
+        if not query:
+            rows = range(len(self.keys))
+        else:
+            if self.last_query and query.startswith(self.last_query):
+                candidates = self.last_rows
+            else:
+                candidates = range(len(self.keys))
+            keys = self.keys
+            rows = [i for i in candidates if query in keys[i]]
+        self.last_query = query
+        self.last_rows = rows
+        return rows
+
+
+class TableSearch(QObject):
+    filtered = pyqtSignal(int) # first matching row, -1 if none
+
+    def __init__(self, table, line_edit):
+        super().__init__(table)
+        self.table = table
+        self.line_edit = line_edit
+        self.filter = ProductFilter()
+        self.row_count = 0
+        self.hidden = set()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.timer.timeout.connect(self.apply)
+        line_edit.textChanged.connect(self.on_text_changed)
+
+    def set_rows(self, rows):
+        """
+        rows: (barcode, name) of each table row, in table order. Re-applies the current search.
+        """
+        self.filter.set_keys(search_key(barcode, name) for barcode, name in rows)
+        self.reset(len(self.filter.keys))
+
+    def reset(self, row_count):
+        """
+        Starts over on a reloaded table of row_count rows and re-applies the current search.
+        """
+        self.row_count = row_count
+        # Rows kept by setRowCount keep their hidden flag; start from a fully visible table
+        for row in self.hidden:
+            if row < self.table.rowCount():
+                self.table.setRowHidden(row, False)
+        self.hidden = set()
+        self.apply()
+
+    def on_text_changed(self, text):
+        if self.row_count < DEBOUNCE_MIN_ROWS:
+            self.apply()
+        else:
+            self.timer.start()
+
+    def apply(self):
+        self.timer.stop()
+        rows = self.filter.filter(self.line_edit.text())
+        if len(rows) == self.row_count:
+            hidden = set()
+        else:
+            hidden = set(range(self.row_count)).difference(rows)
+        self.table.setUpdatesEnabled(False)
+        for row in hidden - self.hidden:
+            self.table.setRowHidden(row, True)
+        for row in self.hidden - hidden:
+            self.table.setRowHidden(row, False)
+        self.table.setUpdatesEnabled(True)
+        self.hidden = hidden
+        self.filtered.emit(rows[0] if rows else -1)
+
+
+class RankedSearch(QObject):
+    results = pyqtSignal(list) # barcodes, best first
+
+    def __init__(self, product_manager, line_edit, limit=RANK_LIMIT, show_all=False):
+        super().__init__(line_edit)
+        self.product_manager = product_manager
+        self.line_edit = line_edit
+        self.limit = limit
+        self.show_all = show_all # an empty query lists the whole catalog, not the first limit products
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.timer.timeout.connect(self.apply)
+        line_edit.textChanged.connect(self.on_text_changed)
+
+    def on_text_changed(self, text):
+        if len(self.product_manager.get_all_products()) < DEBOUNCE_MIN_ROWS:
+            self.apply()
+        else:
+            self.timer.start()
+
+    def apply(self):
+        self.timer.stop()
+        query = self.line_edit.text()
+        if self.show_all and not query.strip():
+            self.results.emit(list(self.product_manager.get_all_products()))
+        else:
+            self.results.emit(self.product_manager.rank_products(query, self.limit))
+
+
+class SalesHistoryWorker(QThread):
+    """
+    Reads the recent sales per item from the transaction history for search ranking.
+    """
+    finished_signal = pyqtSignal(dict)
+
+    def __init__(self, transaction_manager):
+        super().__init__()
+        self.transaction_manager = transaction_manager
+
+    def run(self):
+        try:
+            self.finished_signal.emit(self.transaction_manager.get_item_sales())
+        except Exception as e:
+            print(f"[ProductSearch] Error reading sales history: {e}")
+            self.finished_signal.emit({})
@@ -358,7 +358,6 @@ class ReceiptInquiryPage(QWidget):
 
     def load_transactions(self):
         import datetime
-        transactions = self.tm.get_all_transactions()
         
         # Parse inputs
         pos_filter = self.cb_pos.currentText()
@@ -405,6 +404,12 @@ class ReceiptInquiryPage(QWidget):
             else:
                 p2_name = barcode2.lower()
                 
+        # Stream only the selected date range from storage (newest first)
+        transactions = self.tm.iter_transactions(
+            start=datetime.datetime.combine(start_date, datetime.time.min),
+            end=datetime.datetime.combine(end_date, datetime.time.max),
+            reverse=True)
+        
         filtered = []
         for tx in transactions:
             ts_str = tx.get("timestamp", "")
@@ -2,6 +2,8 @@ import datetime
 import json
 import os
 
+import startup_profiler
+
 class ReceiptManager:
     def __init__(self, store_name="DU 홍익점"):
         os.makedirs("json", exist_ok=True)
@@ -18,7 +20,7 @@ class ReceiptManager:
     def load_store_info(self):
         if os.path.exists(self.config_path):
             try:
-                with open(self.config_path, "r", encoding="utf-8") as f:
+                with open(self.config_path, "r", encoding="utf-8") as f, startup_profiler.span(self.config_path, "json"):
                     data = json.load(f)
                     self.store_name = data.get("store_name", self.default_info["store_name"])
                     self.biz_num = data.get("biz_num", self.default_info["biz_num"])
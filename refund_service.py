@@ -0,0 +1,228 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime
+
+os.makedirs("json", exist_ok=True)
+REFUND_LOG_FILE = os.path.join("json", "refund_log.json")
+STORE_INFO_FILE = os.path.join("json", "store_info.json")
+
+# Finished log entries kept for reconciliation
+KEEP_FINISHED = 200
+
+RESULT_MESSAGES = {
+    "Success": "환불이 정상 완료되었습니다.",
+    "AlreadyRefunded": "이미 환불 처리된 영수증입니다.",
+    "NotFound": "해당 바코드의 영수증을 찾을 수 없습니다.",
+    "Error": "환불 처리 중 오류가 발생했습니다."
+}
+
+
+class RefundService:
+    """
+    Receipt refunds with a two-phase log (json/refund_log.json).
+
+    The receipt is validated against the TransactionManager barcode index, a 'prepared'
+    entry is written, then the DU머니 reversal (keyed by the entry id) and the local
+    'Refunded' mark run concurrently. If the reversal is rejected the local mark is
+    compensated; if the app dies mid-way, recover() replays unfinished entries with the
+    same key so the reversal is applied at most once.
+    """
+
+    def __init__(self, transaction_manager, get_payment_service, file_path=None):
+        self.transaction_manager = transaction_manager
+        self.get_payment_service = get_payment_service # callable, resolved when a reversal is needed
+        self.file_path = file_path or REFUND_LOG_FILE
+        self.entries = []
+        self.lock = threading.Lock()
+        self.in_progress = set() # receipt barcodes being refunded right now
+        self.store_name_cache = (None, "DU순천점") # (store_info.json mtime, store_name)
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("entries", [])
+        except Exception as e:
+            print(f"[Refund] Error loading refund log: {e}")
+
+    def save(self):
+        # Called with self.lock held
+        finished = [e for e in self.entries if e["phase"] in ("committed", "compensated")]
+        if len(finished) > KEEP_FINISHED:
+            drop = set(e["id"] for e in finished[:len(finished) - KEEP_FINISHED])
+            self.entries = [e for e in self.entries if e["id"] not in drop]
+        tmp_path = self.file_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": self.entries}, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            print(f"[Refund] Error saving refund log: {e}")
+
+    def _set_phase(self, entry, phase, **fields):
+        with self.lock:
+            entry["phase"] = phase
+            entry["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            entry.update(fields)
+            self.save()
+
+    def get_store_name(self):
+        try:
+            mtime = os.path.getmtime(STORE_INFO_FILE)
+        except OSError:
+            return self.store_name_cache[1]
+        if mtime != self.store_name_cache[0]:
+            try:
+                with open(STORE_INFO_FILE, "r", encoding="utf-8") as f:
+                    self.store_name_cache = (mtime, json.load(f).get("store_name", "DU순천점"))
+            except Exception:
+                pass
+        return self.store_name_cache[1]
+
+    @staticmethod
+    def account_number_of(tx):
+        for p in tx.get("payments", []):
+            if p.get("method") == "MobilePay":
+                account_num = p.get("details", {}).get("account_number")
+                if account_num:
+                    return account_num
+        return tx.get("payment_details", {}).get("account_number")
+
+    def refund(self, barcode, amount, pay_method, tx):
+        """
+        Refunds a receipt. Returns (success, message).
+        """
+        with self.lock:
+            if barcode in self.in_progress:
+                return False, "이미 환불 처리가 진행 중인 영수증입니다."
+            self.in_progress.add(barcode)
+        try:
+            status = self.transaction_manager.get_refund_status(barcode)
+            if status != "Refundable":
+                return False, RESULT_MESSAGES[status]
+            if any(e["tx_barcode"] == barcode and e["phase"] == "review" for e in self.get_entries()):
+                return False, "이전 환불 요청의 처리 결과를 확인할 수 없어 관리자 확인이 필요합니다."
+
+            account_num = self.account_number_of(tx) if pay_method == "MobilePay" else None
+            if not account_num:
+                result = self.transaction_manager.mark_as_refunded(barcode)
+                return result == "Success", RESULT_MESSAGES.get(result, RESULT_MESSAGES["Error"])
+
+            entry = {
+                "id": uuid.uuid4().hex,
+                "tx_barcode": barcode,
+                "account_number": account_num,
+                "amount": float(amount),
+                "store_name": self.get_store_name(),
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "phase": "prepared",
+                "remote_done": False,
+                "local_done": False,
+                "last_error": ""
+            }
+            with self.lock:
+                self.entries.append(entry)
+                self.save()
+            return self._execute(entry)
+        finally:
+            with self.lock:
+                self.in_progress.discard(barcode)
+
+    def _reverse_payment(self, entry, outcome, replay):
+        # PaymentOutbox.process_refund returns once the deposit is settled or given up on; its
+        # outbox entry (keyed by the refund id) tells whether a failed reversal may still apply
+        service = self.get_payment_service()
+        if service is None:
+            # Nothing was sent in this run; an interrupted earlier run may have sent it
+            outcome["remote"] = (False, "결제 서비스가 준비되지 않았습니다.")
+            outcome["permanent"] = not replay
+            return
+        try:
+            success, message, _ = service.process_refund(
+                entry["account_number"], entry["amount"], entry["store_name"],
+                idempotency_key=entry["id"])
+        except Exception as e:
+            outcome["remote"] = (False, str(e))
+            return
+        outcome["remote"] = (success, message)
+        if not success:
+            settlement = service.get_entry(entry["id"])
+            if settlement is None:
+                # Rejected before it was queued (e.g. no server connection)
+                outcome["permanent"] = not replay
+            else:
+                outcome["permanent"] = settlement["status"] in ("failed", "cancelled")
+
+    def _execute(self, entry, replay=False):
+        # Phase 2: reversal and local mark run at the same time; the log decides the outcome
+        outcome = {}
+        remote_thread = None
+        if not entry["remote_done"]:
+            remote_thread = threading.Thread(target=self._reverse_payment, args=(entry, outcome, replay), daemon=True)
+            remote_thread.start()
+
+        local_result = "Success"
+        if not entry["local_done"]:
+            local_result = self.transaction_manager.mark_as_refunded(entry["tx_barcode"])
+            if local_result == "AlreadyRefunded" and replay:
+                local_result = "Success" # marked by the interrupted run
+            if local_result == "Success":
+                self._set_phase(entry, entry["phase"], local_done=True)
+
+        if remote_thread:
+            remote_thread.join()
+            remote_success, remote_message = outcome.get("remote", (False, RESULT_MESSAGES["Error"]))
+            if remote_success:
+                self._set_phase(entry, entry["phase"], remote_done=True)
+        else:
+            remote_success, remote_message = True, ""
+
+        if remote_success and local_result == "Success":
+            self._set_phase(entry, "committed")
+            return True, RESULT_MESSAGES["Success"]
+
+        if not remote_success:
+            # Compensate: the money did not go back, so the receipt must stay refundable
+            if entry["local_done"] and not self.transaction_manager.unmark_refunded(entry["tx_barcode"]):
+                self._set_phase(entry, "review", last_error=f"로컬 환불 상태 복구 실패: {remote_message}")
+                print(f"[Refund] {entry['tx_barcode']} needs manual review: local status could not be reverted.")
+            elif not outcome.get("permanent"):
+                # A lost reply may still have applied the reversal; block re-refunds until checked
+                self._set_phase(entry, "review", local_done=False, last_error=remote_message)
+                print(f"[Refund] {entry['tx_barcode']} needs manual review: reversal result unknown.")
+            else:
+                self._set_phase(entry, "compensated", local_done=False, last_error=remote_message)
+            return False, f"모바일 결제 승인 취소 실패: {remote_message}"
+
+        # The money went back but the local mark failed; recover() retries the local step
+        self._set_phase(entry, "remote_done", last_error=local_result)
+        print(f"[Refund] {entry['tx_barcode']} was reversed but not marked locally ({local_result}); will retry.")
+        return True, RESULT_MESSAGES["Success"]
+
+    def get_entries(self, phase=None):
+        with self.lock:
+            return [dict(e) for e in self.entries if phase is None or e["phase"] == phase]
+
+    def get_unfinished(self):
+        with self.lock:
+            return [e for e in self.entries if e["phase"] in ("prepared", "remote_done")]
+
+    def recover(self):
+        """
+        Replays refunds interrupted by a crash on a background thread.
+        """
+        unfinished = self.get_unfinished()
+        if not unfinished:
+            return
+        def run():
+            for entry in unfinished:
+                print(f"[Refund] Resuming interrupted refund of {entry['tx_barcode']} ({entry['phase']}).")
+                try:
+                    self._execute(entry, replay=True)
+                except Exception as e:
+                    print(f"[Refund] Error resuming refund {entry['id']}: {e}")
+        threading.Thread(target=run, name="RefundRecovery", daemon=True).start()
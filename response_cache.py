@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Small persistent cache of API results: key -> value with a TTL, bounded to
+    max_entries by least recent use. Stored as JSON (written atomically on every put)
+    so repeated searches survive restarts and do not spend API quota.
+    """
+
+    def __init__(self, file_path, ttl, max_entries=300, empty_ttl=None):
+        self.file_path = file_path
+        self.ttl = ttl
+        self.empty_ttl = ttl if empty_ttl is None else empty_ttl # for "no results" answers
+        self.max_entries = max_entries
+        self.entries = OrderedDict() # key -> {"value": ..., "expires_at": ...}, oldest use first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    @staticmethod
+    def normalize_key(text):
+        return " ".join(text.lower().split())
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            for key, entry in data.get("entries", []):
+                if entry.get("expires_at", 0) > now:
+                    self.entries[key] = entry
+        except Exception as e:
+            print(f"[Cache] Error loading {self.file_path}: {e}")
+
+    def save(self):
+        # Called with self.lock held
+        tmp_path = self.file_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"entries": list(self.entries.items())}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            print(f"[Cache] Error saving {self.file_path}: {e}")
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["expires_at"] <= time.time():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry["value"]
+
+    def put(self, key, value):
+        with self.lock:
+            ttl = self.ttl if value else self.empty_ttl
+            self.entries[key] = {"value": value, "expires_at": time.time() + ttl}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.save()
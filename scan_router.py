@@ -0,0 +1,101 @@
+"""
+Routes scanned codes to their handlers.
+
+Each route is registered with a prefix and optionally the code lengths it accepts. The
+prefixes are kept in a trie, so classifying a code is one walk over its first characters
+however many barcode types are registered; the longest matching prefix wins and codes
+matching no route go to the default handler. Prefixes are matched case-insensitively.
+
+    router = ScanRouter(default=self.scan_product)
+    router.register("pay", "pay", self.scan_pay_code)
+    router.register("voucher", "99", self.scan_voucher, lengths=[13])
+    router.dispatch(code)
+
+dispatch times each scan per route. A handler calls end_span() once its lookup is done,
+before it shows a dialog or updates the cart, so the metrics measure the lookup rather
+than how long the cashier leaves a dialog open. get_metrics() feeds the settings page,
+and a summary is printed every LOG_EVERY scans.
+"""
+import time
+
+LOG_EVERY = 100 # scans between metric log lines
+
+
+class ScanRoute:
+    def __init__(self, name, prefix, handler, lengths=None):
+        self.name = name
+        self.prefix = prefix.lower()
+        self.handler = handler
+        self.lengths = set(lengths) if lengths else None
+
+    def accepts(self, code):
+        return self.lengths is None or len(code) in self.lengths
+
+
+class ScanRouter:
+    def __init__(self, default=None):
+        self.root = {}
+        self.default = ScanRoute("default", "", default) if default else None
+        self.metrics = {} # route name -> {"count", "total_ms", "max_ms"}
+        self.span = None # (route name, start time) of the scan being handled
+        self.dispatched = 0
+
+    def register(self, name, prefix, handler, lengths=None):
+        node = self.root
+        for char in prefix.lower():
+            node = node.setdefault(char, {})
+        # Several routes may share a prefix with different lengths
+        node.setdefault(None, []).append(ScanRoute(name, prefix, handler, lengths))
+
+    def classify(self, code):
+        """
+        The route for code: the one with the longest matching prefix that accepts its length.
+        """
+        node = self.root
+        best = None
+        for char in code.lower():
+            node = node.get(char)
+            if node is None:
+                break
+            for route in node.get(None, ()):
+                if route.accepts(code):
+                    best = route
+        return best or self.default
+
+    def dispatch(self, code):
+        started = time.perf_counter()
+        route = self.classify(code)
+        if route is None:
+            print(f"[ScanRouter] No route for {code}")
+            return None
+        self.span = (route.name, started)
+        try:
+            return route.handler(code)
+        finally:
+            # Handlers that never call end_span are timed to the end
+            self.end_span()
+            self.dispatched += 1
+            if self.dispatched % LOG_EVERY == 0:
+                self.log_metrics()
+
+    def end_span(self):
+        """
+        Stops the clock for the scan being dispatched. No-op outside dispatch or when called twice.
+        """
+        if self.span is None:
+            return
+        name, started = self.span
+        self.span = None
+        elapsed = (time.perf_counter() - started) * 1000
+        m = self.metrics.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        m["count"] += 1
+        m["total_ms"] += elapsed
+        m["max_ms"] = max(m["max_ms"], elapsed)
+
+    def get_metrics(self):
+        return {name: {"count": m["count"], "avg_ms": round(m["total_ms"] / m["count"], 2),
+                       "max_ms": round(m["max_ms"], 2)} for name, m in self.metrics.items()}
+
+    def log_metrics(self):
+        for name, m in sorted(self.get_metrics().items()):
+            print(f"[ScanRouter] {name}: {m['count']} scans, avg {m['avg_ms']} ms, max {m['max_ms']} ms")
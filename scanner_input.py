@@ -0,0 +1,114 @@
+"""
+Barcode field handling shared by the sales screen and the welcome screen.
+
+A scanner wedge types a whole code within a few milliseconds, so per-keystroke work
+adds up. ScannerInput only restyles the field when it switches between product and
+"pay" codes, and tells scanner bursts (characters arriving faster than a person types)
+from typing: a burst is painted and submitted once it ends (Enter or a short pause),
+so codes longer than 13 characters are not cut off, while typed codes are still
+submitted automatically at 13 characters.
+"""
+import time
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+PAY_PREFIX = "pay"
+# "pay" typed while the Korean keyboard layout is active
+KOREAN_PAY_PREFIXES = ("ㅔ묘", "ㅖ묘", "ㅔ됴", "ㅖ됴")
+AUTO_SUBMIT_LENGTH = 13
+SCAN_KEY_INTERVAL = 0.03 # seconds; characters closer than this come from a scanner
+SCAN_BURST_CHARS = 4 # fast characters in a row before the input counts as a scan
+SCAN_IDLE_MS = 60 # a scan that does not end with Enter is complete after this pause
+
+
+def normalize_pay_prefix(text):
+    if text[:1] in ("ㅔ", "ㅖ"):
+        for prefix in KOREAN_PAY_PREFIXES:
+            if text.startswith(prefix):
+                return PAY_PREFIX + text[len(prefix):]
+    return text
+
+
+def is_pay_code(text):
+    return text[:3].lower() == PAY_PREFIX
+
+
+def is_complete(text):
+    if is_pay_code(text):
+        return sum(1 for c in text[3:] if c.isdigit()) >= AUTO_SUBMIT_LENGTH
+    return len(text) >= AUTO_SUBMIT_LENGTH
+
+
+class ScannerInput(QObject):
+    submitted = pyqtSignal(str) # complete code, without waiting for Enter
+
+    def __init__(self, line_edit, normal_style, pay_style):
+        super().__init__(line_edit)
+        self.line_edit = line_edit
+        self.normal_style = normal_style
+        self.pay_style = pay_style
+        self.pay_mode = False
+        self.last_change = 0.0
+        self.last_length = 0
+        self.fast_chars = 0
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(SCAN_IDLE_MS)
+        self.idle_timer.timeout.connect(self.finish_scan)
+
+        line_edit.textChanged.connect(self.on_text_changed)
+        line_edit.returnPressed.connect(self.end_burst)
+
+    @property
+    def scanning(self):
+        return self.fast_chars >= SCAN_BURST_CHARS
+
+    def set_pay_mode(self, pay_mode):
+        if pay_mode != self.pay_mode:
+            self.pay_mode = pay_mode
+            self.line_edit.setStyleSheet(self.pay_style if pay_mode else self.normal_style)
+
+    def end_burst(self):
+        self.idle_timer.stop()
+        self.fast_chars = 0
+        if not self.line_edit.updatesEnabled():
+            self.line_edit.setUpdatesEnabled(True)
+
+    def on_text_changed(self, text):
+        now = time.perf_counter()
+        if not text:
+            self.end_burst()
+            self.last_length = 0
+            self.set_pay_mode(False)
+            return
+
+        normalized = normalize_pay_prefix(text)
+        if normalized != text:
+            self.line_edit.blockSignals(True)
+            self.line_edit.setText(normalized)
+            self.line_edit.blockSignals(False)
+            text = normalized
+
+        if len(text) == self.last_length + 1 and now - self.last_change < SCAN_KEY_INTERVAL:
+            self.fast_chars += 1
+        else:
+            self.fast_chars = 0
+        self.last_change = now
+        self.last_length = len(text)
+        self.set_pay_mode(is_pay_code(text))
+
+        if self.scanning:
+            # Scanner burst: no repaint per character, submit when it ends
+            if self.line_edit.updatesEnabled():
+                self.line_edit.setUpdatesEnabled(False)
+            self.idle_timer.start()
+        elif is_complete(text):
+            self.submitted.emit(text.strip())
+
+    def finish_scan(self):
+        was_scanning = self.scanning
+        self.end_burst()
+        text = self.line_edit.text().strip()
+        if was_scanning and text:
+            self.submitted.emit(text)
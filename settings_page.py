@@ -7,6 +7,9 @@ from PyQt6.QtGui import QPixmap, QColor
 import styles
 from product_manager import ProductManager, CATEGORIES
 from ui_components import CustomMessageDialog
+from product_search import RankedSearch
+
+SETTINGS_TABLE_LIMIT = 500
 
 class ProductRegistrationDialog(QDialog):
     """
@@ -651,10 +654,12 @@ class ProductRegistrationDialog(QDialog):
 class SettingsPage(QWidget):
     backRequested = pyqtSignal()
 
-    def __init__(self, product_manager, receipt_manager, parent=None):
+    def __init__(self, product_manager, receipt_manager, expiry_sweeper=None, scan_router=None, parent=None):
         super().__init__(parent)
         self.product_manager: ProductManager = product_manager
         self.receipt_manager = receipt_manager
+        self.expiry_sweeper = expiry_sweeper
+        self.scan_router = scan_router
         self.current_editing_barcode = None # Track currently editing item
         self.current_editing_v_barcode = None # Track currently editing voucher item
         self.selected_image_path = None
@@ -794,6 +799,10 @@ class SettingsPage(QWidget):
         card_lyt.addLayout(btn_row)
         
         self.system_tab_layout.addWidget(mode_card)
+        if self.expiry_sweeper is not None:
+            self.system_tab_layout.addWidget(self.create_sweeper_card())
+        if self.scan_router is not None:
+            self.system_tab_layout.addWidget(self.create_scan_stats_card())
         self.system_tab_layout.addStretch()
         
         self.tab_widget.addTab(self.system_tab, "시스템 설정")
@@ -810,6 +819,118 @@ class SettingsPage(QWidget):
         self.load_voucher_data()
         self.clear_v_form()
 
+    def create_sweeper_card(self):
+        sweep_card = QFrame()
+        sweep_card.setStyleSheet("""
+            QFrame {
+                background-color: white;
+                border: 1px solid #E2E8F0;
+                border-radius: 12px;
+            }
+        """)
+        lyt = QVBoxLayout(sweep_card)
+        lyt.setContentsMargins(25, 25, 25, 25)
+        lyt.setSpacing(15)
+
+        lbl_title = QLabel("쿠폰/상품권 데이터 정리")
+        lbl_title.setStyleSheet("font-size: 16pt; font-weight: bold; color: #1E293B; border: none;")
+        lyt.addWidget(lbl_title)
+
+        lbl_desc = QLabel("만료되거나 사용 완료된 키핑쿠폰과 모바일 상품권을 보관 파일(json/archive)로 옮깁니다. 대기 화면에서 하루 한 번 자동으로 실행됩니다.")
+        lbl_desc.setWordWrap(True)
+        lbl_desc.setStyleSheet("font-size: 11pt; color: #64748B; border: none;")
+        lyt.addWidget(lbl_desc)
+
+        self.lbl_sweep_stats = QLabel()
+        self.lbl_sweep_stats.setStyleSheet("font-size: 11pt; color: #334155; border: none;")
+        lyt.addWidget(self.lbl_sweep_stats)
+
+        self.btn_sweep = QPushButton("🧹 지금 정리")
+        self.btn_sweep.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.btn_sweep.setFixedHeight(50)
+        self.btn_sweep.setStyleSheet("""
+            QPushButton {
+                background-color: #F1F5F9;
+                color: #334155;
+                font-size: 12pt;
+                font-weight: bold;
+                border-radius: 8px;
+                border: 1px solid #CBD5E1;
+            }
+            QPushButton:hover { background-color: #E2E8F0; }
+        """)
+        self.btn_sweep.clicked.connect(self.run_sweep)
+        lyt.addWidget(self.btn_sweep)
+
+        self.expiry_sweeper.sweep_finished.connect(self.on_sweep_finished)
+        self.update_sweep_stats(self.expiry_sweeper.get_stats())
+        return sweep_card
+
+    def update_sweep_stats(self, stats):
+        last_run = stats.get("last_run") or "없음"
+        lines = [
+            f"마지막 정리: {last_run}"
+            + (f" (키핑쿠폰 {stats.get('keeping_archived', 0):,}건, 상품권 {stats.get('vouchers_archived', 0):,}건 보관)" if stats.get("last_run") else ""),
+            f"현재 키핑쿠폰: {stats['keeping_count']:,}건 ({stats['keeping_bytes'] / 1024:,.1f} KB)",
+            f"현재 모바일 상품권: {stats['voucher_count']:,}건 ({stats['voucher_bytes'] / 1024:,.1f} KB)",
+            f"누적 보관: 키핑쿠폰 {stats.get('total_keeping_archived', 0):,}건, 상품권 {stats.get('total_vouchers_archived', 0):,}건 ({stats['archive_bytes'] / 1024:,.1f} KB)"
+        ]
+        if stats.get("error"):
+            lines.append(f"오류: {stats['error']}")
+        self.lbl_sweep_stats.setText("\n".join(lines))
+
+    def run_sweep(self):
+        if self.expiry_sweeper.start():
+            self.btn_sweep.setEnabled(False)
+            self.btn_sweep.setText("정리 중...")
+
+    def on_sweep_finished(self, stats):
+        self.btn_sweep.setEnabled(True)
+        self.btn_sweep.setText("🧹 지금 정리")
+        self.update_sweep_stats(stats)
+        self.load_voucher_data()
+
+    def create_scan_stats_card(self):
+        scan_card = QFrame()
+        scan_card.setStyleSheet("""
+            QFrame {
+                background-color: white;
+                border: 1px solid #E2E8F0;
+                border-radius: 12px;
+            }
+        """)
+        lyt = QVBoxLayout(scan_card)
+        lyt.setContentsMargins(25, 25, 25, 25)
+        lyt.setSpacing(15)
+
+        lbl_title = QLabel("바코드 조회 속도")
+        lbl_title.setStyleSheet("font-size: 16pt; font-weight: bold; color: #1E293B; border: none;")
+        lyt.addWidget(lbl_title)
+
+        lbl_desc = QLabel("이번 실행에서 스캔한 바코드 종류별 조회 시간입니다. 안내 창이 떠 있던 시간은 포함하지 않습니다.")
+        lbl_desc.setWordWrap(True)
+        lbl_desc.setStyleSheet("font-size: 11pt; color: #64748B; border: none;")
+        lyt.addWidget(lbl_desc)
+
+        self.lbl_scan_stats = QLabel()
+        self.lbl_scan_stats.setStyleSheet("font-size: 11pt; color: #334155; border: none;")
+        lyt.addWidget(self.lbl_scan_stats)
+
+        self.update_scan_stats(self.scan_router.get_metrics())
+        return scan_card
+
+    def update_scan_stats(self, metrics):
+        if not hasattr(self, 'lbl_scan_stats'):
+            return
+        if not metrics:
+            self.lbl_scan_stats.setText("아직 스캔한 바코드가 없습니다.")
+            return
+        names = {"default": "상품/상품권", "pay": "결제 바코드", "keeping_coupon": "키핑쿠폰",
+                 "voucher": "모바일 상품권", "variable_measure": "저울 라벨"}
+        lines = [f"{names.get(name, name)}: {m['count']:,}건, 평균 {m['avg_ms']:.2f} ms, 최대 {m['max_ms']:.2f} ms"
+                 for name, m in sorted(metrics.items())]
+        self.lbl_scan_stats.setText("\n".join(lines))
+
     def create_header(self):
         header_frame = QFrame()
         header_frame.setMinimumHeight(60)
@@ -873,12 +994,15 @@ class SettingsPage(QWidget):
                 background-color: white;
             }}
         """)
-        self.input_search.textChanged.connect(self.filter_products)
         header_row.addWidget(self.input_search)
         
         left_layout.addLayout(header_row)
         
         self.table = QTableWidget()
+        # Shows the best matches of the search box, or the whole catalog when it is empty
+        self.table_barcodes = [] # barcodes of the table rows, in order
+        self.ranked_search = RankedSearch(self.product_manager, self.input_search, limit=SETTINGS_TABLE_LIMIT, show_all=True)
+        self.ranked_search.results.connect(self.fill_product_table)
         self.table.setColumnCount(7)
         self.table.setHorizontalHeaderLabels(["바코드", "상품명", "단가", "재고", "행사", "분류", "단축"])
         
@@ -1495,11 +1619,18 @@ class SettingsPage(QWidget):
         return label, input_field
 
     def load_data(self):
+        self.ranked_search.apply()
+        if hasattr(self, 'v_table'):
+            self.load_voucher_data()
+
+    def fill_product_table(self, barcodes):
         products = self.product_manager.get_all_products()
-        self.table.setRowCount(len(products))
+        self.table_barcodes = barcodes
+        self.table.setRowCount(len(barcodes))
         
         row = 0
-        for barcode, data in products.items():
+        for barcode in barcodes:
+            data = products[barcode]
             self.table.setItem(row, 0, QTableWidgetItem(barcode))
             self.table.setItem(row, 1, QTableWidgetItem(data["name"]))
             self.table.setItem(row, 2, QTableWidgetItem(f"{data['price']:,}"))
@@ -1519,23 +1650,6 @@ class SettingsPage(QWidget):
             self.table.item(row, 6).setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
             
             row += 1
-            
-        if hasattr(self, 'v_table'):
-            self.load_voucher_data()
-
-    def filter_products(self):
-        search_text = self.input_search.text().strip().lower()
-        for row in range(self.table.rowCount()):
-            barcode_item = self.table.item(row, 0)
-            name_item = self.table.item(row, 1)
-            
-            barcode = barcode_item.text().lower() if barcode_item else ""
-            name = name_item.text().lower() if name_item else ""
-            
-            if search_text in barcode or search_text in name:
-                self.table.setRowHidden(row, False)
-            else:
-                self.table.setRowHidden(row, True)
 
     def on_table_click(self, row, col):
         self.table.selectRow(row)
@@ -1553,12 +1667,7 @@ class SettingsPage(QWidget):
         dialog = ProductRegistrationDialog(self.product_manager, editing_barcode=barcode, parent=self)
         if dialog.exec() == QDialog.DialogCode.Accepted:
             self.load_data()
-            target_bc = dialog.created_barcode or barcode
-            for r in range(self.table.rowCount()):
-                bc_item = self.table.item(r, 0)
-                if bc_item and bc_item.text() == target_bc:
-                    self.table.selectRow(r)
-                    break
+            self.select_product(dialog.created_barcode or barcode)
 
     def delete_selected_product(self):
         current_row = self.table.currentRow()
@@ -1589,11 +1698,17 @@ class SettingsPage(QWidget):
             self.load_data()
             # Select newly added product in the table if available
             if dialog.created_barcode:
-                for row in range(self.table.rowCount()):
-                    bc_item = self.table.item(row, 0)
-                    if bc_item and bc_item.text() == dialog.created_barcode:
-                        self.table.selectRow(row)
-                        break
+                self.select_product(dialog.created_barcode)
+
+    def select_product(self, barcode):
+        # A product outside the current search results is shown by clearing the search
+        if barcode not in self.table_barcodes and self.input_search.text():
+            self.input_search.clear()
+            self.ranked_search.apply()
+        if barcode in self.table_barcodes:
+            row = self.table_barcodes.index(barcode)
+            self.table.selectRow(row)
+            self.table.scrollToItem(self.table.item(row, 0))
 
     def clear_form(self):
         self.current_editing_barcode = None # Reset
@@ -0,0 +1,146 @@
+"""
+Startup tracer for the POS.
+
+Enabled with the DU_STARTUP_PROFILE=1 environment variable or the --profile-startup flag.
+It must be imported before anything else in main.py so module imports are timed. Records
+import time per module, page construction and JSON loads, and on finish() writes
+json/startup_profile.json (Chrome trace format: open in chrome://tracing or Perfetto)
+plus a summary in the console.
+
+    python main.py --profile-startup
+    DU_STARTUP_PROFILE=1 DU_STARTUP_BUDGET_MS=1500 python main.py
+"""
+import os
+import sys
+import json
+import time
+import builtins
+import threading
+from contextlib import contextmanager
+
+ENABLED = bool(os.environ.get("DU_STARTUP_PROFILE")) or "--profile-startup" in sys.argv
+REPORT_FILE = os.path.join("json", "startup_profile.json")
+# Launch-to-first-paint budget; exceeding it is reported as a regression
+STARTUP_BUDGET_MS = float(os.environ.get("DU_STARTUP_BUDGET_MS", "3000"))
+# Modules whose own import time (excluding their imports) is above this are listed as slow
+IMPORT_BUDGET_MS = float(os.environ.get("DU_IMPORT_BUDGET_MS", "50"))
+SUMMARY_ROWS = 15
+
+_t0 = time.perf_counter()
+_events = [] # (name, category, start, duration, self_duration, thread id)
+_events_lock = threading.Lock()
+_local = threading.local()
+_original_import = builtins.__import__
+_finished = False
+_finish_label = None
+
+
+def _record(name, category, start, duration, self_duration=None):
+    with _events_lock:
+        _events.append((name, category, start - _t0, duration,
+                        duration if self_duration is None else self_duration, threading.get_ident()))
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Already imported modules (the common case) go straight through
+    if level != 0 or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    stack.append(0.0) # time spent in nested imports
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        duration = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += duration
+        _record(name, "import", start, duration, duration - nested)
+
+
+@contextmanager
+def span(name, category="startup"):
+    if not ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if _finished:
+            # e.g. pages built on first navigation after the report was written
+            print(f"[Startup] {category} {name}: {duration * 1000:.1f} ms (after {_finish_label})")
+        else:
+            _record(name, category, start, duration)
+
+
+def mark(name):
+    if ENABLED and not _finished:
+        now = time.perf_counter()
+        _record(name, "mark", now, 0.0)
+
+
+def finish(label="first paint"):
+    """
+    Ends the trace, writes the report and restores the import hook.
+    Called once the main window has been shown.
+    """
+    global _finished, _finish_label
+    if not ENABLED or _finished:
+        return
+    mark(label)
+    total_ms = (time.perf_counter() - _t0) * 1000
+    _finished = True
+    _finish_label = label
+    builtins.__import__ = _original_import
+
+    with _events_lock:
+        events = list(_events)
+    trace = [{
+        "name": name, "cat": category, "ph": "i" if category == "mark" else "X",
+        "ts": round(start * 1e6), "dur": round(duration * 1e6), "pid": os.getpid(), "tid": tid,
+        "args": {"self_ms": round(self_duration * 1000, 2)}
+    } for name, category, start, duration, self_duration, tid in events]
+
+    imports = sorted((e for e in events if e[1] == "import"), key=lambda e: e[4], reverse=True)
+    by_category = {}
+    for e in events:
+        if e[1] not in ("import", "mark"):
+            by_category.setdefault(e[1], []).append(e)
+    summary = {
+        "total_ms": round(total_ms, 1),
+        "budget_ms": STARTUP_BUDGET_MS,
+        "over_budget": total_ms > STARTUP_BUDGET_MS,
+        "import_ms": round(sum(e[4] for e in imports) * 1000, 1),
+        "slow_imports": [{"module": e[0], "self_ms": round(e[4] * 1000, 1), "total_ms": round(e[3] * 1000, 1)}
+                         for e in imports if e[4] * 1000 > IMPORT_BUDGET_MS],
+        "categories": {cat: [{"name": e[0], "ms": round(e[3] * 1000, 1)} for e in sorted(evts, key=lambda e: e[2])]
+                       for cat, evts in by_category.items()}
+    }
+
+    try:
+        os.makedirs(os.path.dirname(REPORT_FILE), exist_ok=True)
+        with open(REPORT_FILE, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "summary": summary}, f, ensure_ascii=False, indent=1)
+    except Exception as e:
+        print(f"[Startup] Error writing profile: {e}")
+
+    print("=" * 60)
+    print(f"[Startup] {label} after {total_ms:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)"
+          + (" -- OVER BUDGET" if summary["over_budget"] else ""))
+    print(f"[Startup] imports: {summary['import_ms']:.0f} ms in {len(imports)} modules; slowest (self time):")
+    for e in imports[:SUMMARY_ROWS]:
+        print(f"    {e[4] * 1000:8.1f} ms  {e[0]}")
+    for cat, evts in sorted(by_category.items()):
+        print(f"[Startup] {cat}: {sum(e[3] for e in evts) * 1000:.0f} ms")
+        for e in sorted(evts, key=lambda e: e[3], reverse=True)[:SUMMARY_ROWS]:
+            print(f"    {e[3] * 1000:8.1f} ms  {e[0]}")
+    print(f"[Startup] Timeline written to {REPORT_FILE}")
+    print("=" * 60)
+
+
+if ENABLED:
+    builtins.__import__ = _timed_import
@@ -1,12 +1,28 @@
 import json
 import os
-from datetime import datetime
+import codecs
+import threading
+from array import array
+from collections import deque
+from datetime import datetime, date, time, timedelta
+
+import startup_profiler
+
+# Bytes read per chunk when streaming the transactions file
+STREAM_CHUNK_SIZE = 64 * 1024
+# Characters skipped between records of the top-level JSON array
+_ARRAY_FILLER = " \t\r\n,["
+# Sales history used to rank product search results
+SALES_HISTORY_DAYS = 90
 
 class TransactionManager:
     def __init__(self, file_path=None, config_path=None):
         os.makedirs("json", exist_ok=True)
         self.file_path = file_path or os.path.join("json", "transactions.json")
         self.config_path = config_path or os.path.join("json", "safe_config.json")
+        self.barcode_index = {} # tx_barcode -> (byte offset, status), valid for index_signature
+        self.index_signature = None
+        self.index_lock = threading.Lock()
         self._ensure_file_exists()
 
     def _ensure_file_exists(self):
@@ -44,15 +60,8 @@ class TransactionManager:
             return False
 
     def get_last_transaction(self):
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                if data:
-                    return data[-1]
-            return None
-        except Exception as e:
-            print(f"Error reading last transaction: {e}")
-            return None
+        latest = self.get_latest_transactions(1)
+        return latest[0] if latest else None
 
     def get_all_transactions(self):
         try:
@@ -63,16 +72,166 @@ class TransactionManager:
             print(f"Error reading all transactions: {e}")
             return []
 
-    def get_cash_total(self):
+    def _scan_records(self, f):
+        """
+        Yields (byte_offset, record) for every element of the JSON array in the
+        binary file f, decoding one record at a time instead of the whole file.
+        """
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        buf = ""
+        idx = 0
+        # Byte offset of buf[pos]; only the text between pos and idx is ever re-encoded
+        pos = 0
+        pos_bytes = 0
+        eof = False
+        while True:
+            while idx < len(buf) and buf[idx] in _ARRAY_FILLER:
+                idx += 1
+            if idx < len(buf) and buf[idx] == "]":
+                return
+            if idx < len(buf):
+                try:
+                    record, end = decoder.raw_decode(buf, idx)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    record = None
+                if record is not None:
+                    pos_bytes += len(buf[pos:idx].encode("utf-8"))
+                    pos = idx
+                    yield pos_bytes, record
+                    idx = end
+                    continue
+            elif eof:
+                return
+
+            # Drop consumed text and pull the next chunk
+            pos_bytes += len(buf[pos:idx].encode("utf-8"))
+            buf = buf[idx:]
+            idx = 0
+            pos = 0
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if chunk:
+                buf += utf8.decode(chunk)
+            else:
+                buf += utf8.decode(b"", final=True)
+                eof = True
+
+    def _read_record_at(self, f, offset):
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder("utf-8")()
+        f.seek(offset)
+        buf = ""
+        while True:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            buf += utf8.decode(chunk, final=not chunk)
+            try:
+                return decoder.raw_decode(buf)[0]
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+
+    def _to_timestamp(self, value, end_of_day=False):
+        if value is None or isinstance(value, str):
+            return value
+        if not isinstance(value, datetime) and isinstance(value, date):
+            value = datetime.combine(value, time.max if end_of_day else time.min)
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+
+    def iter_transactions(self, start=None, end=None, reverse=True, filters=None):
+        """
+        Streams transactions from storage without building the full history in memory.
+        start/end bound the timestamp (inclusive) and accept datetime, date or
+        "YYYY-MM-DD HH:MM:SS" strings; filters is a list of predicates tx -> bool.
+        Records come in storage (chronological) order, newest first when reverse=True.
+        Do not save to the transactions file while the generator is being consumed.
+        """
+        start_ts = self._to_timestamp(start)
+        end_ts = self._to_timestamp(end, end_of_day=True)
+        filters = filters or []
+
+        def matches(tx):
+            ts = tx.get("timestamp", "")
+            if start_ts is not None and ts < start_ts:
+                return False
+            if end_ts is not None and ts > end_ts:
+                return False
+            return all(flt(tx) for flt in filters)
+
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                cash_total = sum(t.get("total_amt", 0) for t in data 
-                                if t.get("payment_method") == "Cash" and t.get("status") != "Refunded")
-                return cash_total
+            with open(self.file_path, 'rb') as f:
+                if not reverse:
+                    for _, tx in self._scan_records(f):
+                        if matches(tx):
+                            yield tx
+                    return
+
+                # Reverse order: remember only the offsets of matches, then re-read them backwards
+                offsets = array('q', (offset for offset, tx in self._scan_records(f) if matches(tx)))
+                for offset in reversed(offsets):
+                    yield self._read_record_at(f, offset)
         except Exception as e:
-            print(f"Error calculating cash total: {e}")
-            return 0
+            print(f"Error streaming transactions: {e}")
+
+    def get_item_sales(self, days=SALES_HISTORY_DAYS):
+        """
+        Quantity sold per item over the last days, keyed by barcode (or by product name for
+        receipts saved before items carried their barcode). Refunded receipts are skipped.
+        """
+        counts = {}
+        start = datetime.now() - timedelta(days=days)
+        filters = [lambda tx: tx.get("status") != "Refunded"]
+        for tx in self.iter_transactions(start=start, reverse=False, filters=filters):
+            for item in tx.get("items", []):
+                key = item.get("barcode") or item.get("name")
+                if key:
+                    counts[key] = counts.get(key, 0) + item.get("qty", 0)
+        return counts
+
+    def _file_signature(self):
+        st = os.stat(self.file_path)
+        return st.st_size, st.st_mtime_ns
+
+    def _barcode_entry(self, tx_barcode):
+        # The index is rebuilt (one streaming pass) whenever the file changed since it was built
+        with self.index_lock:
+            try:
+                signature = self._file_signature()
+                if signature != self.index_signature:
+                    index = {}
+                    with open(self.file_path, 'rb') as f, startup_profiler.span("transactions barcode index", "json"):
+                        for offset, tx in self._scan_records(f):
+                            if tx.get("tx_barcode"):
+                                # The first record wins, like the lookups that scan the file in order
+                                index.setdefault(tx["tx_barcode"], (offset, tx.get("status")))
+                    self.barcode_index = index
+                    self.index_signature = signature
+            except Exception as e:
+                print(f"Error indexing transactions: {e}")
+                self.barcode_index = {}
+                self.index_signature = None
+            return self.barcode_index.get(tx_barcode)
+
+    def get_refund_status(self, tx_barcode):
+        """
+        Returns "NotFound", "AlreadyRefunded" or "Refundable" for a receipt barcode, from the index.
+        """
+        entry = self._barcode_entry(tx_barcode)
+        if entry is None:
+            return "NotFound"
+        return "AlreadyRefunded" if entry[1] == "Refunded" else "Refundable"
+
+    def get_latest_transactions(self, limit=10, filters=None):
+        # Bounded window: at most `limit` records are held while streaming
+        latest = deque(self.iter_transactions(reverse=False, filters=filters), maxlen=limit)
+        latest.reverse()
+        return list(latest)
+
+    def get_cash_total(self):
+        return sum(t.get("total_amt", 0) for t in self.iter_transactions(
+            reverse=False,
+            filters=[lambda t: t.get("payment_method") == "Cash" and t.get("status") != "Refunded"]))
 
     def get_base_safe_amt(self):
         try:
@@ -115,6 +274,24 @@ class TransactionManager:
             print(f"Error marking transaction as refunded: {e}")
             return "Error"
 
+    def unmark_refunded(self, tx_barcode):
+        # Compensation for a refund whose payment reversal was rejected
+        try:
+            with open(self.file_path, 'r+', encoding='utf-8') as f:
+                data = json.load(f)
+                for tx in data:
+                    if tx.get("tx_barcode") == tx_barcode and tx.get("status") == "Refunded":
+                        del tx["status"]
+                        tx.pop("refund_timestamp", None)
+                        f.seek(0)
+                        json.dump(data, f, ensure_ascii=False, indent=4)
+                        f.truncate()
+                        return True
+                return False
+        except Exception as e:
+            print(f"Error reverting refund status: {e}")
+            return False
+
     def update_cash_receipt(self, tx_barcode, receipt_id):
         try:
             with open(self.file_path, 'r+', encoding='utf-8') as f:
@@ -172,20 +349,24 @@ class TransactionManager:
             return False
 
     def get_transaction_by_barcode(self, barcode):
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for tx in data:
-                    if tx.get("tx_barcode") == barcode:
-                        return tx
+        entry = self._barcode_entry(barcode)
+        if entry is None:
             return None
+        try:
+            with open(self.file_path, 'rb') as f:
+                tx = self._read_record_at(f, entry[0])
+            if tx.get("tx_barcode") == barcode:
+                return tx
         except Exception as e:
-            print(f"Error searching transaction by barcode: {e}")
-            return None
+            print(f"Error reading transaction {barcode}: {e}")
+        # The file changed under the index; fall back to a scan
+        for tx in self.iter_transactions(reverse=False, filters=[lambda t: t.get("tx_barcode") == barcode]):
+            return tx
+        return None
 
     def get_pos_stats(self):
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
+            with open(self.config_path, 'r', encoding='utf-8') as f, startup_profiler.span(self.config_path, "json"):
                 config = json.load(f)
                 return config.get("total_cancel_count", 0), config.get("item_cancel_count", 0)
         except:
@@ -8,6 +8,7 @@ from PyQt6.QtPrintSupport import QPrinter, QPrintDialog
 import os
 import sys
 import styles
+from product_search import RankedSearch
 import time
 import random
 
@@ -1622,7 +1623,8 @@ class ProductInquiryDialog(QDialog):
         self.txt_search = QLineEdit()
         self.txt_search.setPlaceholderText("바코드 번호를 스캔하거나 입력")
         self.txt_search.setStyleSheet(EDITABLE_STYLE)
-        self.txt_search.textChanged.connect(self.on_search_changed)
+        self.ranked_search = RankedSearch(self.product_manager, self.txt_search)
+        self.ranked_search.results.connect(self.on_search_results)
         
         btn_search_name = QPushButton("상품명으로 조회")
         btn_search_name.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -1902,43 +1904,27 @@ class ProductInquiryDialog(QDialog):
         
     def load_data(self):
         self.products = self.product_manager.get_all_products()
-        self.table.setRowCount(len(self.products))
-        
-        row = 0
-        for barcode, data in self.products.items():
+        self.fill_table(self.product_manager.rank_products(""))
+        if self.table.rowCount() > 0:
+            self.table.selectRow(0)
+
+    def fill_table(self, barcodes):
+        # Only the best matches are shown, best first
+        self.table.setRowCount(len(barcodes))
+        for row, barcode in enumerate(barcodes):
             self.table.setItem(row, 0, QTableWidgetItem(barcode))
-            self.table.setItem(row, 1, QTableWidgetItem(data["name"]))
+            self.table.setItem(row, 1, QTableWidgetItem(self.products[barcode]["name"]))
             self.table.item(row, 0).setTextAlignment(Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter)
             self.table.item(row, 1).setTextAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
-            row += 1
-            
-        if self.table.rowCount() > 0:
-            self.table.selectRow(0)
-            
-    def on_search_changed(self, text):
-        search_text = text.strip().lower()
-        first_visible_row = -1
-        
-        for row in range(self.table.rowCount()):
-            barcode_item = self.table.item(row, 0)
-            name_item = self.table.item(row, 1)
-            
-            barcode = barcode_item.text().lower() if barcode_item else ""
-            name = name_item.text().lower() if name_item else ""
             
-            if search_text in barcode or search_text in name:
-                self.table.setRowHidden(row, False)
-                if first_visible_row == -1:
-                    first_visible_row = row
-            else:
-                self.table.setRowHidden(row, True)
-                
+    def on_search_results(self, barcodes):
         # Block table signal to avoid recursions
         self.table.blockSignals(True)
-        if first_visible_row != -1:
-            self.table.selectRow(first_visible_row)
+        self.fill_table(barcodes)
+        if barcodes:
+            self.table.selectRow(0)
             # Update fields dynamically
-            self.update_fields(self.table.item(first_visible_row, 0).text())
+            self.update_fields(barcodes[0])
         else:
             self.table.clearSelection()
             self.update_fields("")
@@ -2487,6 +2473,66 @@ class PaymentWorker(QThread):
             self.finished_signal.emit(False, str(e), 0.0)
 
 
+class ServiceWaitDialog(QDialog):
+    """
+    Small busy dialog shown while a background service finishes starting.
+    Accepted once is_ready() returns True, rejected after timeout seconds.
+    """
+    def __init__(self, is_ready, timeout, title="결제 서비스 준비 중입니다", parent=None):
+        super().__init__(parent)
+        self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
+        self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
+        self.setFixedSize(styles.s(460), styles.s(180))
+
+        self.is_ready = is_ready
+        self.deadline = time.monotonic() + timeout
+
+        self.container = QFrame(self)
+        self.container.setGeometry(styles.s(10), styles.s(10), styles.s(440), styles.s(160))
+        self.container.setStyleSheet(f"""
+            QFrame {{
+                background-color: {styles.WHITE};
+                border-radius: {styles.s(12)}px;
+                border: 1px solid {styles.BORDER_COLOR};
+            }}
+        """)
+
+        layout = QVBoxLayout(self.container)
+        layout.setContentsMargins(styles.s(30), styles.s(25), styles.s(30), styles.s(25))
+        layout.setSpacing(styles.s(10))
+        layout.addStretch()
+
+        lbl_title = QLabel(title)
+        lbl_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        lbl_title.setStyleSheet(f"font-size: 15pt; font-weight: bold; color: {styles.DARK_PURPLE}; font-family: '{styles.FONT_FAMILY}'; border: none; background: transparent;")
+        layout.addWidget(lbl_title)
+
+        lbl_sub = QLabel("잠시만 기다려 주세요...")
+        lbl_sub.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        lbl_sub.setStyleSheet(f"font-size: 9.5pt; color: #666666; font-family: '{styles.FONT_FAMILY}'; border: none; background: transparent;")
+        layout.addWidget(lbl_sub)
+
+        # Busy indicator: the remaining start-up time is unknown
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 0)
+        progress_bar.setFixedHeight(styles.s(10))
+        progress_bar.setTextVisible(False)
+        layout.addWidget(progress_bar)
+        layout.addStretch()
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+        self.poll_timer.start(100)
+
+    def poll(self):
+        if self.is_ready():
+            self.poll_timer.stop()
+            self.accept()
+        elif time.monotonic() >= self.deadline:
+            self.poll_timer.stop()
+            self.reject()
+
+
 class BarcodePaymentProgressDialog(QDialog):
     def __init__(self, firebase_mgr, account_number, amount, parent=None):
         super().__init__(parent)
@@ -2620,10 +2666,9 @@ class BarcodePaymentProgressDialog(QDialog):
 class RefundWorker(QThread):
     finished_signal = pyqtSignal(bool, str)
     
-    def __init__(self, transaction_manager, firebase_mgr, barcode, amount, pay_method, tx):
+    def __init__(self, refund_service, barcode, amount, pay_method, tx):
         super().__init__()
-        self.transaction_manager = transaction_manager
-        self.firebase_mgr = firebase_mgr
+        self.refund_service = refund_service
         self.barcode = barcode
         self.amount = amount
         self.pay_method = pay_method
@@ -2631,62 +2676,21 @@ class RefundWorker(QThread):
         
     def run(self):
         try:
-            # 1. Process Firebase refund if it's MobilePay
-            if self.pay_method == "MobilePay":
-                account_num = None
-                payments = self.tx.get("payments", [])
-                for p in payments:
-                    if p.get("method") == "MobilePay":
-                        account_num = p.get("details", {}).get("account_number")
-                        break
-                if not account_num:
-                    account_num = self.tx.get("payment_details", {}).get("account_number")
-                
-                if account_num:
-                    store_name = "DU순천점"
-                    import os, json
-                    store_info_path = os.path.join(os.path.abspath("."), "json", "store_info.json")
-                    if os.path.exists(store_info_path):
-                        try:
-                            with open(store_info_path, "r", encoding="utf-8") as f:
-                                info = json.load(f)
-                                store_name = info.get("store_name", "DU순천점")
-                        except Exception:
-                            pass
-                    
-                    # Deposit the amount back using process_refund
-                    success, msg, bal = self.firebase_mgr.process_refund(
-                        account_number=account_num,
-                        amount=float(self.amount),
-                        store_name=store_name
-                    )
-                    if not success:
-                        self.finished_signal.emit(False, f"모바일 결제 승인 취소 실패: {msg}")
-                        return
-            
-            # 2. Mark as refunded in transaction manager
-            result = self.transaction_manager.mark_as_refunded(self.barcode)
-            if result == "Success":
-                self.finished_signal.emit(True, "환불이 정상 완료되었습니다.")
-            elif result == "AlreadyRefunded":
-                self.finished_signal.emit(False, "이미 환불 처리된 영수증입니다.")
-            elif result == "NotFound":
-                self.finished_signal.emit(False, "해당 바코드의 영수증을 찾을 수 없습니다.")
-            else:
-                self.finished_signal.emit(False, "환불 처리 중 오류가 발생했습니다.")
+            # Index check, DU머니 reversal and local refund mark are handled by RefundService
+            success, message = self.refund_service.refund(self.barcode, self.amount, self.pay_method, self.tx)
+            self.finished_signal.emit(success, message)
         except Exception as e:
             self.finished_signal.emit(False, str(e))
 
 
 class BarcodeRefundProgressDialog(QDialog):
-    def __init__(self, transaction_manager, firebase_mgr, barcode, amount, pay_method, tx, parent=None):
+    def __init__(self, refund_service, barcode, amount, pay_method, tx, parent=None):
         super().__init__(parent)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.Dialog)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setFixedSize(styles.s(460), styles.s(200))
         
-        self.transaction_manager = transaction_manager
-        self.firebase_mgr = firebase_mgr
+        self.refund_service = refund_service
         self.barcode = barcode
         self.amount = amount
         self.pay_method = pay_method
@@ -2762,7 +2766,7 @@ class BarcodeRefundProgressDialog(QDialog):
         layout.addStretch()
         
         # Start background worker thread
-        self.worker = RefundWorker(self.transaction_manager, self.firebase_mgr, self.barcode, self.amount, self.pay_method, self.tx)
+        self.worker = RefundWorker(self.refund_service, self.barcode, self.amount, self.pay_method, self.tx)
         self.worker.finished_signal.connect(self.on_refund_finished)
         self.worker.start()
         
@@ -3185,36 +3189,6 @@ class KeepingCouponIssueDialog(QDialog):
         self.result_value = True
         self.accept()
 
-def get_choseong(text):
-    CHOSEONG = ["ㄱ", "ㄲ", "ㄴ", "ㄷ", "ㄸ", "ㄹ", "ㅁ", "ㅂ", "ㅃ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅉ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
-    result = ""
-    for char in text:
-        code = ord(char)
-        if 0xAC00 <= code <= 0xD7A3:
-            idx = (code - 0xAC00) // 588
-            result += CHOSEONG[idx]
-        else:
-            result += char
-    return result
-
-def match_korean(query, name):
-    query = query.strip().lower()
-    name = name.strip().lower()
-    if not query:
-        return True
-    if query in name:
-        return True
-    CHOSEONG = ["ㄱ", "ㄲ", "ㄴ", "ㄷ", "ㄸ", "ㄹ", "ㅁ", "ㅂ", "ㅃ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅉ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ"]
-    q_choseong = get_choseong(query)
-    n_choseong = get_choseong(name)
-    if q_choseong in n_choseong:
-        for c in query:
-            if c not in CHOSEONG:
-                if c not in name:
-                    return False
-        return True
-    return False
-
 class ProductNameSearchDialog(QDialog):
     def __init__(self, product_manager, parent=None):
         super().__init__(parent)
@@ -3340,7 +3314,6 @@ class ProductNameSearchDialog(QDialog):
                 border: 2px solid #528A35;
             }
         """)
-        self.txt_search_name.textChanged.connect(self.filter_products)
         search_layout.addWidget(self.txt_search_name, stretch=1)
         
         lbl_status = QLabel("운영 ☑")
@@ -3356,6 +3329,8 @@ class ProductNameSearchDialog(QDialog):
         self.table = QTableWidget()
         self.table.setColumnCount(3)
         self.table.setHorizontalHeaderLabels(["상품명", "바코드", "금액"])
+        self.ranked_search = RankedSearch(self.product_manager, self.txt_search_name)
+        self.ranked_search.results.connect(self.fill_table)
         self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
@@ -3487,11 +3462,16 @@ class ProductNameSearchDialog(QDialog):
         self.txt_search_name.setFocus()
         
     def load_all_products(self):
+        self.ranked_search.apply()
+
+    def fill_table(self, barcodes):
+        # Only the best matches are shown, best first
         products = self.product_manager.get_all_products()
-        self.table.setRowCount(len(products))
+        self.table.setRowCount(len(barcodes))
         
         row = 0
-        for barcode, p_data in products.items():
+        for barcode in barcodes:
+            p_data = products[barcode]
             self.table.setItem(row, 0, QTableWidgetItem(p_data["name"]))
             self.table.setItem(row, 1, QTableWidgetItem(barcode))
             self.table.setItem(row, 2, QTableWidgetItem(f"{p_data['price']:,}원"))
@@ -3506,24 +3486,6 @@ class ProductNameSearchDialog(QDialog):
         if self.table.rowCount() > 0:
             self.table.selectRow(0)
             
-    def filter_products(self):
-        query = self.txt_search_name.text().strip()
-        first_visible_row = -1
-        
-        for row in range(self.table.rowCount()):
-            name_item = self.table.item(row, 0)
-            name = name_item.text() if name_item else ""
-            
-            if match_korean(query, name):
-                self.table.setRowHidden(row, False)
-                if first_visible_row == -1:
-                    first_visible_row = row
-            else:
-                self.table.setRowHidden(row, True)
-                
-        if first_visible_row != -1:
-            self.table.selectRow(first_visible_row)
-            
     def scroll_up(self):
         scrollbar = self.table.verticalScrollBar()
         scrollbar.setValue(scrollbar.value() - scrollbar.singleStep() * 4)
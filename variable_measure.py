@@ -0,0 +1,92 @@
+"""
+In-store variable measure barcodes (EAN-13 with prefix 20-29).
+
+Deli and produce labels embed the price or the weight of the pack in the barcode:
+    prefix | item code | price or weight | check digit
+    21       12345       01500              7           -> item 2112345, 1,500원
+The product is registered under prefix + item code (e.g. "2112345"); for weight codes
+its price is the price per kg.
+
+The layouts come from json/variable_barcodes.json (DEFAULT_LAYOUTS when the file does
+not exist) and are compiled once into slice positions per prefix, so decoding a code
+is a dict lookup and a few slices. main.py routes only the configured prefixes here,
+after the exact product lookup, so normal scans do not pay for it.
+
+    [{"prefix": "21", "item_digits": 5, "value": "price", "value_digits": 5},
+     {"prefix": "22", "item_digits": 5, "value": "weight", "value_digits": 5, "round_to": 10}]
+value "price" is in won, "weight" in grams. round_to rounds weight prices down (원 단위 절사).
+"""
+import os
+import json
+
+LAYOUT_FILE = os.path.join("json", "variable_barcodes.json")
+CODE_LENGTH = 13
+DEFAULT_LAYOUTS = [
+    {"prefix": "21", "item_digits": 5, "value": "price", "value_digits": 5},
+    {"prefix": "22", "item_digits": 5, "value": "weight", "value_digits": 5, "round_to": 10},
+]
+
+
+def ean13_check_digit(digits):
+    total = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits[:12]))
+    return str((10 - total % 10) % 10)
+
+
+class VariableMeasureDecoder:
+    def __init__(self, layouts=None):
+        self.layouts = {} # prefix -> (item_end, value_end, value kind, round_to)
+        self.prefix_lengths = [] # longest first
+        for layout in DEFAULT_LAYOUTS if layouts is None else layouts:
+            self.add_layout(layout)
+
+    @classmethod
+    def load(cls, path=LAYOUT_FILE):
+        layouts = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    layouts = json.load(f)
+            except Exception as e:
+                print(f"[VariableMeasure] Error loading {path}: {e}")
+        return cls(layouts)
+
+    def add_layout(self, layout):
+        prefix = str(layout.get("prefix", ""))
+        item_end = len(prefix) + int(layout.get("item_digits", 0))
+        value_end = item_end + int(layout.get("value_digits", 0))
+        kind = layout.get("value")
+        if not prefix.isdigit() or value_end != CODE_LENGTH - 1 or kind not in ("price", "weight"):
+            print(f"[VariableMeasure] Invalid layout ignored: {layout}")
+            return
+        self.layouts[prefix] = (item_end, value_end, kind, int(layout.get("round_to", 1)) or 1)
+        self.prefix_lengths = sorted({len(p) for p in self.layouts}, reverse=True)
+
+    def prefixes(self):
+        return list(self.layouts)
+
+    def decode(self, code):
+        """
+        Splits a variable measure code. Returns {"item": ..., "price": ...} or
+        {"item": ..., "weight": grams}, or None if code is not one (or misread).
+        """
+        if len(code) != CODE_LENGTH or not code.isdigit():
+            return None
+        for length in self.prefix_lengths:
+            layout = self.layouts.get(code[:length])
+            if layout is not None:
+                break
+        else:
+            return None
+        item_end, value_end, kind, round_to = layout
+        if code[-1] != ean13_check_digit(code):
+            return None
+        return {"item": code[:item_end], kind: int(code[item_end:value_end]), "round_to": round_to}
+
+    def price_of(self, decoded, product):
+        """
+        Price of the scanned pack: the embedded price, or the per-kg price times the weight.
+        """
+        if "price" in decoded:
+            return decoded["price"]
+        price = product["price"] * decoded["weight"] // 1000
+        return price - price % decoded["round_to"]
@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
 from PyQt6.QtCore import Qt, pyqtSignal, QSize
 from PyQt6.QtGui import QPixmap, QFont, QPalette, QBrush
 import styles
+from scanner_input import ScannerInput, normalize_pay_prefix
 import sys
 
 def resource_path(relative_path):
@@ -141,8 +142,12 @@ class WelcomePage(QWidget):
         self.barcode_input = QLineEdit()
         self.barcode_input.setPlaceholderText("바코드를 스캔하세요")
         self.barcode_input.setStyleSheet(styles.WELCOME_INPUT_STYLE + f"background: transparent; color: #333; font-size: {styles.fs(20)};")
+        self.barcode_scanner = ScannerInput(
+            self.barcode_input,
+            styles.WELCOME_INPUT_STYLE + f"background: transparent; color: #333; font-size: {styles.fs(20)};",
+            styles.WELCOME_INPUT_STYLE + f"background: transparent; color: white; font-size: {styles.fs(20)};")
+        self.barcode_scanner.submitted.connect(lambda code: self.on_barcode_return())
         self.barcode_input.returnPressed.connect(self.on_barcode_return)
-        self.barcode_input.textChanged.connect(self.on_barcode_text_changed)
         barcode_inner_lyt.addWidget(self.barcode_input)
         barcode_icon = QLabel("| [||||]|")
         barcode_icon.setStyleSheet(f"font-size: {styles.fs(20)}; color: #7F8C8D; background: transparent;")
@@ -501,42 +506,10 @@ class WelcomePage(QWidget):
             window.close()
 
     def on_barcode_return(self):
-        barcode = self.barcode_input.text().strip()
-        for kor_prefix in ["ㅔ묘", "ㅖ묘", "ㅔ됴", "ㅖ됴"]:
-            if barcode.startswith(kor_prefix):
-                barcode = "pay" + barcode[len(kor_prefix):]
-                break
+        barcode = normalize_pay_prefix(self.barcode_input.text().strip())
         if barcode:
             self.barcodeScanned.emit(barcode)
             self.barcode_input.clear()
-            self.barcode_input.setStyleSheet(styles.WELCOME_INPUT_STYLE + f"background: transparent; color: #333; font-size: {styles.fs(20)};")
-
-    def on_barcode_text_changed(self, text):
-        for kor_prefix in ["ㅔ묘", "ㅖ묘", "ㅔ됴", "ㅖ됴"]:
-            if text.startswith(kor_prefix):
-                text = "pay" + text[len(kor_prefix):]
-                self.barcode_input.blockSignals(True)
-                self.barcode_input.setText(text)
-                self.barcode_input.blockSignals(False)
-                break
-
-        lower_text = text.lower()
-        if lower_text.startswith("pay"):
-            self.barcode_input.setStyleSheet(styles.WELCOME_INPUT_STYLE + f"background: transparent; color: white; font-size: {styles.fs(20)};")
-        else:
-            self.barcode_input.setStyleSheet(styles.WELCOME_INPUT_STYLE + f"background: transparent; color: #333; font-size: {styles.fs(20)};")
-
-        should_submit = False
-        if lower_text.startswith("pay"):
-            digits_count = sum(1 for c in text[3:] if c.isdigit())
-            if digits_count >= 13:
-                should_submit = True
-        else:
-            if len(text) >= 13:
-                should_submit = True
-                
-        if should_submit:
-            self.on_barcode_return()
 
     def update_last_transaction(self, data):
         if not data: